@@ -1,59 +1,166 @@
-import requests
-from bs4 import BeautifulSoup
+import argparse
+import asyncio
 import time
 import os
 import re
-from urllib.parse import urljoin
+from collections import deque
+from urllib.parse import urljoin, urlparse
+
+from 响应缓存 import ResponseCache, CrawlCheckpoint, PageFingerprints, cached_get, content_hash
+from 解析后端 import CompiledSelectors, available_backends, get_parser_backend
+from 诗词存储 import PoetryRecordWriter, export_text, iter_records, records_path_for
+from 速率控制 import HostRateControllers, RetryQueue, is_retryable
+from 近似去重 import NearDuplicateIndex
 
 
 class QianlongPoetrySpider:
-    def __init__(self):
-        self.base_url = "https://www.gushicimingju.com"
-        self.start_url = "https://www.gushicimingju.com/shiren/qianlong/"
+    SITE_URL = "https://www.gushicimingju.com"
+
+    # 页面解析用到的CSS选择器，每个爬虫实例按所选解析后端预编译一次
+    SELECTORS = {
+        # 尝试多种选择器来获取完整的诗词内容
+        'detail_content': [
+            '.shici-content',  # 常见的诗词内容选择器
+            '.shici-text',
+            '.poem-content',
+            '.main-content .content',
+            '.shici-quan',
+            'div[class*="content"]',
+            'div[class*="text"]'
+        ],
+        'detail_main': '.main-content',
+        'list_item': 'ul.simple-shiciqu li',
+        'list_title': 'a[href*="/gushi/shi/"]',
+        'list_content': 'span.content',
+        'page_info': 'li.info span',
+        'page_links': 'ul.pagination li a[href*="/shiren/qianlong/page"]',
+    }
+
+    def __init__(self, concurrency=4, request_interval=0.5, cache_dir=None, offline=False, parser=None,
+                 batch_size=200, base_url=None, max_attempts=5, dedup=True, dedup_with=None):
+        # 站点根地址；指向本地站点模拟器时，页面中指向原站点的绝对链接也会改写到该地址
+        self.base_url = (base_url or self.SITE_URL).rstrip('/')
+        self.start_url = f"{self.base_url}/shiren/qianlong/"
         self.output_file = r"C:\Users\任宇轩\Desktop\信息系统设计与分析\乾隆诗词.txt"
+        # 爬取结果先批量写入结构化的JSONL记录文件，结束后再导出为原有的文本格式
+        self.records_file = records_path_for(self.output_file)
+        # 近似去重：写入记录时标记与已有诗词（包括另一个站点的爬取结果）重复的内容
+        self.dedup = dedup
+        self.dedup_sources = dedup_with if dedup_with is not None else [
+            r"C:\Users\任宇轩\Desktop\信息系统设计与分析\乾隆诗词2.jsonl"]
+        self.dedup_index = None
+        self.batch_size = batch_size
+        self.writer = None
+        self._unflushed_pages = []
+        # requests 在创建爬虫时才导入，查看帮助时不必加载
+        import requests
+        from requests.adapters import HTTPAdapter
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0'
         })
+        # 异步模式下同一站点的请求在线程中并发执行，连接池要容纳全部并发连接
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=max(10, concurrency))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         self.processed_count = 0
 
-    def get_page_content(self, url):
-        """获取页面内容"""
+        # 异步模式参数：每个站点的最大并发请求数
+        self.concurrency = concurrency
+        self._host_semaphores = {}
+
+        # 按站点分别进行自适应速率控制，取代固定的请求间隔，request_interval 为初始间隔（秒）；
+        # 失败的列表页进入有界重试队列，按带抖动的指数退避时间重试
+        self.rate_controller = HostRateControllers(initial_interval=request_interval)
+        self.retry_queue = RetryQueue(max_attempts=max_attempts)
+        # 无法获取（不可重试的错误）、只能使用列表页片段的详情页地址
+        self.detail_gave_up = []
+
+        # 本地响应缓存（离线模式下只读缓存，不访问网络）和断点续爬记录
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+        self.offline = offline
+        self.checkpoint = CrawlCheckpoint(self.records_file + '.checkpoint.json')
+        # 列表页指纹，增量重爬时据此跳过没有变化的页面
+        self.fingerprints = PageFingerprints(self.records_file + '.fingerprints.json')
+
+        # HTML解析后端（默认优先lxml）及预编译的选择器
+        self.parser_backend = get_parser_backend(parser)
+        self.selectors = CompiledSelectors(self.parser_backend, self.SELECTORS)
+
+    def rebase_url(self, url):
+        """把指向原站点的绝对URL改写到当前的 base_url"""
+        if self.base_url != self.SITE_URL and url.startswith(self.SITE_URL):
+            return self.base_url + url[len(self.SITE_URL):]
+        return url
+
+    def page_url(self, page):
+        """构建列表页URL"""
+        if page == 1:
+            return self.start_url
+        return f"{self.base_url}/shiren/qianlong/page{page}/"
+
+    def fetch_page(self, url):
+        """获取页面内容，返回 (页面文本, 失败时是否可以重试)"""
         try:
-            response = self.session.get(url)
-            response.encoding = 'utf-8'
-            if response.status_code == 200:
-                return response.text
+            status_code, text = cached_get(self.session, url, self.cache, self.offline,
+                                           rate_controller=self.rate_controller, timeout=15)
+            if status_code == 200:
+                return text, False
+            elif status_code is None:
+                print(f"离线模式下缓存中没有该页面：{url}")
+                return None, False
             else:
-                print(f"请求失败，状态码：{response.status_code}")
-                return None
+                print(f"请求失败，状态码：{status_code}")
+                return None, is_retryable(status_code)
         except Exception as e:
+            # 超时、连接错误等都可以重试
             print(f"请求出错：{e}")
+            return None, True
+
+    def fetch_page_with_retries(self, url):
+        """获取页面内容，可重试的失败在退避等待后重试，返回 (页面文本, 最终失败时是否可以重试)"""
+        for attempt in range(1, self.retry_queue.max_attempts + 1):
+            html, retryable = self.fetch_page(url)
+            if html is not None or not retryable:
+                return html, retryable
+            if attempt < self.retry_queue.max_attempts:
+                time.sleep(self.retry_queue.backoff(attempt))
+        return None, True
+
+    def get_page_content(self, url):
+        """获取页面内容，可重试的失败在退避等待后重试，最终失败返回None"""
+        return self.fetch_page_with_retries(url)[0]
+
+    def get_poetry_detail(self, item):
+        """获取诗词详情页的完整内容，详情页获取失败时的处理见 detail_fallback"""
+        html, retryable = self.fetch_page_with_retries(item['detail_url'])
+        if html is None:
+            return self.detail_fallback(item, retryable)
+        return self.choose_content(item['list_content'], self.parse_poetry_detail(html))
+
+    def detail_fallback(self, item, retryable):
+        """详情页获取失败时的内容：不静默退回列表页的截断片段
+
+        可重试的失败返回None，调用方把整个列表页交给重试队列，之后（或下次运行时）重新
+        获取；不可重试的失败（如404）才使用列表页片段，条目标记为 truncated，详情页
+        地址记入断点的 detail_gave_up。
+        """
+        if retryable:
+            print(f"  详情页获取失败，稍后随列表页重试: {item['title']}")
             return None
+        print(f"  详情页无法获取，使用列表页片段: {item['title']}")
+        self.detail_gave_up.append(item['detail_url'])
+        item['truncated'] = True
+        return item['list_content']
 
-    def get_poetry_detail(self, detail_url):
-        """获取诗词详情页的完整内容"""
+    def parse_poetry_detail(self, html):
+        """从详情页HTML中解析完整的诗词内容"""
         try:
-            html = self.get_page_content(detail_url)
-            if not html:
-                return None
-
-            soup = BeautifulSoup(html, 'html.parser')
-
-            # 尝试多种选择器来获取完整的诗词内容
-            content_selectors = [
-                '.shici-content',  # 常见的诗词内容选择器
-                '.shici-text',
-                '.poem-content',
-                '.main-content .content',
-                '.shici-quan',
-                'div[class*="content"]',
-                'div[class*="text"]'
-            ]
+            soup = self.parser_backend.parse(html)
 
             full_content = None
-            for selector in content_selectors:
-                content_element = soup.select_one(selector)
+            for selector in self.selectors.detail_content:
+                content_element = selector.select_one(soup)
                 if content_element:
                     # 清理内容，移除多余的标签和空白
                     text = content_element.get_text().strip()
@@ -70,7 +177,7 @@ class QianlongPoetrySpider:
 
             # 如果上述选择器都没找到，尝试获取页面中所有的文本内容
             if not full_content:
-                main_content = soup.select_one('.main-content')
+                main_content = self.selectors.detail_main.select_one(soup)
                 if main_content:
                     full_content = main_content.get_text().strip()
 
@@ -80,65 +187,102 @@ class QianlongPoetrySpider:
             print(f"获取详情页内容出错：{e}")
             return None
 
-    def parse_poetry_list(self, html):
-        """解析诗词列表"""
-        soup = BeautifulSoup(html, 'html.parser')
-        poetry_list = []
+    def extract_list_items(self, html):
+        """解析列表页中的诗词条目（不请求详情页）"""
+        soup = self.parser_backend.parse(html)
+        items = []
 
         # 查找诗词列表
-        poetry_items = soup.select('ul.simple-shiciqu li')
+        poetry_items = self.selectors.list_item.select(soup)
 
         for item in poetry_items:
             try:
                 # 提取诗词标题和链接
-                title_tag = item.select_one('a[href*="/gushi/shi/"]')
+                title_tag = self.selectors.list_title.select_one(item)
                 if not title_tag:
                     continue
 
                 title = title_tag.get_text().strip()
                 relative_url = title_tag.get('href')
-                detail_url = urljoin(self.base_url, relative_url)
+                detail_url = self.rebase_url(urljoin(self.base_url, relative_url))
 
                 # 提取列表页中的内容片段
-                content_tag = item.select_one('span.content')
+                content_tag = self.selectors.list_content.select_one(item)
                 list_content = content_tag.get_text().strip() if content_tag else ""
 
                 # 检查内容是否有省略号
                 has_ellipsis = '...' in list_content or '…' in list_content or '...' in title_tag.get_text()
 
-                # 如果内容有省略号，获取详情页完整内容
-                if has_ellipsis and list_content:
-                    print(f"  获取完整内容: {title}")
-                    full_content = self.get_poetry_detail(detail_url)
-
-                    # 如果详情页获取失败，使用列表页内容
-                    if full_content and len(full_content) > len(list_content):
-                        content = full_content
-                    else:
-                        content = list_content
-                    time.sleep(0.5)  # 详情页请求间隔
-                else:
-                    content = list_content
-
-                if title and content:
-                    poetry_list.append({
-                        'title': title,
-                        'content': content,
-                        'detail_url': detail_url
-                    })
+                items.append({
+                    'title': title,
+                    'list_content': list_content,
+                    'detail_url': detail_url,
+                    'need_detail': bool(has_ellipsis and list_content),
+                    'list_hash': content_hash(title, list_content, detail_url)
+                })
 
             except Exception as e:
                 print(f"解析诗词项出错：{e}")
                 continue
 
+        return items
+
+    @staticmethod
+    def choose_content(list_content, full_content):
+        """在列表页片段和详情页全文之间选择更完整的内容"""
+        # 如果详情页获取失败，使用列表页内容
+        if full_content and len(full_content) > len(list_content):
+            return full_content
+        return list_content
+
+    @staticmethod
+    def build_poetry_list(items, contents):
+        """把列表条目和最终内容组合成诗词列表；有详情页获取失败（可重试）的条目时返回None"""
+        if any(content is None for content in contents):
+            return None
+        poetry_list = []
+        for item, content in zip(items, contents):
+            if item['title'] and content:
+                poetry = {
+                    'title': item['title'],
+                    'content': content,
+                    'detail_url': item['detail_url'],
+                    'list_hash': item['list_hash']
+                }
+                if item.get('truncated'):
+                    poetry['truncated'] = True
+                poetry_list.append(poetry)
         return poetry_list
 
+    @staticmethod
+    def page_fingerprint(entries):
+        """列表页指纹：页内各条目摘要按顺序组合，entries 为诗词列表或列表条目"""
+        return content_hash(*(entry['list_hash'] for entry in entries))
+
+    def parse_poetry_list(self, html):
+        """解析诗词列表；有详情页可重试地获取失败时返回None，整页稍后重试"""
+        items = self.extract_list_items(html)
+        contents = []
+
+        for item in items:
+            # 如果内容有省略号，获取详情页完整内容
+            if item['need_detail']:
+                print(f"  获取完整内容: {item['title']}")
+                content = self.get_poetry_detail(item)
+                if content is None:
+                    return None
+                contents.append(content)
+            else:
+                contents.append(item['list_content'])
+
+        return self.build_poetry_list(items, contents)
+
     def get_total_pages(self, html):
         """获取总页数"""
-        soup = BeautifulSoup(html, 'html.parser')
+        soup = self.parser_backend.parse(html)
 
         # 从分页信息中获取总页数
-        page_info = soup.select_one('li.info span')
+        page_info = self.selectors.page_info.select_one(soup)
         if page_info:
             info_text = page_info.get_text()
             # 使用正则表达式提取页数
@@ -147,7 +291,7 @@ class QianlongPoetrySpider:
                 return int(match.group(1))
 
         # 如果没有找到分页信息，从分页链接中获取最大页数
-        page_links = soup.select('ul.pagination li a[href*="/shiren/qianlong/page"]')
+        page_links = self.selectors.page_links.select(soup)
         if page_links:
             page_numbers = []
             for link in page_links:
@@ -161,33 +305,150 @@ class QianlongPoetrySpider:
         return 1  # 默认只有1页
 
     def save_poetry(self, poetry_list, page_num):
-        """保存诗词到文件"""
-        with open(self.output_file, 'a', encoding='utf-8') as f:
-            for i, poetry in enumerate(poetry_list, 1):
-                # 计算全局序号
-                self.processed_count += 1
-                f.write(f"{self.processed_count}.《{poetry['title']}》\n")
-                f.write(f"{poetry['content']}\n")
-                f.write("-" * 50 + "\n\n")
-
-    def run(self, max_pages=None):
+        """把一页诗词写入记录缓冲区"""
+        for poetry in poetry_list:
+            # 计算全局序号
+            self.processed_count += 1
+            self.writer.add({
+                'id': self.processed_count,
+                'title': poetry['title'],
+                'content': poetry['content'],
+                'detail_url': poetry['detail_url'],
+                'source': 'gushicimingju',
+                'page': page_num,
+                'list_hash': poetry.get('list_hash'),
+                **({'truncated': True} if poetry.get('truncated') else {})
+            })
+
+    def store_page(self, page, poetry_list, retryable=False, failures=0):
+        """保存一个列表页的结果；获取失败的页面交给重试队列"""
+        if poetry_list is None:
+            if not retryable:
+                self.retry_queue.give_up(page)
+                print(f"第{page}页获取失败，跳过")
+            elif self.retry_queue.push(page, failures + 1):
+                print(f"第{page}页获取失败，稍后重试")
+            else:
+                print(f"第{page}页多次重试后仍然失败，跳过")
+            return
+
+        if poetry_list:
+            self.save_poetry(poetry_list, page)
+            print(f"第{page}页完成，获取到{len(poetry_list)}首诗词")
+        else:
+            print(f"第{page}页没有找到诗词")
+        self.fingerprints.set(page, self.page_fingerprint(poetry_list))
+        self.complete_page(page)
+
+    def complete_page(self, page):
+        """标记页面处理完毕；页面在所在批次落盘后才记入断点"""
+        self._unflushed_pages.append(page)
+        self.writer.flush_if_full()
+
+    def _on_flush(self, size):
+        """记录批次落盘后，把其中的页面记入断点"""
+        if self._unflushed_pages:
+            self.checkpoint.mark_done(*self._unflushed_pages,
+                                      processed_count=self.processed_count,
+                                      output_size=size)
+            self.fingerprints.save()
+            self._unflushed_pages = []
+
+    def prepare_output(self, resume=True):
+        """打开记录文件；有未完成的断点时从断点处继续写入"""
+        resume_size = None
+        if resume and self.checkpoint.resumable and os.path.exists(self.records_file):
+            # 截掉断点之后写入的内容，保证续爬后不出现重复诗词
+            resume_size = self.checkpoint.get('output_size')
+            self.processed_count = self.checkpoint.get('processed_count', 0)
+            print(f"从断点继续：已完成{len(self.checkpoint.get('completed'))}页，已保存{self.processed_count}首诗词")
+        else:
+            self.checkpoint.reset()
+            self.fingerprints.reset()
+            self.processed_count = 0
+
+        self._unflushed_pages = []
+        self.writer = PoetryRecordWriter(self.records_file, batch_size=self.batch_size,
+                                         resume_size=resume_size, on_flush=self._on_flush)
+        # 记录文件截断到断点之后再载入，续写部分与已保存的记录一起去重
+        self.writer.dedup = self.build_dedup_index(include_own=resume_size is not None)
+
+    def build_dedup_index(self, include_own=False):
+        """创建近似去重索引，并载入另一个站点（以及续写时本站点）已有的记录"""
+        if not self.dedup:
+            self.dedup_index = None
+            return None
+        self.dedup_index = NearDuplicateIndex()
+        paths = [path for path in self.dedup_sources if os.path.exists(path)]
+        if include_own and os.path.exists(self.records_file):
+            paths.append(self.records_file)
+        for path in paths:
+            count = self.dedup_index.seed(path)
+            print(f"去重索引已载入 {path} 中的 {count} 条记录")
+        return self.dedup_index
+
+    def finish_output(self):
+        """写入剩余记录，并导出兼容原格式的文本文件"""
+        self.writer.close()
+        failed = sorted(self.retry_queue.failed)
+        gave_up = sorted(self.retry_queue.gave_up)
+        self.checkpoint.state['gave_up'] = gave_up
+        if gave_up:
+            print(f"\n有{len(gave_up)}页无法获取（不可重试的错误）：{gave_up}")
+        self.record_detail_gave_up()
+        if failed:
+            # 可重试的失败页面不记为完成，断点保持未结束状态，再次运行会续爬这些页面
+            self.checkpoint.state['failed'] = failed
+            self.checkpoint.save()
+            print(f"\n有{len(failed)}页最终获取失败：{failed}，再次运行将从断点继续爬取这些页面")
+        else:
+            self.checkpoint.state.pop('failed', None)
+            self.checkpoint.finish()
+        self.fingerprints.save()
+        export_text(self.records_file, self.output_file, style='spider')
+        print(f"请求统计：{self.rate_controller.summary()}")
+        if self.dedup_index is not None:
+            print(self.dedup_index.summary())
+
+    def record_detail_gave_up(self):
+        """把无法获取的详情页记入断点，这些诗词以列表页片段保存并标记为 truncated"""
+        detail_gave_up = sorted(set(self.checkpoint.get('detail_gave_up', [])) | set(self.detail_gave_up))
+        self.checkpoint.state['detail_gave_up'] = detail_gave_up
+        if self.detail_gave_up:
+            print(f"\n有{len(set(self.detail_gave_up))}个详情页无法获取，相应诗词只保存了列表页片段（记录中标记为 truncated）")
+
+    def crawl_page(self, page, failures=0):
+        """爬取并保存一个列表页"""
+        print(f"正在处理第{page}页...")
+        html, retryable = self.fetch_page(self.page_url(page))
+        poetry_list = None
+        if html is not None:
+            poetry_list = self.parse_poetry_list(html)
+            # 列表页获取成功但详情页可重试地失败，整页重试
+            retryable = poetry_list is None
+        self.store_page(page, poetry_list, retryable, failures)
+
+    def retry_failed_pages(self, wait=False):
+        """重试已到时间的失败页面；wait=True 时一直等到重试队列清空"""
+        while True:
+            for page, failures in self.retry_queue.pop_ready():
+                self.crawl_page(page, failures)
+            delay = self.retry_queue.next_due()
+            if not wait or delay is None:
+                return
+            time.sleep(delay)
+
+    def run(self, max_pages=None, resume=True):
         """运行爬虫"""
         print("开始爬取乾隆诗词...")
 
-        # 检查输出目录是否存在
-        output_dir = os.path.dirname(self.output_file)
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-
-        # 清空或创建输出文件
-        with open(self.output_file, 'w', encoding='utf-8') as f:
-            f.write("乾隆诗词全集\n")
-            f.write("=" * 50 + "\n\n")
+        self.prepare_output(resume)
 
         # 获取第一页内容
         first_page_html = self.get_page_content(self.start_url)
         if not first_page_html:
             print("无法获取第一页内容，程序退出")
+            self.writer.close()
             return
 
         # 获取总页数
@@ -195,53 +456,300 @@ class QianlongPoetrySpider:
         if max_pages and max_pages < total_pages:
             total_pages = max_pages
         print(f"总页数：{total_pages}")
+        self.fingerprints.total_pages = total_pages
 
         # 处理第一页
-        print(f"正在处理第1页...")
-        poetry_list = self.parse_poetry_list(first_page_html)
-        self.save_poetry(poetry_list, 1)
-        print(f"第1页完成，获取到{len(poetry_list)}首诗词")
+        if not self.checkpoint.is_done(1):
+            print(f"正在处理第1页...")
+            self.store_page(1, self.parse_poetry_list(first_page_html), retryable=True)
 
-        # 处理后续页面
+        # 处理后续页面；请求节奏由速率控制器决定，到期的失败页面穿插重试
         for page in range(2, total_pages + 1):
-            print(f"正在处理第{page}页...")
+            if self.checkpoint.is_done(page):
+                continue
+            self.crawl_page(page)
+            self.retry_failed_pages()
 
-            # 构建页面URL
-            if page == 1:
-                url = self.start_url
-            else:
-                url = f"{self.base_url}/shiren/qianlong/page{page}/"
+        # 等待并处理重试队列中剩余的页面
+        self.retry_failed_pages(wait=True)
 
-            # 获取页面内容
-            html = self.get_page_content(url)
-            if not html:
-                print(f"第{page}页获取失败，跳过")
+        self.finish_output()
+        print(f"\n爬取完成！诗词已保存到：{self.records_file}（文本格式：{self.output_file}）")
+        print(f"总共爬取了{self.processed_count}首诗词")
+
+    def run_incremental(self, max_pages=None):
+        """增量重爬：重新检查总页数和各列表页指纹，只处理新增或发生变化的页面
+
+        指纹相同的页面直接沿用上次的记录；有变化的页面中，条目摘要与上次相同的诗词
+        沿用已保存的内容，只有新增或改动的条目（以及上次详情页无法获取、只保存了片段的
+        条目）才请求详情页，因此站点插入新诗词导致
+        后续页面整体错位时，也只会请求真正新增的详情页。配合 --cache-dir 时列表页
+        使用条件请求，没有变化的页面只需一次304响应。结果先写入新的记录文件，
+        完成后原子替换旧文件。
+        """
+        if not self.fingerprints.total_pages or not os.path.exists(self.records_file):
+            print("没有上次爬取的页面指纹，改为完整爬取")
+            return self.run(max_pages=max_pages, resume=False)
+        if self.checkpoint.resumable:
+            print("上次爬取尚未完成，先从断点继续")
+            return self.run(max_pages=max_pages)
+
+        print("开始增量更新乾隆诗词...")
+        start_time = time.time()
+
+        # 上次的记录：按页码分组，并按条目摘要索引以便沿用内容
+        old_pages = {}
+        old_items = {}
+        for record in iter_records(self.records_file):
+            old_pages.setdefault(record.get('page'), []).append(record)
+            if record.get('list_hash'):
+                old_items[record['list_hash']] = record
+
+        first_page_html = self.get_page_content(self.start_url)
+        if not first_page_html:
+            print("无法获取第一页内容，程序退出")
+            return
+
+        total_pages = self.get_total_pages(first_page_html)
+        if max_pages and max_pages < total_pages:
+            total_pages = max_pages
+        print(f"总页数：{total_pages}（上次为{self.fingerprints.total_pages}页）")
+
+        snapshot_file = self.records_file + '.incremental'
+        self.processed_count = 0
+        self.writer = PoetryRecordWriter(snapshot_file, batch_size=self.batch_size,
+                                         dedup=self.build_dedup_index())
+        stats = {'unchanged': 0, 'changed': 0, 'new': 0, 'failed': 0, 'details': 0}
+
+        for page in range(1, total_pages + 1):
+            html = first_page_html if page == 1 else self.get_page_content(self.page_url(page))
+            if html is None:
+                # 获取失败时保留上次的结果，下次增量更新时再检查
+                stats['failed'] += 1
+                print(f"第{page}页获取失败，保留上次的结果")
+                self.save_poetry(old_pages.get(page, []), page)
                 continue
 
-            # 解析诗词列表
-            poetry_list = self.parse_poetry_list(html)
-            if poetry_list:
-                self.save_poetry(poetry_list, page)
-                print(f"第{page}页完成，获取到{len(poetry_list)}首诗词")
+            # build_poetry_list 只保留有标题和内容的条目，指纹按同样的条目计算
+            items = self.extract_list_items(html)
+            fingerprint = self.page_fingerprint(item for item in items if item['title'] and item['list_content'])
+            old_fingerprint = self.fingerprints.get(page)
+            if fingerprint == old_fingerprint:
+                stats['unchanged'] += 1
+                poetry_list = old_pages.get(page, [])
             else:
-                print(f"第{page}页没有找到诗词")
+                stats['changed' if old_fingerprint else 'new'] += 1
+                contents = []
+                for item in items:
+                    old = old_items.get(item['list_hash'])
+                    # 上次只保存了列表页片段（truncated）的诗词重新请求详情页
+                    if old is not None and not old.get('truncated'):
+                        contents.append(old['content'])
+                    elif item['need_detail']:
+                        print(f"  获取完整内容: {item['title']}")
+                        stats['details'] += 1
+                        content = self.get_poetry_detail(item)
+                        if content is None:
+                            break
+                        contents.append(content)
+                    else:
+                        contents.append(item['list_content'])
+                if len(contents) < len(items):
+                    # 详情页可重试地失败：与列表页获取失败相同，保留上次的结果，指纹不更新
+                    stats['failed'] += 1
+                    print(f"第{page}页的详情页获取失败，保留上次的结果")
+                    self.save_poetry(old_pages.get(page, []), page)
+                    continue
+                poetry_list = self.build_poetry_list(items, contents)
+                self.fingerprints.set(page, fingerprint)
+                print(f"第{page}页有变化，获取到{len(poetry_list)}首诗词")
+
+            self.save_poetry(poetry_list, page)
+            self.writer.flush_if_full()
+
+        self.writer.close()
+        os.replace(snapshot_file, self.records_file)
+
+        self.fingerprints.total_pages = total_pages
+        self.fingerprints.truncate(total_pages)
+        self.fingerprints.save()
+        self.checkpoint.reset()
+        self.checkpoint.mark_done(*range(1, total_pages + 1), processed_count=self.processed_count,
+                                  output_size=os.path.getsize(self.records_file))
+        self.record_detail_gave_up()
+        self.checkpoint.finish()
+        export_text(self.records_file, self.output_file, style='spider')
+
+        if self.dedup_index is not None:
+            print(self.dedup_index.summary())
+        print(f"\n增量更新完成！未变化{stats['unchanged']}页，变化{stats['changed']}页，"
+              f"新增{stats['new']}页，获取失败{stats['failed']}页，请求详情页{stats['details']}个")
+        print(f"请求统计：{self.rate_controller.summary()}")
+        print(f"诗词已保存到：{self.records_file}（文本格式：{self.output_file}）")
+        print(f"总共{self.processed_count}首诗词，耗时{time.time() - start_time:.1f}秒")
+
+    # ---------------- 异步并发模式 ----------------
+
+    def _host_semaphore(self, url):
+        """获取URL所属站点的并发信号量"""
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.concurrency)
+        return self._host_semaphores[host]
+
+    async def fetch_page_async(self, url):
+        """异步获取页面内容，同一站点的并发数不超过 concurrency"""
+        async with self._host_semaphore(url):
+            return await asyncio.to_thread(self.fetch_page, url)
+
+    async def fetch_page_with_retries_async(self, url):
+        """异步获取页面内容，可重试的失败在退避等待后重试，返回 (页面文本, 最终失败时是否可以重试)"""
+        for attempt in range(1, self.retry_queue.max_attempts + 1):
+            html, retryable = await self.fetch_page_async(url)
+            if html is not None or not retryable:
+                return html, retryable
+            if attempt < self.retry_queue.max_attempts:
+                await asyncio.sleep(self.retry_queue.backoff(attempt))
+        return None, True
+
+    async def get_page_content_async(self, url):
+        """异步获取页面内容，可重试的失败在退避等待后重试，最终失败返回None"""
+        return (await self.fetch_page_with_retries_async(url))[0]
+
+    async def get_poetry_detail_async(self, item):
+        """异步获取诗词详情页的完整内容，获取失败时的处理与 get_poetry_detail 相同"""
+        html, retryable = await self.fetch_page_with_retries_async(item['detail_url'])
+        if html is None:
+            return self.detail_fallback(item, retryable)
+        full_content = await asyncio.to_thread(self.parse_poetry_detail, html)
+        return self.choose_content(item['list_content'], full_content)
+
+    async def parse_poetry_list_async(self, html):
+        """异步解析诗词列表，同一页中的详情页并发获取"""
+        items = await asyncio.to_thread(self.extract_list_items, html)
+
+        async def resolve(item):
+            if not item['need_detail']:
+                return item['list_content']
+            print(f"  获取完整内容: {item['title']}")
+            return await self.get_poetry_detail_async(item)
+
+        # gather 按传入顺序返回结果，页内顺序与串行模式一致
+        contents = await asyncio.gather(*(resolve(item) for item in items))
+        return self.build_poetry_list(items, contents)
+
+    async def crawl_page_async(self, page):
+        """异步爬取单个列表页及其详情页，返回 (诗词列表, 失败时是否可以重试)"""
+        html, retryable = await self.fetch_page_async(self.page_url(page))
+        if html is None:
+            return None, retryable
+        poetry_list = await self.parse_poetry_list_async(html)
+        # 详情页可重试地失败时整页重试
+        return poetry_list, poetry_list is None
+
+    async def run_async(self, max_pages=None, resume=True):
+        """异步运行爬虫：列表页和详情页并发获取，按页码顺序写入"""
+        print(f"开始异步爬取乾隆诗词（每站点并发数：{self.concurrency}）...")
+        start_time = time.time()
+
+        self.prepare_output(resume)
+
+        # 获取第一页内容
+        first_page_html = await self.get_page_content_async(self.start_url)
+        if not first_page_html:
+            print("无法获取第一页内容，程序退出")
+            self.writer.close()
+            return
 
-            # 添加延迟，避免请求过于频繁
-            time.sleep(1)
+        # 获取总页数
+        total_pages = self.get_total_pages(first_page_html)
+        if max_pages and max_pages < total_pages:
+            total_pages = max_pages
+        print(f"总页数：{total_pages}")
+        self.fingerprints.total_pages = total_pages
 
-        print(f"\n爬取完成！诗词已保存到：{self.output_file}")
-        print(f"总共爬取了{self.processed_count}首诗词")
+        # 后续页面在处理第一页的同时就开始调度；
+        # 滑动窗口限制提前调度的页数，避免已完成但未写入的页面堆积在内存中
+        window = self.concurrency * 2
+        pending = deque()
+        todo_pages = deque(page for page in range(2, total_pages + 1) if not self.checkpoint.is_done(page))
+
+        def schedule():
+            while todo_pages and len(pending) < window:
+                page = todo_pages.popleft()
+                pending.append((page, asyncio.create_task(self.crawl_page_async(page))))
+
+        schedule()
+
+        # 处理第一页
+        if not self.checkpoint.is_done(1):
+            print(f"正在处理第1页...")
+            self.store_page(1, await self.parse_poetry_list_async(first_page_html), retryable=True)
+
+        # 严格按页码顺序等待并写入，保证全局序号与串行模式一致
+        while pending:
+            page, task = pending.popleft()
+            poetry_list, retryable = await task
+            schedule()
+            self.store_page(page, poetry_list, retryable)
+
+        # 失败的页面在退避时间到期后并发重试，直到重试队列清空
+        while len(self.retry_queue):
+            await asyncio.sleep(self.retry_queue.next_due())
+            ready = self.retry_queue.pop_ready()
+            results = await asyncio.gather(*(self.crawl_page_async(page) for page, _ in ready))
+            for (page, failures), (poetry_list, retryable) in zip(ready, results):
+                self.store_page(page, poetry_list, retryable, failures)
+
+        self.finish_output()
+        print(f"\n爬取完成！诗词已保存到：{self.records_file}（文本格式：{self.output_file}）")
+        print(f"总共爬取了{self.processed_count}首诗词，耗时{time.time() - start_time:.1f}秒")
 
 
 def main():
-    spider = QianlongPoetrySpider()
+    parser = argparse.ArgumentParser(description="爬取古诗词名句网上的乾隆诗词")
+    parser.add_argument('--max-pages', type=int, default=None, help="只爬取前N页（测试用）")
+    parser.add_argument('--async', dest='use_async', action='store_true', help="使用异步并发模式")
+    parser.add_argument('--concurrency', type=int, default=4, help="异步模式下每个站点的最大并发请求数")
+    parser.add_argument('--interval', type=float, default=0.5, help="初始请求间隔（秒），之后由自适应速率控制自动调整")
+    parser.add_argument('--max-attempts', type=int, default=5, help="每个页面的最大请求次数")
+    parser.add_argument('--cache-dir', default=None, help="本地响应缓存目录，不指定则不缓存")
+    parser.add_argument('--offline', action='store_true', help="只从缓存读取页面，不访问网络（需配合 --cache-dir）")
+    parser.add_argument('--restart', action='store_true', help="忽略断点，从头开始爬取")
+    parser.add_argument('--incremental', action='store_true',
+                        help="增量更新：只重新处理新增或内容变化的列表页和详情页")
+    parser.add_argument('--parser', choices=available_backends(), default=None,
+                        help="HTML解析后端，默认优先使用lxml")
+    parser.add_argument('--batch-size', type=int, default=200, help="记录文件每批写入的诗词条数")
+    parser.add_argument('--no-dedup', action='store_true', help="不做近似去重标记")
+    parser.add_argument('--dedup-with', action='append', default=None, metavar='JSONL',
+                        help="参与去重的其他记录文件，可重复指定，默认为另一个站点的记录文件")
+    parser.add_argument('--base-url', default=None, help="站点根地址，可指向本地站点模拟器，如 http://127.0.0.1:8000")
+    args = parser.parse_args()
+
+    if args.offline and not args.cache_dir:
+        parser.error("--offline 需要同时指定 --cache-dir")
+
+    spider = QianlongPoetrySpider(concurrency=args.concurrency, request_interval=args.interval,
+                                  cache_dir=args.cache_dir, offline=args.offline, parser=args.parser,
+                                  batch_size=args.batch_size, base_url=args.base_url,
+                                  max_attempts=args.max_attempts, dedup=not args.no_dedup,
+                                  dedup_with=args.dedup_with)
 
     # 测试模式：只爬取前3页
-    # spider.run(max_pages=3)
+    # python 乾隆诗词爬取1.py --max-pages 3
+
+    # 完整模式：爬取所有页面；加 --async 使用并发模式
 
-    # 完整模式：爬取所有页面
-    spider.run()
+    # 增量模式：只更新上次爬取之后新增或变化的页面
+    # python 乾隆诗词爬取1.py --incremental --cache-dir cache
+    if args.incremental:
+        spider.run_incremental(max_pages=args.max_pages)
+    elif args.use_async:
+        asyncio.run(spider.run_async(max_pages=args.max_pages, resume=not args.restart))
+    else:
+        spider.run(max_pages=args.max_pages, resume=not args.restart)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
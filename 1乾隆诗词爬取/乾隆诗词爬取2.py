@@ -1,13 +1,151 @@
-import requests
-from bs4 import BeautifulSoup
+import argparse
+import queue
+import threading
 import time
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+
+from 响应缓存 import ResponseCache, CrawlCheckpoint, cached_get
+from 解析后端 import CompiledSelectors, available_backends, get_parser_backend
+from 诗词存储 import PoetryRecordWriter, export_text, records_path_for
+from 速率控制 import HostRateControllers, RetryQueue, is_retryable
+from 近似去重 import NearDuplicateIndex
+
+
+class StageStats:
+    """流水线单个阶段的计数器：已处理数量、队列深度和吞吐量"""
+
+    def __init__(self, name, depth_func=None):
+        self.name = name
+        self.depth_func = depth_func
+        self.count = 0
+        self.busy_seconds = 0.0
+        self.start_time = time.time()
+        self.lock = threading.Lock()
+
+    def add(self, busy_seconds=0.0):
+        with self.lock:
+            self.count += 1
+            self.busy_seconds += busy_seconds
+
+    @property
+    def depth(self):
+        """当前等待该阶段处理的条目数"""
+        return self.depth_func() if self.depth_func else 0
+
+    @property
+    def throughput(self):
+        """每秒处理的条目数"""
+        elapsed = time.time() - self.start_time
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+    def snapshot(self):
+        return {'count': self.count, 'depth': self.depth,
+                'throughput': round(self.throughput, 3), 'busy_seconds': round(self.busy_seconds, 3)}
+
+    def __str__(self):
+        return f"{self.name}: 完成{self.count} 排队{self.depth} 吞吐{self.throughput:.2f}/秒"
+
+
+# 解析进程中的解析后端和预编译选择器：每个进程只创建一次，不需要创建爬虫
+_parse_backend = None
+_parse_selectors = None
+
+
+def _init_parse_worker(parser):
+    global _parse_backend, _parse_selectors
+    _parse_backend = get_parser_backend(parser)
+    _parse_selectors = CompiledSelectors(_parse_backend, QianlongPoetryCrawler.SELECTORS)
+
+
+def _parse_chapter(html):
+    """在解析进程中提取章节正文，返回 (正文, 耗时)"""
+    start = time.time()
+    content = extract_poetry_content(html, _parse_backend, _parse_selectors)
+    return content, time.time() - start
+
+
+def extract_poetry_content(html_content, parser_backend, selectors):
+    """从HTML内容中提取诗词文本，去除翻译
+
+    parser_backend 为HTML解析后端，selectors 为按该后端预编译的 QianlongPoetryCrawler.SELECTORS。
+    """
+    try:
+        soup = parser_backend.parse(html_content)
+
+        # 移除不需要的元素
+        for element in soup(['script', 'style', 'nav', 'header', 'footer', 'aside', 'form']):
+            element.decompose()
+
+        main_content = None
+        for selector in selectors.content_areas:
+            area = selector.select_one(soup)
+            if area:
+                main_content = area
+                break
+
+        if not main_content:
+            # 如果没有找到特定区域，使用body
+            main_content = selectors.body.select_one(soup)
+
+        if main_content:
+            # 获取文本内容
+            text = main_content.get_text(separator='\n', strip=True)
+
+            # 处理文本，去除翻译和注释
+            lines = text.split('\n')
+            poetry_lines = []
+
+            for line in lines:
+                line = line.strip()
+                if (line and
+                        len(line) > 1 and
+                        not any(keyword in line for keyword in [
+                            '翻译', '注释', '赏析', '注：', '译：', '【注】',
+                            '导航', '菜单', '首页', '搜索', '书架', '下载',
+                            'Copyright', '版权', '©'
+                        ]) and
+                        not line.startswith('function') and
+                        not 'var ' in line):
+                    poetry_lines.append(line)
+
+            content = '\n'.join(poetry_lines)
+            return content
+        else:
+            return "未能提取到内容"
+
+    except Exception as e:
+        print(f"提取内容时出错: {e}")
+        return f"提取内容时出错: {e}"
 
 
 class QianlongPoetryCrawler:
-    def __init__(self):
-        self.base_url = "https://www.diancang.xyz"
+    SITE_URL = "https://www.diancang.xyz"
+    # 章节起始页可能在其他站点上，使用站点模拟器时一并改写
+    ORIGIN_URLS = ("https://www.diancang.xyz", "https://www.shidianguji.com")
+
+    # 页面解析用到的CSS选择器，每个爬虫实例按所选解析后端预编译一次
+    SELECTORS = {
+        'booklist': 'ul#booklist',
+        'list_group': 'ul.list-group',
+        # 尝试多种方式获取内容，按顺序取第一个存在的区域
+        'content_areas': [
+            'div.panel-body',
+            'div.content',
+            'div#content',
+            'article',
+            'div.m-summary'
+        ],
+        'body': 'body',
+    }
+
+    def __init__(self, cache_dir=None, offline=False, parser=None, batch_size=20, base_url=None,
+                 request_interval=2.0, max_attempts=5, dedup=True, dedup_with=None):
+        # 站点根地址；指向本地站点模拟器时，指向原站点的绝对链接也会改写到该地址
+        self.base_url = (base_url or self.SITE_URL).rstrip('/')
+        # requests 在创建爬虫时才导入，查看帮助时不必加载
+        import requests
         self.session = requests.Session()
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36 Edg/91.0.864.59',
@@ -18,34 +156,72 @@ class QianlongPoetryCrawler:
             'Upgrade-Insecure-Requests': '1',
         }
         self.output_file = r"C:\Users\任宇轩\Desktop\信息系统设计与分析\乾隆诗词2.txt"
+        # 爬取结果先批量写入结构化的JSONL记录文件，结束后再导出为原有的文本格式
+        self.records_file = records_path_for(self.output_file)
+        # 近似去重：写入记录时标记与已有诗词（包括另一个站点的爬取结果）重复的内容
+        self.dedup = dedup
+        self.dedup_sources = dedup_with if dedup_with is not None else [
+            r"C:\Users\任宇轩\Desktop\信息系统设计与分析\乾隆诗词.jsonl"]
+        self.dedup_index = None
+        self.batch_size = batch_size
+        self.writer = None
+        self.success_count = 0
+        self._unflushed_chapters = []
+
+        # 本地响应缓存（离线模式下只读缓存，不访问网络）和断点续爬记录
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+        self.offline = offline
+        self.checkpoint = CrawlCheckpoint(self.records_file + '.checkpoint.json')
+
+        # 按站点分别进行自适应速率控制，取代固定的请求间隔，request_interval 为初始间隔（秒）；
+        # 失败的章节进入有界重试队列，按带抖动的指数退避时间重试
+        self.rate_controller = HostRateControllers(initial_interval=request_interval)
+        self.retry_queue = RetryQueue(max_attempts=max_attempts)
+
+        # HTML解析后端（默认优先lxml）及预编译的选择器
+        self.parser_backend = get_parser_backend(parser)
+        self.selectors = CompiledSelectors(self.parser_backend, self.SELECTORS)
+
+    def rebase_url(self, url):
+        """把指向原站点的绝对URL改写到当前的 base_url"""
+        if self.base_url != self.SITE_URL:
+            for origin in self.ORIGIN_URLS:
+                if url.startswith(origin):
+                    return self.base_url + url[len(origin):]
+        return url
 
     def get_chapter_links(self, url):
         """获取所有章节链接"""
+        url = self.rebase_url(url)
         try:
             print(f"正在访问: {url}")
-            response = self.session.get(url, headers=self.headers, timeout=10)
-            response.encoding = 'utf-8'
-            print(f"响应状态码: {response.status_code}")
+            status_code, html = cached_get(self.session, url, self.cache, self.offline,
+                                           rate_controller=self.rate_controller,
+                                           headers=self.headers, timeout=10)
+            if status_code is None:
+                print("离线模式下缓存中没有该页面")
+                return []
+            print(f"响应状态码: {status_code}")
 
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = self.parser_backend.parse(html)
 
             # 调试：保存HTML内容以便分析
             with open("debug_page.html", "w", encoding="utf-8") as f:
-                f.write(response.text)
+                f.write(html)
             print("已保存页面HTML到 debug_page.html")
 
             # 多种方式查找章节链接
             chapter_links = []
 
             # 方式1：通过ID查找
-            booklist = soup.find('ul', {'id': 'booklist'})
+            booklist = self.selectors.booklist.select_one(soup)
             if booklist:
                 print("找到ID为booklist的ul元素")
                 links = booklist.find_all('a', href=True)
                 print(f"在booklist中找到 {len(links)} 个链接")
             else:
                 # 方式2：通过class查找
-                booklist = soup.find('ul', class_='list-group')
+                booklist = self.selectors.list_group.select_one(soup)
                 if booklist:
                     print("找到class为list-group的ul元素")
                     links = booklist.find_all('a', href=True)
@@ -69,7 +245,7 @@ class QianlongPoetryCrawler:
 
                     # 构建完整URL
                     if href.startswith('http'):
-                        full_url = href
+                        full_url = self.rebase_url(href)
                     else:
                         full_url = self.base_url + href if href.startswith('/') else f"{self.base_url}/{href}"
 
@@ -90,150 +266,376 @@ class QianlongPoetryCrawler:
 
     def extract_poetry_content(self, html_content):
         """从HTML内容中提取诗词文本，去除翻译"""
-        try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-
-            # 移除不需要的元素
-            for element in soup(['script', 'style', 'nav', 'header', 'footer', 'aside', 'form']):
-                element.decompose()
-
-            # 尝试多种方式获取内容
-            content_areas = [
-                soup.find('div', class_='panel-body'),
-                soup.find('div', class_='content'),
-                soup.find('div', id='content'),
-                soup.find('article'),
-                soup.find('div', class_='m-summary')
-            ]
-
-            main_content = None
-            for area in content_areas:
-                if area:
-                    main_content = area
-                    break
-
-            if not main_content:
-                # 如果没有找到特定区域，使用body
-                main_content = soup.find('body')
-
-            if main_content:
-                # 获取文本内容
-                text = main_content.get_text(separator='\n', strip=True)
-
-                # 处理文本，去除翻译和注释
-                lines = text.split('\n')
-                poetry_lines = []
-
-                for line in lines:
-                    line = line.strip()
-                    if (line and
-                            len(line) > 1 and
-                            not any(keyword in line for keyword in [
-                                '翻译', '注释', '赏析', '注：', '译：', '【注】',
-                                '导航', '菜单', '首页', '搜索', '书架', '下载',
-                                'Copyright', '版权', '©'
-                            ]) and
-                            not line.startswith('function') and
-                            not 'var ' in line):
-                        poetry_lines.append(line)
-
-                content = '\n'.join(poetry_lines)
-                return content
-            else:
-                return "未能提取到内容"
-
-        except Exception as e:
-            print(f"提取内容时出错: {e}")
-            return f"提取内容时出错: {e}"
+        return extract_poetry_content(html_content, self.parser_backend, self.selectors)
 
-    def crawl_chapter(self, chapter_url):
-        """爬取单个章节的内容"""
+    def fetch_chapter_html(self, chapter_url):
+        """获取章节页面HTML，返回 (HTML, 失败时是否可以重试)"""
         try:
             print(f"正在爬取: {chapter_url}")
-            response = self.session.get(chapter_url, headers=self.headers, timeout=10)
-            response.encoding = 'utf-8'
-
-            if response.status_code == 200:
-                content = self.extract_poetry_content(response.text)
-                return content
+            status_code, html = cached_get(self.session, chapter_url, self.cache, self.offline,
+                                           rate_controller=self.rate_controller,
+                                           headers=self.headers, timeout=10)
+
+            if status_code == 200:
+                return html, False
+            elif status_code is None:
+                print("离线模式下缓存中没有该章节")
+                return None, False
             else:
-                print(f"请求失败，状态码: {response.status_code}")
-                return ""
+                print(f"请求失败，状态码: {status_code}")
+                return None, is_retryable(status_code)
         except Exception as e:
+            # 超时、连接错误等都可以重试
             print(f"爬取章节时出错 {chapter_url}: {e}")
-            return ""
-
-    def save_to_file(self, title, content):
-        """保存内容到文件"""
-        try:
-            with open(self.output_file, 'a', encoding='utf-8') as f:
-                f.write(f"\n\n{'=' * 60}\n")
-                f.write(f"{title}\n")
-                f.write(f"{'=' * 60}\n\n")
-                f.write(content)
-                f.write("\n")
-            print(f"已保存: {title}")
-        except Exception as e:
-            print(f"保存文件时出错: {e}")
-
-    def run(self, start_url):
-        """运行爬虫"""
-        print("开始爬取乾隆诗词...")
-        print(f"输出文件: {self.output_file}")
-
-        # 确保输出目录存在
-        os.makedirs(os.path.dirname(self.output_file), exist_ok=True)
-
-        # 清空或创建输出文件
-        with open(self.output_file, 'w', encoding='utf-8') as f:
-            f.write("乾隆诗词全集\n")
-            f.write("=" * 60 + "\n")
-            f.write("爬取时间: " + time.strftime("%Y-%m-%d %H:%M:%S") + "\n")
-            f.write("=" * 60 + "\n\n")
-
-        # 获取所有章节链接
+            return None, True
+
+    def defer_chapter(self, chapter, retryable, failures=0):
+        """把获取失败的章节交给重试队列，返回是否会重试"""
+        title = chapter[1]
+        if not retryable:
+            self.retry_queue.give_up(chapter)
+            print(f"章节 {title} 获取失败，跳过")
+            return False
+        if self.retry_queue.push(chapter, failures + 1):
+            print(f"章节 {title} 获取失败，稍后重试")
+            return True
+        print(f"章节 {title} 多次重试后仍然失败，跳过")
+        return False
+
+    def crawl_chapter(self, index, title, url, failures=0):
+        """爬取并保存单个章节，可重试的失败放入重试队列"""
+        html, retryable = self.fetch_chapter_html(url)
+        if html is None:
+            self.defer_chapter((index, title, url), retryable, failures)
+            return
+        self.handle_chapter(index, title, url, self.extract_poetry_content(html))
+
+    def retry_failed_chapters(self, wait=False):
+        """重试已到时间的失败章节；wait=True 时一直等到重试队列清空"""
+        while True:
+            for (index, title, url), failures in self.retry_queue.pop_ready():
+                print(f"\n重试章节: {title}（第{failures + 1}次请求）")
+                self.crawl_chapter(index, title, url, failures)
+            delay = self.retry_queue.next_due()
+            if not wait or delay is None:
+                return
+            time.sleep(delay)
+
+    def handle_chapter(self, index, title, url, content):
+        """保存一个章节的结果，并记录到断点"""
+        if content is None:
+            # 请求失败的章节不记入断点，续爬时会重新获取
+            return
+        if len(content.strip()) > 10:  # 只有有实际内容才保存
+            self.save_to_file(title, content, url, index)
+        else:
+            print(f"章节 {title} 内容为空或过短，跳过")
+        self.complete_chapter(url)
+
+    def save_to_file(self, title, content, url, index):
+        """把章节内容写入记录缓冲区"""
+        self.success_count += 1
+        self.writer.add({
+            'id': self.success_count,
+            'title': title,
+            'content': content,
+            'detail_url': url,
+            'source': 'diancang',
+            'page': index
+        })
+        print(f"已保存: {title}")
+
+    def complete_chapter(self, url):
+        """标记章节处理完毕；章节在所在批次落盘后才记入断点"""
+        self._unflushed_chapters.append(url)
+        self.writer.flush_if_full()
+
+    def _on_flush(self, size):
+        """记录批次落盘后，把其中的章节记入断点"""
+        if self._unflushed_chapters:
+            self.checkpoint.mark_done(*self._unflushed_chapters,
+                                      success_count=self.success_count,
+                                      output_size=size)
+            self._unflushed_chapters = []
+
+    def prepare_output(self, resume=True):
+        """打开记录文件；有未完成的断点时从断点处继续写入"""
+        resume_size = None
+        if resume and self.checkpoint.resumable and os.path.exists(self.records_file):
+            # 截掉断点之后写入的内容，保证续爬后不出现重复章节
+            resume_size = self.checkpoint.get('output_size')
+            self.success_count = self.checkpoint.get('success_count', 0)
+            print(f"从断点继续：已完成 {len(self.checkpoint.get('completed'))} 个章节")
+        else:
+            self.checkpoint.reset()
+            self.success_count = 0
+
+        self._unflushed_chapters = []
+        self.writer = PoetryRecordWriter(self.records_file, batch_size=self.batch_size,
+                                         resume_size=resume_size, on_flush=self._on_flush)
+        # 记录文件截断到断点之后再载入，续写部分与已保存的记录一起去重
+        self.writer.dedup = self.build_dedup_index(include_own=resume_size is not None)
+
+    def build_dedup_index(self, include_own=False):
+        """创建近似去重索引，并载入另一个站点（以及续写时本站点）已有的记录"""
+        if not self.dedup:
+            self.dedup_index = None
+            return None
+        self.dedup_index = NearDuplicateIndex()
+        paths = [path for path in self.dedup_sources if os.path.exists(path)]
+        if include_own and os.path.exists(self.records_file):
+            paths.append(self.records_file)
+        for path in paths:
+            count = self.dedup_index.seed(path)
+            print(f"去重索引已载入 {path} 中的 {count} 条记录")
+        return self.dedup_index
+
+    def finish_output(self):
+        """写入剩余记录，并导出兼容原格式的文本文件"""
+        self.writer.close()
+        failed = sorted(self.retry_queue.failed)
+        gave_up = sorted(self.retry_queue.gave_up)
+        self.checkpoint.state['gave_up'] = [url for _, _, url in gave_up]
+        if gave_up:
+            print(f"\n有{len(gave_up)}个章节无法获取（不可重试的错误）：{'、'.join(title for _, title, _ in gave_up)}")
+        if failed:
+            # 可重试的失败章节不记为完成，断点保持未结束状态，再次运行会续爬这些章节
+            self.checkpoint.state['failed'] = [url for _, _, url in failed]
+            self.checkpoint.save()
+            print(f"\n有{len(failed)}个章节最终获取失败：{'、'.join(title for _, title, _ in failed)}，"
+                  f"再次运行将从断点继续爬取这些章节")
+        else:
+            self.checkpoint.state.pop('failed', None)
+            self.checkpoint.finish()
+        export_text(self.records_file, self.output_file, style='crawler')
+        print(f"请求统计：{self.rate_controller.summary()}")
+        if self.dedup_index is not None:
+            print(self.dedup_index.summary())
+
+    def find_chapter_links(self, start_url):
+        """获取章节链接，起始页没有找到时尝试目录页"""
         chapter_links = self.get_chapter_links(start_url)
 
         if not chapter_links:
             print("未找到章节链接，尝试备用方案...")
             # 尝试使用目录页
-            catalog_url = "https://www.diancang.xyz/shicixiqu/8921/"
-            if start_url != catalog_url:
+            catalog_url = f"{self.base_url}/shicixiqu/8921/"
+            if self.rebase_url(start_url) != catalog_url:
                 chapter_links = self.get_chapter_links(catalog_url)
 
+        return chapter_links
+
+    def run(self, start_url, resume=True):
+        """运行爬虫"""
+        print("开始爬取乾隆诗词...")
+        print(f"输出文件: {self.records_file}")
+
+        self.prepare_output(resume)
+
+        # 获取所有章节链接
+        chapter_links = self.find_chapter_links(start_url)
         if not chapter_links:
             print("仍然未找到章节链接，程序退出")
+            self.writer.close()
             return
 
         print(f"开始爬取 {len(chapter_links)} 个章节...")
 
-        # 爬取每个章节
-        success_count = 0
+        # 爬取每个章节；请求节奏由速率控制器决定，到期的失败章节穿插重试
         for i, (title, url) in enumerate(chapter_links, 1):
+            if self.checkpoint.is_done(url):
+                continue
             print(f"\n进度: {i}/{len(chapter_links)} - {title}")
 
-            content = self.crawl_chapter(url)
-            if content and len(content.strip()) > 10:  # 只有有实际内容才保存
-                self.save_to_file(title, content)
-                success_count += 1
-            else:
-                print(f"章节 {title} 内容为空或过短，跳过")
+            self.crawl_chapter(i, title, url)
+            self.retry_failed_chapters()
+
+        # 等待并处理重试队列中剩余的章节
+        self.retry_failed_chapters(wait=True)
 
-            # 添加延迟，避免请求过于频繁
-            time.sleep(2)
+        self.finish_output()
 
-        print(f"\n爬取完成！成功爬取 {success_count}/{len(chapter_links)} 个章节")
-        print(f"诗词已保存到: {self.output_file}")
+        print(f"\n爬取完成！成功爬取 {self.success_count}/{len(chapter_links)} 个章节")
+        print(f"诗词已保存到: {self.records_file}（文本格式：{self.output_file}）")
+
+    def run_pipeline(self, start_url, resume=True, fetchers=4, parsers=None, queue_size=16,
+                     report_every=20):
+        """以流水线方式运行爬虫
+
+        多个抓取线程把章节HTML放入有界队列，进程池并行解析HTML，
+        主线程作为唯一的写入者按章节顺序保存结果，因此网络等待和
+        解析计算可以重叠进行。失败的章节由抓取线程在退避时间到期后优先重试。
+        各阶段的计数器保存在 self.pipeline_stats 中。
+        """
+        print(f"开始以流水线方式爬取乾隆诗词（抓取线程{fetchers}个，解析进程{parsers or os.cpu_count()}个）...")
+        print(f"输出文件: {self.records_file}")
+
+        self.prepare_output(resume)
+
+        chapter_links = self.find_chapter_links(start_url)
+        if not chapter_links:
+            print("仍然未找到章节链接，程序退出")
+            self.writer.close()
+            return
+
+        todo = [(i, title, url) for i, (title, url) in enumerate(chapter_links, 1)
+                if not self.checkpoint.is_done(url)]
+        print(f"开始爬取 {len(todo)} 个章节...")
+
+        work_queue = queue.Queue()
+        for item in todo:
+            work_queue.put(item)
+        html_queue = queue.Queue(maxsize=queue_size)    # 抓取 -> 解析
+        result_queue = queue.Queue(maxsize=queue_size)  # 解析 -> 写入
+        parsing = [0]                                   # 已提交到进程池但未完成的数量
+        parsing_lock = threading.Lock()
+        remaining = [len(todo)]                         # 尚未得到最终抓取结果的章节数
+        remaining_lock = threading.Lock()
+
+        stats = {
+            'fetch': StageStats('抓取', lambda: work_queue.qsize() + len(self.retry_queue)),
+            'parse': StageStats('解析', lambda: html_queue.qsize() + parsing[0]),
+            'write': StageStats('写入', result_queue.qsize),
+        }
+        self.pipeline_stats = stats
+        done_marker = object()
+
+        def fetch_worker():
+            while True:
+                with remaining_lock:
+                    if remaining[0] == 0:
+                        return
+                # 到期的重试优先于新章节；两者都没有时等待下一个重试到期
+                ready = self.retry_queue.pop_ready(limit=1)
+                if ready:
+                    (index, title, url), failures = ready[0]
+                else:
+                    try:
+                        index, title, url = work_queue.get_nowait()
+                        failures = 0
+                    except queue.Empty:
+                        time.sleep(min(self.retry_queue.next_due() or 0.1, 0.5))
+                        continue
+                start = time.time()
+                html, retryable = self.fetch_chapter_html(url)
+                stats['fetch'].add(time.time() - start)
+                if html is None and self.defer_chapter((index, title, url), retryable, failures):
+                    continue
+                with remaining_lock:
+                    remaining[0] -= 1
+                html_queue.put((index, title, url, html))
+
+        def on_parsed(future):
+            with parsing_lock:
+                parsing[0] -= 1
+            if not future.exception():
+                stats['parse'].add(future.result()[1])
+
+        def dispatch(pool):
+            # 把抓取到的HTML提交给进程池；结果队列有界，写入跟不上时会阻塞在这里
+            while True:
+                item = html_queue.get()
+                if item is done_marker:
+                    result_queue.put(done_marker)
+                    return
+                index, title, url, html = item
+                future = None
+                if html is not None:
+                    with parsing_lock:
+                        parsing[0] += 1
+                    future = pool.submit(_parse_chapter, html)
+                    future.add_done_callback(on_parsed)
+                result_queue.put((index, title, url, future))
+
+        fetch_threads = [threading.Thread(target=fetch_worker, daemon=True) for _ in range(fetchers)]
+
+        def close_fetch_stage():
+            for thread in fetch_threads:
+                thread.join()
+            html_queue.put(done_marker)
+
+        def write(item):
+            index, title, url, future = item
+            content = None
+            if future is not None:
+                try:
+                    content = future.result()[0]
+                except Exception as e:
+                    print(f"解析章节 {title} 时出错: {e}")
+            self.handle_chapter(index, title, url, content)
+            stats['write'].add()
+
+        with ProcessPoolExecutor(max_workers=parsers, initializer=_init_parse_worker,
+                                 initargs=(self.parser_backend.name,)) as pool:
+            for thread in fetch_threads:
+                thread.start()
+            threading.Thread(target=close_fetch_stage, daemon=True).start()
+            threading.Thread(target=dispatch, args=(pool,), daemon=True).start()
+
+            # 写入阶段：按章节顺序写入，先到的后续章节暂存在重排缓冲区中
+            order = [index for index, _, _ in todo]
+            position = 0
+            reorder = {}
+            while position < len(order):
+                item = result_queue.get()
+                if item is done_marker:
+                    break
+                reorder[item[0]] = item
+                while position < len(order) and order[position] in reorder:
+                    write(reorder.pop(order[position]))
+                    position += 1
+                    if position % report_every == 0:
+                        print(f"\n进度: {position}/{len(order)} | " + " | ".join(str(s) for s in stats.values()))
+
+            # 个别章节意外丢失时，仍按顺序写出其余已完成的章节
+            for index in order[position:]:
+                if index in reorder:
+                    write(reorder.pop(index))
+
+        self.finish_output()
+
+        print(f"\n爬取完成！成功爬取 {self.success_count}/{len(chapter_links)} 个章节")
+        print("流水线统计: " + " | ".join(str(s) for s in stats.values()))
+        print(f"诗词已保存到: {self.records_file}（文本格式：{self.output_file}）")
 
 
 def main():
+    parser = argparse.ArgumentParser(description="爬取典藏网上的乾隆御制诗章节")
+    parser.add_argument('--cache-dir', default=None, help="本地响应缓存目录，不指定则不缓存")
+    parser.add_argument('--offline', action='store_true', help="只从缓存读取页面，不访问网络（需配合 --cache-dir）")
+    parser.add_argument('--restart', action='store_true', help="忽略断点，从头开始爬取")
+    parser.add_argument('--parser', choices=available_backends(), default=None,
+                        help="HTML解析后端，默认优先使用lxml")
+    parser.add_argument('--batch-size', type=int, default=20, help="记录文件每批写入的章节数")
+    parser.add_argument('--no-dedup', action='store_true', help="不做近似去重标记")
+    parser.add_argument('--dedup-with', action='append', default=None, metavar='JSONL',
+                        help="参与去重的其他记录文件，可重复指定，默认为另一个站点的记录文件")
+    parser.add_argument('--base-url', default=None, help="站点根地址，可指向本地站点模拟器，如 http://127.0.0.1:8000")
+    parser.add_argument('--pipeline', action='store_true', help="使用抓取/解析/写入流水线模式")
+    parser.add_argument('--fetchers', type=int, default=4, help="流水线模式的抓取线程数")
+    parser.add_argument('--parsers', type=int, default=None, help="流水线模式的解析进程数，默认为CPU核数")
+    parser.add_argument('--queue-size', type=int, default=16, help="流水线各阶段之间的队列容量")
+    parser.add_argument('--interval', type=float, default=2.0, help="初始请求间隔（秒），之后由自适应速率控制自动调整")
+    parser.add_argument('--max-attempts', type=int, default=5, help="每个章节的最大请求次数")
+    args = parser.parse_args()
+
+    if args.offline and not args.cache_dir:
+        parser.error("--offline 需要同时指定 --cache-dir")
+
     # 您提供的URL
     start_url = "https://www.shidianguji.com/book/HY0939/chapter/1kduqnljmht83?version=41"
 
-    crawler = QianlongPoetryCrawler()
+    crawler = QianlongPoetryCrawler(cache_dir=args.cache_dir, offline=args.offline, parser=args.parser,
+                                    batch_size=args.batch_size, base_url=args.base_url,
+                                    request_interval=args.interval, max_attempts=args.max_attempts,
+                                    dedup=not args.no_dedup, dedup_with=args.dedup_with)
 
     try:
-        crawler.run(start_url)
+        if args.pipeline:
+            crawler.run_pipeline(start_url, resume=not args.restart, fetchers=args.fetchers,
+                                 parsers=args.parsers, queue_size=args.queue_size)
+        else:
+            crawler.run(start_url, resume=not args.restart)
     except Exception as e:
         print(f"程序运行出错: {e}")
         import traceback
@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+
+def atomic_write(path, data):
+    """先写临时文件再替换，保证文件要么是旧内容要么是完整的新内容"""
+    # 临时文件名带上进程和线程号，避免并发写同一内容对象时互相覆盖
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def content_hash(*parts):
+    """若干文本字段的摘要，用作列表条目和列表页的指纹"""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update((part or '').encode('utf-8'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """按URL索引、按内容寻址的本地HTTP响应缓存
+
+    目录结构：
+        index/<URL的sha1>.json          URL对应的元数据（内容摘要、ETag、Last-Modified、抓取时间）
+        objects/<摘要前两位>/<摘要>.z    zlib压缩后的响应正文，相同内容只保存一份
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.index_dir = os.path.join(cache_dir, 'index')
+        self.objects_dir = os.path.join(cache_dir, 'objects')
+        os.makedirs(self.index_dir, exist_ok=True)
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+    def _index_path(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.index_dir, key + '.json')
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest + '.z')
+
+    def get_entry(self, url):
+        """读取URL的缓存元数据，未缓存时返回None"""
+        try:
+            with open(self._index_path(url), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if not os.path.exists(self._object_path(entry['digest'])):
+            return None
+        return entry
+
+    def read_body(self, entry):
+        """读取并解压缓存的响应正文"""
+        with open(self._object_path(entry['digest']), 'rb') as f:
+            return zlib.decompress(f.read()).decode('utf-8')
+
+    def get(self, url):
+        """读取URL的缓存正文，未缓存时返回None"""
+        entry = self.get_entry(url)
+        return self.read_body(entry) if entry else None
+
+    def put(self, url, text, headers=None, status=200):
+        """保存响应正文及其校验头信息"""
+        body = text.encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            atomic_write(object_path, zlib.compress(body, 6))
+
+        headers = headers or {}
+        entry = {
+            'url': url,
+            'digest': digest,
+            'status': status,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'content_type': headers.get('Content-Type'),
+            'fetched_at': time.time()
+        }
+        atomic_write(self._index_path(url), json.dumps(entry, ensure_ascii=False).encode('utf-8'))
+        return entry
+
+    def touch(self, entry):
+        """服务器返回304时刷新抓取时间"""
+        entry['fetched_at'] = time.time()
+        atomic_write(self._index_path(entry['url']), json.dumps(entry, ensure_ascii=False).encode('utf-8'))
+
+    @staticmethod
+    def conditional_headers(entry):
+        """根据缓存元数据构造条件请求头"""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def entries(self):
+        """遍历所有缓存条目的元数据"""
+        for name in sorted(os.listdir(self.index_dir)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.index_dir, name), 'r', encoding='utf-8') as f:
+                    yield json.load(f)
+            except ValueError:
+                continue
+
+
+def cached_get(session, url, cache=None, offline=False, rate_controller=None, **kwargs):
+    """带缓存的GET请求，返回 (状态码, 页面文本)
+
+    offline=True 时只读缓存，未命中返回 (None, None)；
+    否则对已缓存的URL发送条件请求，服务器返回304时直接使用缓存正文。
+    指定 rate_controller 时，实际发出的网络请求由它（按站点区分时为该站点的控制器）
+    控制节奏并反馈结果。
+    """
+    entry = cache.get_entry(url) if cache is not None else None
+    if offline:
+        if entry:
+            return 200, cache.read_body(entry)
+        return None, None
+
+    if entry:
+        headers = dict(kwargs.pop('headers', None) or {})
+        headers.update(cache.conditional_headers(entry))
+        kwargs['headers'] = headers
+
+    if rate_controller is not None:
+        rate_controller = rate_controller.for_url(url)
+        rate_controller.wait()
+    try:
+        response = session.get(url, **kwargs)
+    except Exception as e:
+        if rate_controller is not None:
+            rate_controller.record(error=e)
+        raise
+    if rate_controller is not None:
+        rate_controller.record(response.status_code, retry_after=response.headers.get('Retry-After'))
+    response.encoding = 'utf-8'
+
+    if response.status_code == 304 and entry:
+        cache.touch(entry)
+        return 200, cache.read_body(entry)
+    if response.status_code == 200 and cache is not None:
+        cache.put(url, response.text, response.headers)
+    return response.status_code, response.text
+
+
+class CrawlCheckpoint:
+    """断点续爬记录：保存已完成的页面/章节以及输出文件的有效长度"""
+
+    def __init__(self, path):
+        self.path = path
+        self.state = {'completed': [], 'finished': False}
+        self._completed = set()
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.state = json.load(f)
+            except ValueError:
+                print(f"断点文件 {path} 已损坏，忽略")
+        self._completed = set(self.state.get('completed', []))
+
+    @property
+    def resumable(self):
+        """是否存在一次未完成的爬取可以继续"""
+        return bool(self._completed) and not self.state.get('finished')
+
+    def get(self, key, default=None):
+        return self.state.get(key, default)
+
+    def is_done(self, key):
+        return key in self._completed
+
+    def mark_done(self, *keys, **extra):
+        """标记页面/章节已完成，并原子地保存断点"""
+        for key in keys:
+            if key not in self._completed:
+                self._completed.add(key)
+                self.state.setdefault('completed', []).append(key)
+        self.state.update(extra)
+        self.save()
+
+    def finish(self):
+        self.state['finished'] = True
+        self.save()
+
+    def reset(self):
+        self.state = {'completed': [], 'finished': False}
+        self._completed = set()
+        self.save()
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        atomic_write(self.path, json.dumps(self.state, ensure_ascii=False).encode('utf-8'))
+
+
+class PageFingerprints:
+    """列表页指纹：记录总页数和每个列表页中诗词条目的摘要，供增量重爬判断页面是否变化"""
+
+    def __init__(self, path):
+        self.path = path
+        self.state = {'total_pages': None, 'pages': {}}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.state = json.load(f)
+            except ValueError:
+                print(f"指纹文件 {path} 已损坏，忽略")
+
+    @property
+    def total_pages(self):
+        return self.state.get('total_pages')
+
+    @total_pages.setter
+    def total_pages(self, value):
+        self.state['total_pages'] = value
+
+    def get(self, page):
+        return self.state['pages'].get(str(page))
+
+    def set(self, page, fingerprint):
+        self.state['pages'][str(page)] = fingerprint
+
+    def truncate(self, total_pages):
+        """删除超出总页数的页面指纹"""
+        self.state['pages'] = {page: fingerprint for page, fingerprint in self.state['pages'].items()
+                               if int(page) <= total_pages}
+
+    def reset(self):
+        self.state = {'total_pages': None, 'pages': {}}
+        self.save()
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        atomic_write(self.path, json.dumps(self.state, ensure_ascii=False).encode('utf-8'))
@@ -0,0 +1,215 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from 响应缓存 import ResponseCache
+
+
+class SiteEmulator:
+    """回放录制好的页面的本地站点模拟器
+
+    录制的页面来自爬虫的响应缓存目录（--cache-dir），按URL的路径和查询串索引，
+    因此两个站点的页面可以由同一个模拟器回放。可配置响应延迟、随机错误率和
+    返回的错误状态码，用于在没有网络的机器上可重复地测试并发和重试行为。
+    """
+
+    def __init__(self, record_dir, latency=0.0, jitter=0.0, error_rate=0.0,
+                 error_statuses=(503,), status_overrides=None, retry_after=None, seed=None):
+        self.cache = ResponseCache(record_dir)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_statuses = list(error_statuses)
+        self.status_overrides = status_overrides or {}
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+        # 路径（含查询串） -> 缓存条目
+        self.pages = {}
+        for entry in self.cache.entries():
+            parts = urlsplit(entry['url'])
+            path = parts.path + ('?' + parts.query if parts.query else '')
+            self.pages.setdefault(path, entry)
+
+        self.stats = {'requests': 0, 'served': 0, 'not_modified': 0, 'errors': 0,
+                      'not_found': 0, 'in_flight': 0, 'max_in_flight': 0}
+
+    def _count(self, key, delta=1):
+        with self.lock:
+            self.stats[key] += delta
+            if key == 'in_flight':
+                self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+
+    def _delay(self):
+        with self.lock:
+            delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _injected_status(self, path):
+        """返回需要注入的错误状态码，不注入时返回None"""
+        if path in self.status_overrides:
+            return self.status_overrides[path]
+        with self.lock:
+            if self.error_rate and self.random.random() < self.error_rate:
+                return self.random.choice(self.error_statuses)
+        return None
+
+    def handle(self, path, headers):
+        """处理一次GET请求，返回 (状态码, 响应头, 正文bytes)"""
+        self._count('requests')
+        self._count('in_flight')
+        try:
+            self._delay()
+
+            if path == '/__stats__':
+                with self.lock:
+                    body = json.dumps(self.stats).encode('utf-8')
+                return 200, {'Content-Type': 'application/json'}, body
+
+            status = self._injected_status(path)
+            if status is not None:
+                self._count('errors')
+                extra = {}
+                if status == 429 and self.retry_after is not None:
+                    extra['Retry-After'] = str(self.retry_after)
+                return status, extra, f"emulated error {status}".encode('utf-8')
+
+            entry = self.pages.get(path)
+            if entry is None:
+                self._count('not_found')
+                return 404, {}, b"not recorded"
+
+            # 支持条件请求，便于测试爬虫的缓存校验逻辑
+            etag = entry.get('etag')
+            if etag and headers.get('If-None-Match') == etag:
+                self._count('not_modified')
+                return 304, {'ETag': etag}, b""
+
+            response_headers = {'Content-Type': entry.get('content_type') or 'text/html; charset=utf-8'}
+            if etag:
+                response_headers['ETag'] = etag
+            if entry.get('last_modified'):
+                response_headers['Last-Modified'] = entry['last_modified']
+            self._count('served')
+            return 200, response_headers, self.cache.read_body(entry).encode('utf-8')
+        finally:
+            self._count('in_flight', -1)
+
+    def make_server(self, host='127.0.0.1', port=8000):
+        emulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                status, headers, body = emulator.handle(self.path, self.headers)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        return server
+
+
+def start_emulator(record_dir, host='127.0.0.1', port=0, **options):
+    """在后台线程中启动模拟器，返回 (server, base_url)，用于脚本化的基准测试"""
+    emulator = SiteEmulator(record_dir, **options)
+    server = emulator.make_server(host, port)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def record(args):
+    """以在线模式运行爬虫，把所有响应录制到缓存目录"""
+    if args.site == 'spider':
+        from 乾隆诗词爬取1 import QianlongPoetrySpider
+        spider = QianlongPoetrySpider(cache_dir=args.dir)
+        spider.run(max_pages=args.max_pages, resume=False)
+    else:
+        from 乾隆诗词爬取2 import QianlongPoetryCrawler
+        crawler = QianlongPoetryCrawler(cache_dir=args.dir)
+        crawler.run(args.start_url, resume=False)
+    print(f"录制完成，页面已保存到: {args.dir}")
+
+
+def parse_status_overrides(values):
+    """解析 路径=状态码 形式的固定状态码配置"""
+    overrides = {}
+    for value in values or []:
+        path, _, status = value.rpartition('=')
+        overrides[path] = int(status)
+    return overrides
+
+
+def serve(args):
+    emulator = SiteEmulator(
+        args.dir,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_statuses=args.error_status,
+        status_overrides=parse_status_overrides(args.status),
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+    server = emulator.make_server(args.host, args.port)
+    print(f"站点模拟器已启动: http://{args.host}:{args.port}，共 {len(emulator.pages)} 个录制页面")
+    print(f"爬虫可通过 --base-url http://{args.host}:{args.port} 指向模拟器，统计信息见 /__stats__")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\n请求统计: {emulator.stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="录制/回放爬虫页面的本地站点模拟器")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help="在线爬取并录制响应")
+    record_parser.add_argument('site', choices=['spider', 'crawler'],
+                               help="spider=古诗词名句网（爬取1），crawler=典藏网（爬取2）")
+    record_parser.add_argument('--dir', required=True, help="录制目录（即爬虫的响应缓存目录）")
+    record_parser.add_argument('--max-pages', type=int, default=None, help="spider 只录制前N页")
+    record_parser.add_argument('--start-url',
+                               default="https://www.shidianguji.com/book/HY0939/chapter/1kduqnljmht83?version=41",
+                               help="crawler 的起始页")
+
+    serve_parser = subparsers.add_parser('serve', help="回放录制的响应")
+    serve_parser.add_argument('--dir', required=True, help="录制目录")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8000)
+    serve_parser.add_argument('--latency', type=float, default=0.0, help="每个请求的平均延迟（秒）")
+    serve_parser.add_argument('--jitter', type=float, default=0.0, help="延迟的随机波动范围（秒）")
+    serve_parser.add_argument('--error-rate', type=float, default=0.0, help="随机返回错误的概率（0~1）")
+    serve_parser.add_argument('--error-status', type=int, nargs='+', default=[503], help="随机错误使用的状态码")
+    serve_parser.add_argument('--status', action='append', metavar='PATH=CODE',
+                              help="固定某个路径返回的状态码，可重复指定")
+    serve_parser.add_argument('--retry-after', type=int, default=None, help="429响应附带的 Retry-After 秒数")
+    serve_parser.add_argument('--seed', type=int, default=None, help="随机数种子，便于重复实验")
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        record(args)
+    else:
+        serve(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+class ParserBackend:
+    """HTML解析后端：负责构建文档树，并执行预编译好的CSS选择器
+
+    bs4 和 soupsieve 在第一次解析或编译选择器时才导入，查看帮助、离线导出等
+    不解析网页的任务启动时不必加载。
+    """
+    name = None
+    features = None
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def parse(self, html):
+        """把HTML文本解析成文档树"""
+        from bs4 import BeautifulSoup
+        return BeautifulSoup(html, self.features)
+
+    def compile(self, selector):
+        """预编译CSS选择器，避免每次查询都重新解析选择器字符串"""
+        import soupsieve
+        return soupsieve.compile(selector)
+
+
+class HtmlParserBackend(ParserBackend):
+    """Python标准库 html.parser，无需额外依赖，但速度最慢"""
+    name = 'html.parser'
+    features = 'html.parser'
+
+
+class LxmlBackend(ParserBackend):
+    """基于C实现的lxml解析器，需要 pip install lxml"""
+    name = 'lxml'
+    features = 'lxml'
+
+    @classmethod
+    def available(cls):
+        try:
+            import lxml  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+
+BACKENDS = {
+    HtmlParserBackend.name: HtmlParserBackend,
+    LxmlBackend.name: LxmlBackend,
+}
+
+
+def available_backends():
+    """返回当前环境中可用的解析后端名称"""
+    return [name for name, backend in BACKENDS.items() if backend.available()]
+
+
+def get_parser_backend(name=None):
+    """按名称获取解析后端；不指定时优先使用lxml，未安装则退回html.parser"""
+    if name is None:
+        name = LxmlBackend.name if LxmlBackend.available() else HtmlParserBackend.name
+    if name not in BACKENDS:
+        raise ValueError(f"未知的解析后端: {name}，可选: {', '.join(BACKENDS)}")
+    backend = BACKENDS[name]
+    if not backend.available():
+        raise ValueError(f"解析后端 {name} 不可用，请先安装对应的库")
+    return backend()
+
+
+class CompiledSelectors:
+    """一组按名称访问的预编译选择器；值为列表的选择器保持原有的尝试顺序"""
+
+    def __init__(self, backend, selectors):
+        for name, selector in selectors.items():
+            if isinstance(selector, (list, tuple)):
+                compiled = [backend.compile(s) for s in selector]
+            else:
+                compiled = backend.compile(selector)
+            setattr(self, name, compiled)
@@ -0,0 +1,118 @@
+import argparse
+import glob
+import os
+import statistics
+import time
+
+from 响应缓存 import ResponseCache
+from 解析后端 import available_backends
+from 乾隆诗词爬取1 import QianlongPoetrySpider
+from 乾隆诗词爬取2 import QianlongPoetryCrawler
+
+
+def page_kind(name):
+    """根据URL或文件名判断页面类型：列表页、详情页或章节页"""
+    if '/gushi/shi/' in name or os.path.basename(name).startswith('detail'):
+        return 'detail'
+    if '/shiren/qianlong' in name or os.path.basename(name).startswith('list'):
+        return 'list'
+    return 'chapter'
+
+
+def load_fixtures(html_dir=None, cache_dir=None, limit=None):
+    """读取保存好的HTML样本，返回 [(页面类型, 名称, HTML)]"""
+    fixtures = []
+    if html_dir:
+        for path in sorted(glob.glob(os.path.join(html_dir, '*.html'))):
+            with open(path, 'r', encoding='utf-8') as f:
+                fixtures.append((page_kind(path), path, f.read()))
+    if cache_dir:
+        cache = ResponseCache(cache_dir)
+        for entry in cache.entries():
+            fixtures.append((page_kind(entry['url']), entry['url'], cache.read_body(entry)))
+
+    if limit:
+        # 每种页面类型最多取 limit 个样本
+        counts = {}
+        selected = []
+        for fixture in fixtures:
+            counts[fixture[0]] = counts.get(fixture[0], 0) + 1
+            if counts[fixture[0]] <= limit:
+                selected.append(fixture)
+        fixtures = selected
+    return fixtures
+
+
+def benchmark(fixtures, backend_names, repeat=3):
+    """对每个解析后端测量各类页面的单页解析耗时（毫秒）"""
+    results = {}
+    for name in backend_names:
+        spider = QianlongPoetrySpider(parser=name)
+        crawler = QianlongPoetryCrawler(parser=name)
+        parse_funcs = {
+            'list': spider.extract_list_items,
+            'detail': spider.parse_poetry_detail,
+            'chapter': crawler.extract_poetry_content,
+        }
+
+        timings = {}
+        for kind, _, html in fixtures:
+            parse = parse_funcs[kind]
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                parse(html)
+                elapsed = (time.perf_counter() - start) * 1000
+                best = elapsed if best is None else min(best, elapsed)
+            timings.setdefault(kind, []).append(best)
+        results[name] = timings
+    return results
+
+
+def print_report(results):
+    print("\n{:<12} {:<8} {:>6} {:>10} {:>10} {:>10}".format("解析后端", "页面类型", "页数", "平均(ms)", "中位(ms)", "最大(ms)"))
+    print("-" * 62)
+    for name, timings in results.items():
+        for kind in ('list', 'detail', 'chapter'):
+            values = timings.get(kind)
+            if not values:
+                continue
+            print("{:<12} {:<8} {:>6} {:>10.2f} {:>10.2f} {:>10.2f}".format(
+                name, kind, len(values), statistics.mean(values), statistics.median(values), max(values)))
+
+    # 与标准库 html.parser 对比的加速比
+    baseline = results.get('html.parser')
+    if baseline:
+        print()
+        for name, timings in results.items():
+            if name == 'html.parser':
+                continue
+            for kind, values in timings.items():
+                if baseline.get(kind):
+                    speedup = statistics.mean(baseline[kind]) / statistics.mean(values)
+                    print(f"{name} 相对 html.parser（{kind}）: {speedup:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较各HTML解析后端在已保存页面上的解析耗时")
+    parser.add_argument('--html-dir', help="HTML样本目录（文件名以 list/detail 开头区分页面类型，其余视为章节页）")
+    parser.add_argument('--cache-dir', help="爬虫的本地响应缓存目录")
+    parser.add_argument('--backends', nargs='+', default=available_backends(), help="要比较的解析后端")
+    parser.add_argument('--repeat', type=int, default=3, help="每个页面重复解析次数，取最快一次")
+    parser.add_argument('--limit', type=int, default=None, help="每种页面类型最多使用的样本数")
+    args = parser.parse_args()
+
+    if not args.html_dir and not args.cache_dir:
+        parser.error("请通过 --html-dir 或 --cache-dir 指定HTML样本")
+
+    fixtures = load_fixtures(args.html_dir, args.cache_dir, args.limit)
+    if not fixtures:
+        print("没有找到HTML样本")
+        return
+    print(f"共加载 {len(fixtures)} 个HTML样本，比较解析后端: {', '.join(args.backends)}")
+
+    print_report(benchmark(fixtures, args.backends, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import json
+import os
+import time
+
+
+class PoetryRecordWriter:
+    """缓冲写入的JSONL诗词记录存储
+
+    每行一条记录，字段为 id、title、content、detail_url、source、page。
+    记录先缓存在内存中，由调用方在页面/章节边界调用 flush_if_full()，
+    攒够 batch_size 条后整批一次写入并 fsync。进程在写入中途崩溃时，
+    文件末尾最多残留半行，读取时会被忽略，续爬时再按断点截断，
+    因此每个批次要么完整落盘、要么等同于不存在。
+    指定 dedup（近似去重索引）时，每条记录在进入缓冲区前标记近似重复的内容。
+    """
+
+    def __init__(self, path, batch_size=200, resume_size=None, on_flush=None, dedup=None):
+        self.path = path
+        self.batch_size = batch_size
+        self.on_flush = on_flush
+        self.dedup = dedup
+        self._buffer = []
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if resume_size is not None and os.path.exists(path):
+            # 续写：截掉最后一次成功写入之后的内容
+            self._file = open(path, 'r+b')
+            self._file.truncate(resume_size)
+            self._file.seek(resume_size)
+        else:
+            self._file = open(path, 'wb')
+        self.size = self._file.tell()
+
+    def add(self, record):
+        """添加一条记录到缓冲区"""
+        if self.dedup is not None:
+            self.dedup.annotate(record)
+        self._buffer.append(record)
+
+    @property
+    def pending(self):
+        return len(self._buffer)
+
+    def flush_if_full(self):
+        """缓冲区达到批量大小时写入文件"""
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """把缓冲区中的记录整批写入文件"""
+        if self._buffer:
+            data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in self._buffer)
+            self._file.write(data.encode('utf-8'))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._buffer = []
+            self.size = self._file.tell()
+        if self.on_flush:
+            self.on_flush(self.size)
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# 分词脚本（乾隆分词.py）和模糊匹配脚本也从这里导入
+def iter_records(path):
+    """逐条读取JSONL记录，忽略文件末尾未写完的半行"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_num, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                print(f"记录文件 {path} 第{line_num}行不完整，已忽略")
+
+
+def strip_duplicates(record):
+    """去掉爬虫去重阶段标记的同一站点内的近似重复内容，返回 (剩余正文, 去掉的诗数)
+
+    带 dup_of 的记录整条重复，返回 (None, 1)；整章记录中 dup_lines 标记的行区间被删除。
+    与另一个站点重复的标记（cross_dup_of、cross_dup_lines）不影响结果。
+    """
+    if record.get('dup_of'):
+        return None, 1
+    dup_lines = record.get('dup_lines', [])
+    if not dup_lines:
+        return record['content'], 0
+    lines = record['content'].split('\n')
+    for start, end in dup_lines:
+        lines[start:end] = [None] * (end - start)
+    return '\n'.join(line for line in lines if line is not None), len(dup_lines)
+
+
+def records_path_for(text_path):
+    """文本输出文件对应的记录文件路径"""
+    return os.path.splitext(text_path)[0] + '.jsonl'
+
+
+def export_text(records_path, text_path, style='spider', skip_duplicates=True):
+    """把记录导出为原有的文本格式，供仍读取文本文件的脚本使用
+
+    style='spider'  对应乾隆诗词.txt：序号.《标题》、正文、50个'-'分隔
+    style='crawler' 对应乾隆诗词2.txt：60个'='包围的章节标题和正文
+    记录按页码稳定排序，序号重新连续编号。skip_duplicates=True 时按 strip_duplicates
+    去掉同一站点内的近似重复内容，读取文本文件的分词、意象统计不会重复计数。
+    """
+    records = []
+    skipped = 0
+    for record in iter_records(records_path):
+        if skip_duplicates:
+            content, removed = strip_duplicates(record)
+            skipped += removed
+            if content is None:
+                continue
+            record['content'] = content
+        records.append(record)
+    records.sort(key=lambda record: record.get('page') or 0)
+    if skipped:
+        print(f"导出文本时去掉近似重复的诗词 {skipped} 首")
+
+    tmp_path = text_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        if style == 'spider':
+            f.write("乾隆诗词全集\n")
+            f.write("=" * 50 + "\n\n")
+            for i, record in enumerate(records, 1):
+                f.write(f"{i}.《{record['title']}》\n")
+                f.write(f"{record['content']}\n")
+                f.write("-" * 50 + "\n\n")
+        elif style == 'crawler':
+            f.write("乾隆诗词全集\n")
+            f.write("=" * 60 + "\n")
+            f.write("爬取时间: " + time.strftime("%Y-%m-%d %H:%M:%S") + "\n")
+            f.write("=" * 60 + "\n\n")
+            for record in records:
+                f.write(f"\n\n{'=' * 60}\n")
+                f.write(f"{record['title']}\n")
+                f.write(f"{'=' * 60}\n\n")
+                f.write(record['content'])
+                f.write("\n")
+        else:
+            raise ValueError(f"未知的导出格式: {style}")
+    os.replace(tmp_path, text_path)
+    return len(records)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="把JSONL诗词记录导出为文本格式")
+    parser.add_argument('records', help="JSONL记录文件")
+    parser.add_argument('output', help="导出的文本文件")
+    parser.add_argument('--style', choices=['spider', 'crawler'], default='spider', help="文本格式")
+    parser.add_argument('--keep-duplicates', action='store_true', help="保留同一站点内标记为近似重复的内容")
+    args = parser.parse_args()
+
+    count = export_text(args.records, args.output, args.style, skip_duplicates=not args.keep_duplicates)
+    print(f"已导出 {count} 条记录到: {args.output}")
@@ -0,0 +1,169 @@
+import random
+import re
+import zlib
+
+from 诗词存储 import iter_records
+
+
+# 整章保存、一条记录包含多首诗的来源，按诗拆分后再去重
+MULTI_POEM_SOURCES = {'diancang'}
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_NON_HAN = re.compile(r'[^㐀-鿿]')
+
+
+def normalize_text(text):
+    """只保留汉字，忽略标点、空白和网页残留的字母数字"""
+    return _NON_HAN.sub('', text or '')
+
+
+def split_poems(lines):
+    """把整章正文按标题行拆分成单首诗，返回 [(起始行, 结束行)]，结束行不含
+
+    正文行都带有逗号或句号，不含这两种标点的短行视为下一首诗的标题。
+    """
+    spans = []
+    start = 0
+    for i, line in enumerate(lines):
+        is_title = line and len(line) <= 30 and '，' not in line and '。' not in line
+        if is_title and i > start:
+            spans.append((start, i))
+            start = i
+    if start < len(lines):
+        spans.append((start, len(lines)))
+    return spans
+
+
+class NearDuplicateIndex:
+    """流式MinHash/LSH近似去重索引
+
+    每首诗按汉字 shingle_size 元组取 num_perm 个最小哈希作为签名，签名分成 bands 段，
+    任意一段完全相同的诗才作为候选，再用签名估计的Jaccard相似度确认，因此每次插入
+    只和少数候选比较。每个重复簇只保留第一次出现的诗（簇代表）的签名。
+
+    同一来源内的重复和跨来源的重复分开处理：诗只会被同来源的簇代表判为重复；
+    只与其他来源的诗相似时，它仍作为本来源的簇代表加入索引，另外报告跨来源的匹配。
+    """
+
+    def __init__(self, num_perm=64, bands=16, shingle_size=3, threshold=0.7, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm 必须能被 bands 整除")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+
+        rng = random.Random(seed)
+        self._permutations = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+                              for _ in range(num_perm)]
+        self._buckets = [{} for _ in range(bands)]   # 每段签名 -> 簇代表列表
+        self._signatures = {}                        # 簇代表 -> 签名
+        self.cluster_sizes = {}                      # 簇代表 -> 簇大小
+        self.stats = {'poems': 0, 'duplicates': 0, 'cross_source': 0, 'comparisons': 0}
+
+    def shingles(self, text):
+        text = normalize_text(text)
+        k = self.shingle_size
+        if len(text) <= k:
+            return {text} if text else set()
+        return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+    def signature(self, text):
+        """MinHash签名；没有汉字的文本返回None"""
+        hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in self.shingles(text)]
+        if not hashes:
+            return None
+        return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) & _MAX_HASH
+                     for a, b in self._permutations)
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows] for i in range(self.bands)]
+
+    def add(self, key, text):
+        """插入一首诗，返回 (同来源簇代表的键, 跨来源簇代表的键)，不重复的一项为None"""
+        signature = self.signature(text)
+        if signature is None:
+            return None, None
+        self.stats['poems'] += 1
+        band_keys = self._band_keys(signature)
+
+        # 候选：任意一段签名相同的簇代表
+        candidates = set()
+        for bucket, band_key in zip(self._buckets, band_keys):
+            candidates.update(bucket.get(band_key, ()))
+
+        # 分别找同来源和跨来源中最相似的簇代表
+        source = key.split(':', 1)[0]
+        best = {True: (None, self.threshold), False: (None, self.threshold)}
+        for candidate in candidates:
+            self.stats['comparisons'] += 1
+            other = self._signatures[candidate]
+            score = sum(x == y for x, y in zip(signature, other)) / self.num_perm
+            same = candidate.split(':', 1)[0] == source
+            if score >= best[same][1]:
+                best[same] = (candidate, score)
+        same_source, cross_source = best[True][0], best[False][0]
+
+        if same_source is not None:
+            self.cluster_sizes[same_source] += 1
+            self.stats['duplicates'] += 1
+            return same_source, None
+
+        if cross_source is not None:
+            self.cluster_sizes[cross_source] += 1
+            self.stats['cross_source'] += 1
+        self._signatures[key] = signature
+        self.cluster_sizes[key] = 1
+        for bucket, band_key in zip(self._buckets, band_keys):
+            bucket.setdefault(band_key, []).append(key)
+        return None, cross_source
+
+    def annotate(self, record):
+        """把一条爬虫记录加入索引并标记重复内容
+
+        单首诗的记录与同来源的诗重复时写入 dup_of（簇代表的键），与其他来源的诗重复时
+        写入 cross_dup_of；整章记录按诗拆分，重复的诗所在的行区间相应写入 dup_lines
+        或 cross_dup_lines。下游分词只跳过同来源的重复，跨来源的标记仅供参考。
+        """
+        key = f"{record.get('source')}:{record.get('id')}"
+        for field in ('dup_of', 'dup_lines', 'cross_dup_of', 'cross_dup_lines'):
+            record.pop(field, None)
+        if record.get('source') not in MULTI_POEM_SOURCES:
+            dup_of, cross_dup_of = self.add(key, record.get('content'))
+            if dup_of:
+                record['dup_of'] = dup_of
+            if cross_dup_of:
+                record['cross_dup_of'] = cross_dup_of
+            return record
+
+        lines = (record.get('content') or '').split('\n')
+        dup_lines, cross_dup_lines = [], []
+        for n, (start, end) in enumerate(split_poems(lines)):
+            # 只比较正文，标题行不参与
+            body = '\n'.join(lines[start + 1:end])
+            dup_of, cross_dup_of = self.add(f"{key}#{n}", body)
+            if dup_of:
+                dup_lines.append([start, end])
+            elif cross_dup_of:
+                cross_dup_lines.append([start, end])
+        if dup_lines:
+            record['dup_lines'] = dup_lines
+        if cross_dup_lines:
+            record['cross_dup_lines'] = cross_dup_lines
+        return record
+
+    def seed(self, records_path):
+        """把已有记录文件中的诗依次加入索引，返回读取的记录数"""
+        count = 0
+        for record in iter_records(records_path):
+            self.annotate(record)
+            count += 1
+        return count
+
+    def summary(self):
+        sizes = [size for size in self.cluster_sizes.values() if size > 1]
+        return (f"去重索引共{self.stats['poems']}首诗，同来源近似重复{self.stats['duplicates']}首，"
+                f"与其他来源重复{self.stats['cross_source']}首，重复簇{len(sizes)}个，"
+                f"最大簇{max(sizes, default=1)}首，候选比较{self.stats['comparisons']}次")
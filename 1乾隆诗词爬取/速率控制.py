@@ -0,0 +1,191 @@
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+
+def is_retryable(status_code):
+    """限流（429）和服务器错误（5xx）可以重试，其余状态码视为永久失败"""
+    return status_code == 429 or (status_code is not None and status_code >= 500)
+
+
+class AdaptiveRateController:
+    """自适应请求速率控制（加性增、乘性减）
+
+    每个请求发出前调用 wait()/wait_async() 领取发送时刻，请求结束后调用 record()。
+    连续 success_window 个健康响应后请求速率加 increase_step（次/秒）；
+    遇到429、5xx或超时等网络错误时速率除以 backoff_factor，并遵守 Retry-After。
+    线程安全，串行、线程池和异步模式可以共用同一个实例。
+    """
+
+    def __init__(self, initial_interval=1.0, min_interval=0.1, max_interval=30.0,
+                 increase_step=0.1, backoff_factor=2.0, success_window=10):
+        self.min_rate = 1.0 / max_interval
+        self.max_rate = 1.0 / min_interval
+        self.rate = min(self.max_rate, max(self.min_rate, 1.0 / initial_interval))
+        self.increase_step = increase_step
+        self.backoff_factor = backoff_factor
+        self.success_window = success_window
+
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+        self._successes = 0
+        self._last_backoff = 0.0
+        self.stats = {'requests': 0, 'throttled': 0, 'errors': 0}
+
+    @property
+    def interval(self):
+        return 1.0 / self.rate
+
+    def _reserve(self):
+        """领取下一个发送时刻，返回需要等待的秒数"""
+        with self._lock:
+            now = time.time()
+            send_at = max(now, self._next_time)
+            self._next_time = send_at + 1.0 / self.rate
+            self.stats['requests'] += 1
+            return send_at - now
+
+    def wait(self):
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait_async(self):
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def record(self, status_code=None, error=None, retry_after=None):
+        """根据响应结果调整速率；retry_after 可以是秒数或原始的 Retry-After 头"""
+        retry_after = parse_retry_after(retry_after)
+        with self._lock:
+            now = time.time()
+            if error is not None or is_retryable(status_code):
+                self.stats['errors' if error is not None else 'throttled'] += 1
+                self._successes = 0
+                # 并发请求常常同时失败，一个间隔内只退避一次
+                if now - self._last_backoff >= 1.0 / self.rate:
+                    self.rate = max(self.min_rate, self.rate / self.backoff_factor)
+                    self._last_backoff = now
+                if retry_after:
+                    self._next_time = max(self._next_time, now + retry_after)
+            else:
+                self._successes += 1
+                if self._successes >= self.success_window:
+                    self.rate = min(self.max_rate, self.rate + self.increase_step)
+                    self._successes = 0
+
+    def for_url(self, url):
+        """单个控制器对所有站点共用同一个速率"""
+        return self
+
+    def summary(self):
+        return (f"请求{self.stats['requests']}次，限流/服务器错误{self.stats['throttled']}次，"
+                f"网络错误{self.stats['errors']}次，当前速率{self.rate:.2f}次/秒")
+
+
+class HostRateControllers:
+    """按站点分别进行自适应速率控制
+
+    每个站点（URL的 netloc）第一次请求时创建自己的 AdaptiveRateController，
+    某个站点限流或出错时只降低该站点的速率，不影响其他站点。线程安全。
+    """
+
+    def __init__(self, **options):
+        self.options = options
+        self.controllers = {}
+        self._lock = threading.Lock()
+
+    def for_url(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            controller = self.controllers.get(host)
+            if controller is None:
+                controller = self.controllers[host] = AdaptiveRateController(**self.options)
+            return controller
+
+    def summary(self):
+        with self._lock:
+            controllers = sorted(self.controllers.items())
+        if not controllers:
+            return "没有发出网络请求"
+        return '；'.join(f"{host}：{controller.summary()}" for host, controller in controllers)
+
+
+def parse_retry_after(value):
+    """解析秒数形式的 Retry-After 头，无法解析时返回None"""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryQueue:
+    """有界重试队列：失败的请求按带抖动的指数退避时间排队等待重试
+
+    队列已满或超过最大尝试次数的请求不会被静默丢弃，而是记录在 failed 中，
+    由调用方汇报并保留在断点里，下次运行时继续爬取。不可重试的失败（如404）
+    单独记录在 gave_up 中，再次运行也不会成功，不阻止爬取结束。线程安全。
+    """
+
+    def __init__(self, maxsize=1000, max_attempts=5, base_delay=2.0, max_delay=120.0, seed=None):
+        self.maxsize = maxsize
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failed = []
+        self.gave_up = []
+        self._heap = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+    def backoff(self, attempt):
+        """第 attempt 次失败后的等待时间：指数增长，上半段随机抖动"""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        with self._lock:
+            return delay / 2 + self._random.uniform(0, delay / 2)
+
+    def push(self, item, attempt):
+        """登记第 attempt 次失败的请求；放弃重试时返回False"""
+        if attempt >= self.max_attempts:
+            with self._lock:
+                self.failed.append(item)
+            return False
+        due = time.time() + self.backoff(attempt)
+        with self._lock:
+            if len(self._heap) >= self.maxsize:
+                self.failed.append(item)
+                return False
+            heapq.heappush(self._heap, (due, next(self._counter), item, attempt))
+        return True
+
+    def give_up(self, item):
+        """登记不可重试的失败请求"""
+        with self._lock:
+            self.gave_up.append(item)
+
+    def pop_ready(self, limit=None):
+        """取出已到重试时间的请求，返回 [(item, 已失败次数)]"""
+        ready = []
+        now = time.time()
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and (limit is None or len(ready) < limit):
+                _, _, item, attempt = heapq.heappop(self._heap)
+                ready.append((item, attempt))
+        return ready
+
+    def next_due(self):
+        """距离最早一个重试时间的秒数，队列为空时返回None"""
+        with self._lock:
+            if not self._heap:
+                return None
+            return max(0.0, self._heap[0][0] - time.time())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._heap)
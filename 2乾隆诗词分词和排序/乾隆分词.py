@@ -1,118 +1,310 @@
-import jieba
-import jieba.posseg as pseg
-from collections import Counter
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import hashlib
+import itertools
+import logging
+import os
 import re
+import sys
 
+from 分词缓存 import SegmentationCache
+from 词典缓存 import dictionary_version, load_dictionary
+from 古诗分词器 import MODEL_VERSION, CharStatistics, ClassicalSegmenter
+from 词性筛选 import LookupWordFilter
+from 词频矩阵 import TermMatrixWriter
 
-def process_qianlong_poems():
-    # 文件路径
-    input_file = r"C:\Users\任宇轩\Desktop\用户数据\乾隆诗词1.txt"
-    output_seg_file = r"C:\Users\任宇轩\Desktop\用户数据\乾隆分词.txt"
-    output_sort_file = r"C:\Users\任宇轩\Desktop\用户数据\乾隆排序.txt"
+# JSONL记录的读写在爬虫目录的 诗词存储.py 中，与爬虫共用
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, '1乾隆诗词爬取'))
+from 诗词存储 import iter_records, strip_duplicates  # noqa: E402
 
-    # 加载自定义词典（针对古诗词优化）
-    def load_poem_dict():
-        # 古诗词常见意象词汇
-        poem_words = [
-            '青山', '绿水', '明月', '清风', '白云', '碧波', '烟霞', '云雾', '松柏', '梅花',
-            '竹子', '菊花', '荷花', '杨柳', '梧桐', '兰花', '牡丹', '桃花', '杏花', '梨花',
-            '春风', '秋雨', '冬雪', '夏日', '霜露', '雷电', '虹霓', '星辰', '日月', '天地',
-            '江河', '湖海', '山川', '峰峦', '溪涧', '泉水', '瀑布', '波涛', '舟船', '桥梁',
-            '亭台', '楼阁', '宫殿', '寺庙', '园林', '庭院', '书房', '琴瑟', '棋局', '书画',
-            '酒杯', '茶具', '香炉', '宝剑', '弓箭', '马匹', '牛羊', '鸡犬', '鸟雀', '鱼龙',
-            '蝴蝶', '蜜蜂', '蝉鸣', '雁阵', '孤帆', '远影', '落日', '朝阳', '黄昏', '夜晚',
-            '思念', '忧愁', '欢乐', '寂寞', '孤独', '逍遥', '自在', '清闲', '忙碌', '辛勤',
-            '功名', '富贵', '贫贱', '荣辱', '得失', '成败', '兴衰', '古今', '往来', '始终'
-        ]
-
-        # 将这些词添加到分词词典中
-        for word in poem_words:
-            jieba.add_word(word, freq=1000, tag='n')
-
-    # 加载古诗词词典
-    load_poem_dict()
-
-    # 读取文件
-    try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-    except FileNotFoundError:
-        print(f"文件 {input_file} 未找到")
-        return
-    except Exception as e:
-        print(f"读取文件时出错: {e}")
-        return
 
-    # 提取诗词内容（去除标题和分隔线）
-    poems = []
-    lines = content.split('\n')
-    current_poem = []
+# 古诗词常见意象词汇
+POEM_WORDS = [
+    '青山', '绿水', '明月', '清风', '白云', '碧波', '烟霞', '云雾', '松柏', '梅花',
+    '竹子', '菊花', '荷花', '杨柳', '梧桐', '兰花', '牡丹', '桃花', '杏花', '梨花',
+    '春风', '秋雨', '冬雪', '夏日', '霜露', '雷电', '虹霓', '星辰', '日月', '天地',
+    '江河', '湖海', '山川', '峰峦', '溪涧', '泉水', '瀑布', '波涛', '舟船', '桥梁',
+    '亭台', '楼阁', '宫殿', '寺庙', '园林', '庭院', '书房', '琴瑟', '棋局', '书画',
+    '酒杯', '茶具', '香炉', '宝剑', '弓箭', '马匹', '牛羊', '鸡犬', '鸟雀', '鱼龙',
+    '蝴蝶', '蜜蜂', '蝉鸣', '雁阵', '孤帆', '远影', '落日', '朝阳', '黄昏', '夜晚',
+    '思念', '忧愁', '欢乐', '寂寞', '孤独', '逍遥', '自在', '清闲', '忙碌', '辛勤',
+    '功名', '富贵', '贫贱', '荣辱', '得失', '成败', '兴衰', '古今', '往来', '始终'
+]
+
+
+# 加载自定义词典（针对古诗词优化）
+def load_poem_dict():
+    """返回使用古诗词词典的词性标注器
+
+    自定义词汇预先合并进带版本号的词典文件，前缀词典有磁盘缓存，
+    不再逐个调用 jieba.add_word；首次调用时才导入jieba并加载，之后直接复用。
+    """
+    return load_dictionary(POEM_WORDS, freq=1000, tag='n')
+
+
+# 分词引擎：jieba（默认）或针对五言、七言诗句的古诗分词器
+ENGINES = ('jieba', 'classical')
+# jieba引擎的筛选方式：pos 完整词性标注后逐词筛选（默认），lookup 查预先计算的保留表（较快）。
+# lookup 依赖jieba的内部实现，启用时用语料开头的 LOOKUP_VERIFY_POEMS 首诗与 pos 核对，不一致时改用 pos
+FILTER_MODES = ('pos', 'lookup')
+LOOKUP_VERIFY_POEMS = 1000
+_segment_func = None
+_segmenter_args = ('jieba', None, 'pos')
+
+
+def use_segmenter(engine='jieba', char_stats=None, filter_mode='pos', verify_sample=()):
+    """选择本进程使用的分词引擎，返回 诗词 -> 筛选后词汇 的函数
+
+    classical 引擎需要语料的字符统计 char_stats；filter_mode 只对jieba引擎有效，
+    verify_sample 为 lookup 筛选启用前用来与 pos 筛选核对的诗词。
+    """
+    global _segment_func, _segmenter_args
+    if engine == 'jieba':
+        pos_tokenizer = load_poem_dict()
+        if filter_mode not in FILTER_MODES:
+            raise ValueError(f"未知的筛选方式: {filter_mode}，可选: {', '.join(FILTER_MODES)}")
+        word_filter = None
+        if filter_mode == 'lookup':
+            word_filter = LookupWordFilter.load(pos_tokenizer, keep_word, SEGMENT_VERSION, sample=verify_sample)
+            if word_filter is None:
+                print("查表筛选与词性标注结果不一致（jieba内部实现可能已变化），改用 pos 筛选")
+                # 分词进程按 _segmenter_args 初始化，同样改用 pos 筛选
+                filter_mode = 'pos'
+        if word_filter is not None:
+            _segment_func = word_filter.filter
+        else:
+            _segment_func = lambda poem: filter_words(pos_tokenizer.cut(poem))
+    elif engine == 'classical':
+        segmenter = ClassicalSegmenter.load(POEM_WORDS, char_stats)
+        _segment_func = lambda poem: filter_words(segmenter.cut(poem))
+    else:
+        raise ValueError(f"未知的分词引擎: {engine}，可选: {', '.join(ENGINES)}")
+    _segmenter_args = (engine, char_stats, filter_mode)
+    return _segment_func
+
+
+# 筛选规则或分词方式变化时递增，使旧的分词缓存失效
+SEGMENT_VERSION = 1
+
+
+def segmentation_fingerprint(engine='jieba', char_stats=None):
+    """分词环境指纹：合并词典的版本（jieba版本、词典内容和自定义词汇）、分词引擎与筛选规则版本
+
+    古诗分词器的结果还取决于语料的字符统计，因此同时计入统计内容的摘要。
+    """
+    version = dictionary_version(POEM_WORDS, freq=1000, tag='n')
+    if engine == 'classical':
+        version += f" classical v{MODEL_VERSION} {char_stats.digest() if char_stats else ''}"
+    return hashlib.sha1(f"{version} v{SEGMENT_VERSION}".encode('utf-8')).hexdigest()
+
+
+def keep_word(word, flag):
+    """筛选规则：是否保留词性为 flag 的词"""
+    # 保留有意义的词性：名词、动词、形容词、成语等
+    if flag.startswith(('n', 'v', 'a', 'j', 'l')) and len(word) >= 2:
+        return True
+    # 也保留一些常见的单字意象词
+    return len(word) == 1 and word in '风花雪月山水天地人'
+
+
+def filter_words(words):
+    """筛选有意义的词汇（名词、动词、形容词等）"""
+    return [word for word, flag in words if keep_word(word, flag)]
+
+
+def segment_poem(poem):
+    """使用当前分词引擎（默认jieba词性标注后筛选）分词，返回筛选后的词汇"""
+    segment = _segment_func or use_segmenter()
+    return segment(poem)
 
-    for line in lines:
-        line = line.strip()
-        if line.startswith('《') or line.startswith('1.') or line.startswith('2.') or line.isdigit():
-            # 标题行，跳过
-            continue
-        elif line.startswith('--------------------------------------------------'):
-            # 分隔线，如果当前有诗词内容则保存
-            if current_poem:
-                poems.append(''.join(current_poem))
-                current_poem = []
-        elif line and not line.startswith('乾隆诗词全集') and not line.startswith('='):
-            # 诗词内容行
-            current_poem.append(line)
+
+def _init_segment_worker(engine='jieba', char_stats=None, filter_mode='pos'):
+    """分词进程初始化：每个进程只加载一次词典和自定义词汇"""
+    import jieba
+    jieba.setLogLevel(logging.INFO)
+    use_segmenter(engine, char_stats, filter_mode)
+
+
+def segment_poems(poems, workers=1, chunksize=64):
+    """对诗词逐首分词，结果与输入顺序一致
+
+    workers > 1 时把诗词分块交给进程池并行分词，每个进程启动时加载一次当前分词引擎；
+    pool.map 按输入顺序返回结果，因此与串行分词的输出完全相同。
+    """
+    if workers <= 1:
+        return [segment_poem(poem) for poem in poems]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_segment_worker,
+                             initargs=_segmenter_args) as pool:
+        return list(pool.map(segment_poem, poems, chunksize=chunksize))
+
+
+def iter_poems_from_records(file_path, skip_duplicates=True):
+    """从爬虫输出的JSONL记录文件中逐条读取诗词正文（每条记录一首）
+
+    skip_duplicates=True 时按 strip_duplicates 跳过爬虫去重阶段标记的同一站点内的
+    近似重复内容；爬虫导出的文本文件同样已去掉这些内容。
+    """
+    skipped = 0
+    for record in iter_records(file_path):
+        content = record['content']
+        if skip_duplicates:
+            content, removed = strip_duplicates(record)
+            skipped += removed
+            if content is None:
+                continue
+        content = ''.join(part.strip() for part in content.split('\n') if part.strip())
+        if content:
+            yield content
+    if skipped:
+        print(f"跳过近似重复的诗词 {skipped} 首")
+
+
+def iter_poems_from_text(file_path):
+    """逐行读取文本格式的诗词文件，提取诗词内容（去除标题和分隔线）"""
+    current_poem = []
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('《') or line.startswith('1.') or line.startswith('2.') or line.isdigit():
+                # 标题行，跳过
+                continue
+            elif line.startswith('--------------------------------------------------'):
+                # 分隔线，如果当前有诗词内容则保存
+                if current_poem:
+                    yield ''.join(current_poem)
+                    current_poem = []
+            elif line and not line.startswith('乾隆诗词全集') and not line.startswith('='):
+                # 诗词内容行
+                current_poem.append(line)
 
     # 处理最后一首诗词
     if current_poem:
-        poems.append(''.join(current_poem))
+        yield ''.join(current_poem)
+
+
+def iter_poems(file_path):
+    """按文件格式逐首读取诗词，JSONL记录文件的标题和正文分开存储，无需按文本格式猜测"""
+    if file_path.endswith('.jsonl'):
+        return iter_poems_from_records(file_path)
+    return iter_poems_from_text(file_path)
+
+
+def iter_segmented(poems, workers=1, cache=None, chunk_size=256):
+    """流式分词：按块读取诗词，逐首产出筛选后的词汇列表，顺序与输入一致
 
-    print(f"共提取到 {len(poems)} 首诗词")
+    任意时刻只有有限个块在内存中：串行时一次一块；并行时最多 2*workers 个块
+    在进程池中等待，读取速度不会超过分词速度。指定 cache 时每块先查分词缓存，
+    只有未命中的诗词才交给分词进程。
+    """
+    poems = iter(poems)
+    chunks = iter(lambda: list(itertools.islice(poems, chunk_size)), [])
 
-    # 分词处理
-    all_words = []
-    segmented_poems = []
+    def prepare(chunk):
+        if cache is None:
+            return None, chunk
+        lookup = cache.lookup(chunk)
+        return lookup, list(lookup[2].values())
 
-    for i, poem in enumerate(poems):
-        if not poem.strip():
-            continue
+    def finish(lookup, results):
+        return results if lookup is None else cache.complete(*lookup, results)
 
-        # 使用jieba进行分词和词性标注
-        words = pseg.cut(poem)
+    if workers <= 1:
+        for chunk in chunks:
+            lookup, todo = prepare(chunk)
+            yield from finish(lookup, segment_poems(todo))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_segment_worker,
+                             initargs=_segmenter_args) as pool:
+        pending = deque()
+        for chunk in chunks:
+            lookup, todo = prepare(chunk)
+            pending.append((lookup, pool.submit(segment_poems, todo)))
+            if len(pending) >= workers * 2:
+                lookup, future = pending.popleft()
+                yield from finish(lookup, future.result())
+        while pending:
+            lookup, future = pending.popleft()
+            yield from finish(lookup, future.result())
+
+
+def process_qianlong_poems(workers=1, use_cache=True, write_segments=True, engine='jieba',
+                           filter_mode='pos', write_matrix=True):
+    # 文件路径
+    input_file = r"C:\Users\任宇轩\Desktop\用户数据\乾隆诗词1.txt"
+    output_seg_file = r"C:\Users\任宇轩\Desktop\用户数据\乾隆分词.txt"
+    output_sort_file = r"C:\Users\任宇轩\Desktop\用户数据\乾隆排序.txt"
+    # 分词缓存：内容没有变化的诗词直接复用上次的分词结果
+    cache_file = r"C:\Users\任宇轩\Desktop\用户数据\乾隆分词缓存.sqlite"
+    # 诗词×词语稀疏计数矩阵，保留每首诗的词频，供后续分析做向量化统计
+    output_matrix_dir = r"C:\Users\任宇轩\Desktop\用户数据\乾隆词频矩阵"
 
-        # 筛选有意义的词汇（名词、动词、形容词等）
-        filtered_words = []
-        for word, flag in words:
-            # 保留有意义的词性：名词、动词、形容词、成语等
-            if flag.startswith(('n', 'v', 'a', 'j', 'l')) and len(word) >= 2:
-                filtered_words.append(word)
-            # 也保留一些常见的单字意象词
-            elif len(word) == 1 and word in '风花雪月山水天地人':
-                filtered_words.append(word)
+    if not os.path.exists(input_file):
+        print(f"文件 {input_file} 未找到")
+        return
 
-        segmented_poems.append(filtered_words)
-        all_words.extend(filtered_words)
+    # 加载分词引擎：古诗分词器先扫描一遍语料，统计相邻汉字的搭配
+    char_stats = None
+    if engine == 'classical':
+        char_stats = CharStatistics.from_poems(iter_poems(input_file))
+        print(f"古诗分词器：统计了 {len(char_stats.unigrams)} 个汉字、{len(char_stats.bigrams)} 种相邻字对")
+    verify_sample = ()
+    if engine == 'jieba' and filter_mode == 'lookup':
+        verify_sample = list(itertools.islice(iter_poems(input_file), LOOKUP_VERIFY_POEMS))
+    use_segmenter(engine, char_stats, filter_mode, verify_sample)
 
-    # 保存分词结果
+    # 流式处理：逐首读取、分词、统计词频，分词结果边处理边写入文件，
+    # 内存占用与诗词总数无关
+    if workers > 1:
+        print(f"使用 {workers} 个进程并行分词...")
+    cache = SegmentationCache(cache_file, segmentation_fingerprint(engine, char_stats)) if use_cache else None
+    seg_file = None
+    matrix = None
+    word_counts = Counter()
+    poem_count = 0
     try:
-        with open(output_seg_file, 'w', encoding='utf-8') as f:
-            for i, words in enumerate(segmented_poems):
-                f.write(f"第{i + 1}首诗词分词结果:\n")
-                f.write(' '.join(words) + '\n')
-                f.write('-' * 50 + '\n')
-        print(f"分词结果已保存到: {output_seg_file}")
+        if write_segments:
+            seg_file = open(output_seg_file, 'w', encoding='utf-8')
+        if write_matrix:
+            matrix = TermMatrixWriter(output_matrix_dir)
+        poems = (poem for poem in iter_poems(input_file) if poem.strip())
+        for poem_count, words in enumerate(iter_segmented(poems, workers, cache), 1):
+            word_counts.update(words)
+            if seg_file:
+                seg_file.write(f"第{poem_count}首诗词分词结果:\n")
+                seg_file.write(' '.join(words) + '\n')
+                seg_file.write('-' * 50 + '\n')
+            if matrix:
+                matrix.add(poem_count, words)
+        if matrix:
+            meta = matrix.close()
+            matrix = None
+            print(f"词频矩阵已保存到: {output_matrix_dir}（{meta['shape'][0]}×{meta['shape'][1]}，"
+                  f"非零项 {meta['nnz']} 个）")
     except Exception as e:
-        print(f"保存分词结果时出错: {e}")
+        print(f"分词处理时出错: {e}")
         return
+    finally:
+        if seg_file:
+            seg_file.close()
+        if matrix:
+            matrix.abort()
+        if cache:
+            cache.close()
 
-    # 统计词频
-    word_counts = Counter(all_words)
+    print(f"共处理 {poem_count} 首诗词")
+    if cache:
+        print(f"分词缓存命中 {cache.hits} 首，新分词 {cache.misses} 首")
+    if write_segments:
+        print(f"分词结果已保存到: {output_seg_file}")
 
     # 保存排序结果
     try:
         with open(output_sort_file, 'w', encoding='utf-8') as f:
             f.write("乾隆诗词意象词汇频率统计（从高到低）\n")
             f.write("=" * 60 + "\n")
-            f.write(f"总词汇数: {len(all_words)}\n")
+            f.write(f"总词汇数: {sum(word_counts.values())}\n")
             f.write(f"不重复词汇数: {len(word_counts)}\n")
             f.write("=" * 60 + "\n\n")
 
@@ -132,13 +324,27 @@ def process_qianlong_poems():
 
 
 if __name__ == "__main__":
-    # 安装依赖的提示
-    try:
-        import jieba
-        import jieba.posseg as pseg
-    except ImportError:
+    parser = argparse.ArgumentParser(description="对乾隆诗词分词并统计词频")
+    parser.add_argument('--workers', type=int, default=1,
+                        help=f"分词进程数，大于1时并行分词（本机CPU核数：{os.cpu_count()}）")
+    parser.add_argument('--no-cache', action='store_true', help="不使用分词缓存，全部重新分词")
+    parser.add_argument('--engine', choices=ENGINES, default='jieba',
+                        help="分词引擎：jieba，或针对五言、七言诗句的古诗分词器 classical")
+    parser.add_argument('--filter', choices=FILTER_MODES, default='pos',
+                        help="jieba引擎的筛选方式：pos 完整标注词性后再筛选（默认），"
+                             "lookup 查预先计算的保留表（较快，先用语料样本与 pos 核对）")
+    parser.add_argument('--no-seg-file', action='store_true', help="只统计词频，不保存逐首的分词结果")
+    parser.add_argument('--no-matrix', action='store_true', help="不生成诗词×词语稀疏词频矩阵")
+    args = parser.parse_args()
+
+    # 安装依赖的提示（jieba在首次分词时才导入，这里只检查是否已安装）
+    import importlib.util
+    if importlib.util.find_spec('jieba') is None:
         print("请先安装jieba分词库:")
         print("pip install jieba")
         exit(1)
 
-    process_qianlong_poems()
\ No newline at end of file
+    process_qianlong_poems(workers=args.workers, use_cache=not args.no_cache,
+                           write_segments=not args.no_seg_file, engine=args.engine,
+                           filter_mode=args.filter,
+                           write_matrix=not args.no_matrix)
\ No newline at end of file
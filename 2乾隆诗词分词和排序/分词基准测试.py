@@ -0,0 +1,147 @@
+import argparse
+import itertools
+import time
+from collections import Counter
+
+from 乾隆分词 import POEM_WORDS, filter_words, iter_poems, load_poem_dict
+from 古诗分词器 import CharStatistics, ClassicalSegmenter
+
+
+def load_poems(file_path, limit=None):
+    """读取诗词正文，最多 limit 首"""
+    poems = (poem for poem in iter_poems(file_path) if poem.strip())
+    return list(itertools.islice(poems, limit))
+
+
+def load_engines(poems):
+    """加载两个分词引擎，返回 {名称: (分词器, 加载耗时秒数)}"""
+    engines = {}
+    start = time.perf_counter()
+    engines['jieba'] = (load_poem_dict(), time.perf_counter() - start)
+    start = time.perf_counter()
+    classical = ClassicalSegmenter.load(POEM_WORDS, CharStatistics.from_poems(poems))
+    engines['classical'] = (classical, time.perf_counter() - start)
+    return engines
+
+
+def benchmark(poems, engines, repeat=3):
+    """测量每个引擎对全部诗词分词的耗时（秒，取最快一次），返回 (耗时, 原始切分结果)
+
+    古诗分词器每轮开始前清空备忘表，测到的是不复用结果时的速度。
+    """
+    timings = {}
+    outputs = {}
+    for name, (segmenter, _) in engines.items():
+        best = None
+        for _ in range(repeat):
+            if isinstance(segmenter, ClassicalSegmenter):
+                segmenter._memo.clear()
+            start = time.perf_counter()
+            result = [list(segmenter.cut(poem)) for poem in poems]
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = best
+        outputs[name] = result
+    return timings, outputs
+
+
+def boundaries(pairs):
+    """切分结果中每个词的 (起点, 终点)，用于比较两种切分"""
+    spans = set()
+    pos = 0
+    for word, _ in pairs:
+        spans.add((pos, pos + len(word)))
+        pos += len(word)
+    return spans
+
+
+def compare(reference, candidate):
+    """以 reference 为基准，统计 candidate 的切分一致程度和筛选后词汇的差异"""
+    same_poems = 0
+    matched = ref_total = cand_total = 0
+    ref_counts = Counter()
+    cand_counts = Counter()
+    for ref_pairs, cand_pairs in zip(reference, candidate):
+        ref_spans, cand_spans = boundaries(ref_pairs), boundaries(cand_pairs)
+        same_poems += ref_spans == cand_spans
+        matched += len(ref_spans & cand_spans)
+        ref_total += len(ref_spans)
+        cand_total += len(cand_spans)
+        ref_counts.update(filter_words(ref_pairs))
+        cand_counts.update(filter_words(cand_pairs))
+
+    precision = matched / cand_total if cand_total else 0.0
+    recall = matched / ref_total if ref_total else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        'same_poems': same_poems,
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+        'ref_counts': ref_counts,
+        'cand_counts': cand_counts,
+    }
+
+
+def print_report(poems, engines, timings, comparison, top=20):
+    chars = sum(len(poem) for poem in poems)
+    print("\n{:<10} {:>10} {:>10} {:>12} {:>14}".format("分词引擎", "加载(s)", "分词(s)", "首/秒", "每首(ms)"))
+    print("-" * 62)
+    for name, elapsed in timings.items():
+        print("{:<10} {:>10.2f} {:>10.3f} {:>12.0f} {:>14.3f}".format(
+            name, engines[name][1], elapsed, len(poems) / elapsed, elapsed * 1000 / len(poems)))
+    print(f"\n共 {len(poems)} 首诗、{chars} 字；classical 相对 jieba 加速 "
+          f"{timings['jieba'] / timings['classical']:.2f}x")
+
+    print(f"\n切分与jieba完全相同的诗: {comparison['same_poems']}/{len(poems)}")
+    print(f"词语边界一致率：准确率 {comparison['precision']:.3f}，召回率 {comparison['recall']:.3f}，"
+          f"F1 {comparison['f1']:.3f}")
+
+    ref_counts, cand_counts = comparison['ref_counts'], comparison['cand_counts']
+    ref_top = [word for word, _ in ref_counts.most_common(top)]
+    cand_top = [word for word, _ in cand_counts.most_common(top)]
+    print(f"筛选后不重复词汇：jieba {len(ref_counts)} 个，classical {len(cand_counts)} 个；"
+          f"前{top}个高频词重合 {len(set(ref_top) & set(cand_top))} 个")
+    print(f"\n{'jieba':<16}{'classical':<16}")
+    for ref_word, cand_word in itertools.zip_longest(ref_top, cand_top, fillvalue=''):
+        ref = f"{ref_word}({ref_counts[ref_word]})" if ref_word else ''
+        cand = f"{cand_word}({cand_counts[cand_word]})" if cand_word else ''
+        print(f"{ref:<16}{cand:<16}")
+
+
+def print_samples(poems, outputs, count):
+    """并排显示两种切分结果不同的诗"""
+    shown = 0
+    for poem, ref_pairs, cand_pairs in zip(poems, outputs['jieba'], outputs['classical']):
+        if shown >= count:
+            break
+        if boundaries(ref_pairs) != boundaries(cand_pairs):
+            print(f"\njieba    : {' / '.join(word for word, _ in ref_pairs)}")
+            print(f"classical: {' / '.join(word for word, _ in cand_pairs)}")
+            shown += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较古诗分词器与jieba在诗词语料上的分词速度和结果")
+    parser.add_argument('input', nargs='?', default=r"C:\Users\任宇轩\Desktop\用户数据\乾隆诗词1.txt",
+                        help="诗词文件（文本格式或爬虫的JSONL记录文件）")
+    parser.add_argument('--limit', type=int, default=None, help="最多使用的诗词数")
+    parser.add_argument('--repeat', type=int, default=3, help="重复分词次数，取最快一次")
+    parser.add_argument('--samples', type=int, default=5, help="显示切分不同的诗的数量")
+    args = parser.parse_args()
+
+    poems = load_poems(args.input, args.limit)
+    if not poems:
+        print("没有读取到诗词")
+        return
+    print(f"共加载 {len(poems)} 首诗词")
+
+    engines = load_engines(poems)
+    timings, outputs = benchmark(poems, engines, args.repeat)
+    comparison = compare(outputs['jieba'], outputs['classical'])
+    print_report(poems, engines, timings, comparison)
+    print_samples(poems, outputs, args.samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+
+def poem_hash(poem):
+    """诗词正文的内容摘要，作为缓存键"""
+    return hashlib.sha1(poem.encode('utf-8')).hexdigest()
+
+
+class SegmentationCache:
+    """按诗词内容摘要保存分词结果的持久化缓存（SQLite）
+
+    每条结果同时记录分词环境指纹（jieba词典、自定义词汇和筛选规则的摘要），
+    指纹变化时旧结果全部失效并在打开时清除，因此缓存的结果总是与当前环境下
+    重新分词的结果一致。
+    """
+
+    def __init__(self, path, fingerprint):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            "fingerprint TEXT NOT NULL, poem_hash TEXT NOT NULL, words TEXT NOT NULL, "
+            "PRIMARY KEY (fingerprint, poem_hash))"
+        )
+        removed = self._conn.execute("DELETE FROM segments WHERE fingerprint != ?", (fingerprint,)).rowcount
+        self._conn.commit()
+        if removed:
+            print(f"分词环境已变化，清除了 {removed} 条过期的分词缓存")
+
+    def get_many(self, hashes):
+        """批量查询，返回 {摘要: 词汇列表}，未命中的摘要不出现在结果中"""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        # 分批查询，避免超出SQLite的参数个数限制
+        for i in range(0, len(unique), 500):
+            chunk = unique[i:i + 500]
+            rows = self._conn.execute(
+                f"SELECT poem_hash, words FROM segments WHERE fingerprint = ? "
+                f"AND poem_hash IN ({','.join('?' * len(chunk))})",
+                [self.fingerprint] + chunk
+            )
+            for key, words in rows:
+                found[key] = json.loads(words)
+        return found
+
+    def put_many(self, items):
+        """批量保存 [(摘要, 词汇列表)]"""
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO segments (fingerprint, poem_hash, words) VALUES (?, ?, ?)",
+            [(self.fingerprint, key, json.dumps(words, ensure_ascii=False)) for key, words in items]
+        )
+        self._conn.commit()
+
+    def lookup(self, poems):
+        """查询一批诗词，返回 (摘要列表, 已缓存的结果, 未命中的 {摘要: 诗词})
+
+        相同内容的诗只会在未命中结果中出现一次，因此只需分词一次。
+        """
+        hashes = [poem_hash(poem) for poem in poems]
+        cached = self.get_many(hashes)
+        missing = {}
+        for key, poem in zip(hashes, poems):
+            if key not in cached and key not in missing:
+                missing[key] = poem
+        self.hits += sum(1 for key in hashes if key in cached)
+        self.misses += len(missing)
+        return hashes, cached, missing
+
+    def complete(self, hashes, cached, missing, results):
+        """保存未命中诗词的分词结果（与 missing 顺序一致），按原顺序返回整批结果"""
+        if missing:
+            new_items = list(zip(missing.keys(), results))
+            self.put_many(new_items)
+            cached.update(new_items)
+        return [cached[key] for key in hashes]
+
+    def segment(self, poems, segment_func):
+        """对诗词分词：命中缓存的直接使用，其余交给 segment_func 批量分词后写入缓存
+
+        segment_func 接收未命中的诗词列表，按相同顺序返回分词结果。
+        """
+        hashes, cached, missing = self.lookup(poems)
+        results = segment_func(list(missing.values())) if missing else []
+        return self.complete(hashes, cached, missing, results)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
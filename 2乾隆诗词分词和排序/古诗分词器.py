@@ -0,0 +1,188 @@
+import hashlib
+import math
+import os
+import pickle
+import re
+from collections import Counter
+
+from 词典缓存 import DEFAULT_CACHE_DIR, build_dictionary
+
+
+# 词表提取规则或打分方式变化时递增
+MODEL_VERSION = 1
+# 古诗中的词几乎都不超过四个字，更长的词条不进入词表
+MAX_WORD_LEN = 4
+# 一段连续的汉字是一句诗，其余字符（标点、空白）原样输出
+_HAN_RUN = re.compile(r'([一-鿿]+)')
+# 四言、五言、七言句的节奏停顿位置（二二、二三、二二三），词语跨过停顿时扣分
+CAESURAS = {4: (2,), 5: (2,), 7: (2, 4)}
+
+
+class CharStatistics:
+    """语料的汉字一元、二元统计（只统计同一句内相邻的两个字）"""
+
+    def __init__(self):
+        self.unigrams = Counter()
+        self.bigrams = Counter()
+
+    @classmethod
+    def from_poems(cls, poems):
+        stats = cls()
+        for poem in poems:
+            stats.add(poem)
+        return stats
+
+    def add(self, text):
+        for line in _HAN_RUN.findall(text):
+            self.unigrams.update(line)
+            self.bigrams.update(line[i:i + 2] for i in range(len(line) - 1))
+
+    def pmi_table(self, min_count=3):
+        """出现至少 min_count 次的相邻字对及其点互信息（自然对数）、出现概率"""
+        n_chars = sum(self.unigrams.values())
+        n_pairs = sum(self.bigrams.values())
+        table = {}
+        for pair, count in self.bigrams.items():
+            if count >= min_count:
+                pmi = math.log(count * n_chars * n_chars
+                               / (n_pairs * self.unigrams[pair[0]] * self.unigrams[pair[1]]))
+                table[pair] = (pmi, count / n_pairs)
+        return table
+
+    def digest(self):
+        """统计内容的摘要，用于分词缓存的环境指纹"""
+        digest = hashlib.sha1()
+        for pair, count in sorted(self.bigrams.items()):
+            digest.update(f"{pair} {count}\n".encode('utf-8'))
+        return digest.hexdigest()
+
+
+def load_vocabulary(words, freq=1000, tag='n', cache_dir=DEFAULT_CACHE_DIR):
+    """从合并了自定义词汇的jieba词典中提取古诗词表，返回 (词频, 词性, 词频总数)
+
+    只保留不超过 MAX_WORD_LEN 个字的纯汉字词条，词频总数仍按整部词典累加，
+    与jieba的概率口径一致。提取结果缓存在词典文件旁边。
+    """
+    dict_path = build_dictionary(words, freq, tag, cache_dir)
+    cache_path = f"{dict_path}.classical{MODEL_VERSION}.pkl"
+    try:
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        pass
+
+    vocab, tags, total = {}, {}, 0
+    with open(dict_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 2:
+                continue
+            word, count = parts[0], int(parts[1])
+            total += count
+            if count > 0 and len(word) <= MAX_WORD_LEN and _HAN_RUN.fullmatch(word):
+                vocab[word] = count
+                tags[word] = parts[2] if len(parts) > 2 else 'x'
+
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump((vocab, tags, total), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+    return vocab, tags, total
+
+
+class ClassicalSegmenter:
+    """面向四言、五言、七言诗句的分词器，用法与 jieba.posseg 相同：cut(文本) 逐个产出 (词, 词性)
+
+    每句诗在候选词（词表中的词、语料中反复成对出现的新词、单字）构成的有向无环图上
+    用动态规划选出得分最高的切分。得分为各词的对数概率之和，另外对两类切分扣分：
+    拆开语料中粘合度高（点互信息大）的相邻两字，以及词语跨过节奏停顿。
+    同一句诗只切分一次，结果保存在备忘表中。
+    """
+
+    name = 'classical'
+
+    def __init__(self, vocab, tags, total, char_stats=None, min_count=3, min_pmi=3.0,
+                 cohesion_weight=0.5, caesura_penalty=4.0, memo_size=200000):
+        self.vocab = vocab
+        self.tags = tags
+        self.log_total = math.log(total)
+        self.cohesion_weight = cohesion_weight
+        self.caesura_penalty = caesura_penalty
+        self.memo_size = memo_size
+        self._memo = {}
+
+        # 相邻字的粘合度，以及词表之外的新词（对数概率）
+        self.cohesion = {}
+        self.new_words = {}
+        if char_stats is not None:
+            for pair, (pmi, prob) in char_stats.pmi_table(min_count).items():
+                if pmi > 0:
+                    self.cohesion[pair] = pmi
+                if pmi >= min_pmi and pair not in vocab:
+                    self.new_words[pair] = math.log(prob)
+
+    @classmethod
+    def load(cls, words, char_stats=None, freq=1000, tag='n', cache_dir=DEFAULT_CACHE_DIR, **options):
+        """用合并词典的词表创建分词器"""
+        vocab, tags, total = load_vocabulary(words, freq, tag, cache_dir)
+        return cls(vocab, tags, total, char_stats, **options)
+
+    def cut(self, sentence):
+        for piece in _HAN_RUN.split(sentence):
+            if not piece:
+                continue
+            if _HAN_RUN.fullmatch(piece):
+                yield from self.cut_line(piece)
+            else:
+                yield piece, 'x'
+
+    def lcut(self, sentence):
+        return list(self.cut(sentence))
+
+    def cut_line(self, line):
+        """切分一句（连续的汉字），返回 ((词, 词性), ...)"""
+        result = self._memo.get(line)
+        if result is None:
+            if len(self._memo) >= self.memo_size:
+                self._memo.clear()
+            result = self._memo[line] = self._segment(line)
+        return result
+
+    def _segment(self, line):
+        vocab, new_words, log_total = self.vocab, self.new_words, self.log_total
+        n = len(line)
+        caesuras = CAESURAS.get(n, ())
+        best = [0.0] + [-math.inf] * n
+        back = [0] * (n + 1)
+
+        for i in range(n):
+            base = best[i]
+            if i > 0:
+                # 在第 i 个字前断开，拆开的两个字越粘合扣分越多
+                base -= self.cohesion_weight * self.cohesion.get(line[i - 1:i + 1], 0.0)
+            for j in range(i + 1, min(n, i + MAX_WORD_LEN) + 1):
+                word = line[i:j]
+                count = vocab.get(word)
+                if count:
+                    score = math.log(count) - log_total
+                elif j - i == 1:
+                    score = -log_total
+                elif word in new_words:
+                    score = new_words[word]
+                else:
+                    continue
+                if any(i < c < j for c in caesuras):
+                    score -= self.caesura_penalty
+                score += base
+                if score > best[j]:
+                    best[j] = score
+                    back[j] = i
+
+        words = []
+        j = n
+        while j > 0:
+            i = back[j]
+            words.append(line[i:j])
+            j = i
+        words.reverse()
+        return tuple((word, self.tags.get(word, 'n' if word in new_words else 'x')) for word in words)
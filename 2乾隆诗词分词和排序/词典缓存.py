@@ -0,0 +1,104 @@
+import hashlib
+import os
+import pickle
+import sys
+import threading
+
+
+# 词典文件格式或缓存内容变化时递增，旧版本的词典和缓存不再使用
+DICT_VERSION = 1
+# 合并后的词典和前缀词典缓存；缓存用pickle保存，只放在用户自己的目录中
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.qianlong_jieba')
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+def _base_dictionary():
+    """jieba自带的词典内容"""
+    import jieba
+    with jieba.get_module_res(jieba.DEFAULT_DICT_NAME) as f:
+        return f.read()
+
+
+def dictionary_version(words, freq=1000, tag='n', base=None):
+    """合并词典的版本号：jieba版本、自带词典内容、自定义词汇及其词频词性的摘要"""
+    import jieba
+    if base is None:
+        base = _base_dictionary()
+    digest = hashlib.sha1()
+    digest.update(f"jieba {jieba.__version__} v{DICT_VERSION} {freq} {tag}\n".encode('utf-8'))
+    digest.update(base)
+    digest.update('\n'.join(words).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def build_dictionary(words, freq=1000, tag='n', cache_dir=DEFAULT_CACHE_DIR):
+    """生成已包含自定义词汇的jieba词典文件，返回文件路径；同一版本只生成一次
+
+    自定义词汇按 "词 词频 词性" 追加在自带词典之后。jieba读取词典时后出现的词条覆盖
+    先出现的词频和词性、词频总数逐行累加，与逐个调用 jieba.add_word 的结果完全相同。
+    """
+    base = _base_dictionary()
+    path = os.path.join(cache_dir, f"poem_dict_{dictionary_version(words, freq, tag, base)}.txt")
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(base)
+        if not base.endswith(b'\n'):
+            f.write(b'\n')
+        f.write(''.join(f"{word} {freq} {tag}\n" for word in words).encode('utf-8'))
+    os.replace(tmp_path, path)
+    return path
+
+
+def _load_prefix_dict(tokenizer, dict_path):
+    """读取前缀词典缓存，缓存不存在时由jieba构建后保存
+
+    jieba自身的缓存用marshal保存，几十万词条时读取比重新解析词典还慢；
+    pickle格式的读取速度快数倍。
+    """
+    cache_path = dict_path + '.pfdict.pkl'
+    try:
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        pass
+
+    freq, total = tokenizer.gen_pfdict(open(dict_path, 'rb'))
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump((freq, total), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+    return freq, total
+
+
+def load_dictionary(words, freq=1000, tag='n', cache_dir=DEFAULT_CACHE_DIR):
+    """让jieba默认分词器使用合并词典，返回 jieba.posseg 的词性标注器（每个进程只加载一次）
+
+    首次调用时才导入jieba：前缀词典从缓存读取，jieba.posseg 导入时读取的词性表
+    也来自合并词典，因此不需要再调用 jieba.add_word。
+    """
+    key = (tuple(words), freq, tag, cache_dir)
+    with _lock:
+        if key in _loaded:
+            return _loaded[key]
+
+        import jieba
+        posseg_imported = 'jieba.posseg' in sys.modules
+        dict_path = build_dictionary(words, freq, tag, cache_dir)
+        jieba.set_dictionary(dict_path)
+        with jieba.dt.lock:
+            jieba.dt.FREQ, jieba.dt.total = _load_prefix_dict(jieba.dt, dict_path)
+            jieba.dt.initialized = True
+
+        import jieba.posseg as pseg
+        if posseg_imported:
+            # jieba.posseg 在切换词典之前已导入，词性表需要按合并词典重新读取
+            pseg.dt.load_word_tag(jieba.dt.get_dict_file())
+        _loaded.clear()
+        _loaded[key] = pseg.dt
+        return pseg.dt
@@ -0,0 +1,142 @@
+import os
+import pickle
+import re
+
+
+# 与 jieba.posseg 相同的分块规则：只有这些字符组成的块才会切分出可能保留的词
+_RE_HAN_INTERNAL = re.compile(r"([一-鿕a-zA-Z0-9+#&\._]+)")
+
+# 构建保留表时用来核对结果与 posseg 一致的样例：含词典内外的词、单字、标点和字母数字
+VERIFY_SAMPLE = [
+    "春风又绿江南岸，明月何时照我还。",
+    "御园雪霁晓光寒，玉树琼枝带露看。",
+    "乾隆三十年春二月，驻跸灵岩山寺，书此志之。",
+    "山色空濛雨亦奇，风花雪月总关情！",
+    "丙戌新正 3 日 abc 题画 #1 & 御笔",
+]
+
+
+class LookupWordFilter:
+    """查表筛选分词结果，与 jieba.posseg 标注后逐词筛选的结果完全相同
+
+    posseg 对词典中的词只是查词性表，真正耗时的是为每个词创建 pair 对象，以及对
+    词典外的连续单字用词性HMM重新切分标注。这里沿用jieba的前缀词典和动态规划切分，
+    词典中的词直接查预先计算好的"词→是否保留"表；词典外的连续单字仍交给 posseg
+    的HMM标注（与 posseg 完全相同），结果按字符串记住，同样的片段只标注一次。
+
+    keep(词, 词性) 为筛选规则；词典外的单字在 posseg 中标为 'x'，按 keep(词, 'x') 判断。
+
+    切分循环仿照 posseg 的 __cut_DAG 写成，并调用其私有的 __cut_detail，按 jieba 0.42
+    的实现编写。保留表缓存按jieba版本区分，新建保留表时先用 VERIFY_SAMPLE 与 posseg
+    核对，不一致（jieba内部实现变化）时 load() 返回None，由调用方改用完整词性标注。
+    """
+
+    def __init__(self, pos_tokenizer, keep, table, memo_size=100000):
+        self.pos_tokenizer = pos_tokenizer
+        self.tokenizer = pos_tokenizer.tokenizer
+        self.keep = keep
+        self.memo_size = memo_size
+        self._decisions = table
+        self._details = {}
+        # posseg 对词典外片段的HMM切分标注（私有方法，名称经过改写）
+        self._cut_detail = pos_tokenizer._POSTokenizer__cut_detail
+
+    @classmethod
+    def load(cls, pos_tokenizer, keep, rule_version, sample=(), **options):
+        """从词性表构建（或从缓存读取）保留表；缓存放在词典文件旁，按筛选规则版本和jieba版本区分
+
+        新建的保留表用 VERIFY_SAMPLE 核对通过后才写入缓存；指定 sample（如实际语料中的
+        一部分诗）时无论是否读取缓存都再核对一遍。当前jieba无法使用查表筛选或核对
+        不一致时返回None。
+        """
+        import jieba
+
+        dict_path = pos_tokenizer.tokenizer.dictionary
+        cache_path = f"{dict_path}.keep{rule_version}.jieba{jieba.__version__}.pkl"
+        try:
+            with open(cache_path, 'rb') as f:
+                table = pickle.load(f)
+            word_filter = cls(pos_tokenizer, keep, table, **options)
+            return word_filter if word_filter.verify(sample) else None
+        except AttributeError:
+            return None
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
+
+        table = {word: keep(word, tag) for word, tag in pos_tokenizer.word_tag_tab.items()}
+        try:
+            word_filter = cls(pos_tokenizer, keep, dict(table), **options)
+        except AttributeError:
+            # posseg 的私有方法已不存在
+            return None
+        if not word_filter.verify(VERIFY_SAMPLE):
+            return None
+        if not word_filter.verify(sample):
+            return None
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(table, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+        return word_filter
+
+    def verify(self, texts):
+        """核对样例文本的筛选结果与 posseg 标注后逐词筛选的结果是否相同"""
+        for text in texts:
+            expected = [word for word, flag in self.pos_tokenizer.cut(text) if self.keep(word, flag)]
+            if self.filter(text) != expected:
+                return False
+        return True
+
+    def _keep_word(self, word):
+        decision = self._decisions.get(word)
+        if decision is None:
+            decision = self._decisions[word] = self.keep(word, 'x')
+        return decision
+
+    def _detail(self, buf):
+        """词典外连续单字片段中保留的词"""
+        words = self._details.get(buf)
+        if words is None:
+            if len(self._details) >= self.memo_size:
+                self._details.clear()
+            words = self._details[buf] = [word for word, flag in self._cut_detail(buf)
+                                          if self.keep(word, flag)]
+        return words
+
+    def _flush(self, buf, result):
+        if len(buf) == 1:
+            if self._keep_word(buf):
+                result.append(buf)
+        elif not self.tokenizer.FREQ.get(buf):
+            result.extend(self._detail(buf))
+        else:
+            result.extend(char for char in buf if self._keep_word(char))
+
+    def filter(self, text):
+        """切分文本并返回保留的词，顺序与 filter_words(pseg.cut(text)) 相同"""
+        self.pos_tokenizer.makesure_userdict_loaded()
+        tokenizer = self.tokenizer
+        result = []
+        for block in _RE_HAN_INTERNAL.split(text):
+            # 其他块只会产生标点、空白等 x/m/eng 单字，不会被保留
+            if not block or not _RE_HAN_INTERNAL.match(block):
+                continue
+            route = {}
+            tokenizer.calc(block, tokenizer.get_DAG(block), route)
+            x, n = 0, len(block)
+            buf = ''
+            while x < n:
+                y = route[x][1] + 1
+                if y - x == 1:
+                    buf += block[x]
+                else:
+                    if buf:
+                        self._flush(buf, result)
+                        buf = ''
+                    word = block[x:y]
+                    if self._keep_word(word):
+                        result.append(word)
+                x = y
+            if buf:
+                self._flush(buf, result)
+        return result
@@ -0,0 +1,96 @@
+import json
+import os
+import sys
+from array import array
+from collections import Counter
+
+
+FORMAT_VERSION = 1
+
+
+class TermMatrixWriter:
+    """逐首写入的 诗词×词语 稀疏计数矩阵（CSR格式）
+
+    目录结构：
+        vocab.txt     词表，每行一个词，行号即列号（按首次出现的顺序编号）
+        indptr.i64    每首诗的非零项在 indices/data 中的起始位置，共 诗词数+1 个int64
+        indices.i32   非零项的列号（词语ID），每首诗内按列号升序
+        data.i32      非零项的计数，即该词在这首诗中出现的次数
+        nums.i32      每行对应的诗词编号（与分词文件中的"第N首"一致）
+        meta.json     格式版本、字节序、矩阵形状和非零项数
+
+    三个数组与 scipy.sparse.csr_matrix 的 (data, indices, indptr) 完全对应，分析阶段
+    可以直接映射成稀疏矩阵。indices/data 边处理边写入文件，内存中只保留词表和行偏移。
+    """
+
+    def __init__(self, directory, flush_every=1 << 16):
+        self.directory = directory
+        self.flush_every = flush_every
+        self.vocab = {}
+        self.indptr = array('q', [0])
+        self.nums = array('i')
+        self.nnz = 0
+        self._indices = array('i')
+        self._data = array('i')
+
+        os.makedirs(directory, exist_ok=True)
+        self._indices_file = open(self._path('indices.i32') + '.tmp', 'wb')
+        self._data_file = open(self._path('data.i32') + '.tmp', 'wb')
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def add(self, poem_num, words):
+        """追加一首诗（一行）"""
+        vocab = self.vocab
+        counts = Counter()
+        for word in words:
+            word_id = vocab.get(word)
+            if word_id is None:
+                word_id = vocab[word] = len(vocab)
+            counts[word_id] += 1
+        for word_id in sorted(counts):
+            self._indices.append(word_id)
+            self._data.append(counts[word_id])
+        self.nnz += len(counts)
+        self.indptr.append(self.nnz)
+        self.nums.append(poem_num)
+        if len(self._indices) >= self.flush_every:
+            self._flush()
+
+    def _flush(self):
+        self._indices.tofile(self._indices_file)
+        self._data.tofile(self._data_file)
+        self._indices = array('i')
+        self._data = array('i')
+
+    def close(self):
+        """写完剩余数据和元信息，返回元信息"""
+        self._flush()
+        self._indices_file.close()
+        self._data_file.close()
+        with open(self._path('indptr.i64') + '.tmp', 'wb') as f:
+            self.indptr.tofile(f)
+        with open(self._path('nums.i32') + '.tmp', 'wb') as f:
+            self.nums.tofile(f)
+        with open(self._path('vocab.txt') + '.tmp', 'w', encoding='utf-8') as f:
+            f.write('\n'.join(self.vocab))
+        for name in ('indices.i32', 'data.i32', 'indptr.i64', 'nums.i32', 'vocab.txt'):
+            os.replace(self._path(name) + '.tmp', self._path(name))
+
+        # meta.json 最后写入，作为矩阵完整的标记
+        meta = {
+            'format': FORMAT_VERSION,
+            'byteorder': sys.byteorder,
+            'shape': [len(self.nums), len(self.vocab)],
+            'nnz': self.nnz,
+        }
+        with open(self._path('meta.json') + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(self._path('meta.json') + '.tmp', self._path('meta.json'))
+        return meta
+
+    def abort(self):
+        """出错时关闭临时文件，保留上一次完整的矩阵"""
+        self._indices_file.close()
+        self._data_file.close()
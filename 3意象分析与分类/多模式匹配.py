@@ -0,0 +1,74 @@
+from collections import deque
+
+
+class AhoCorasick:
+    """Aho-Corasick 多模式子串匹配自动机
+
+    每个模式带一个整数标签位（bit），同一模式可以属于多个标签。构建时把失败链上的
+    输出合并到每个状态，扫描文本时只需沿转移走一遍并按位或，就能得到文本包含的
+    所有模式的标签集合，耗时与文本长度成正比，与模式数量无关。
+    """
+
+    def __init__(self, patterns):
+        """patterns: 可迭代的 (模式字符串, 标签位掩码)"""
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [0]
+        for pattern, mask in patterns:
+            if pattern:
+                self._add(pattern, mask)
+        self._build()
+
+    def _add(self, pattern, mask):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(0)
+            state = next_state
+        self._out[state] |= mask
+
+    def _build(self):
+        """按层（广度优先）计算失败指针，并沿失败链合并输出"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail if fail != next_state else 0
+                self._out[next_state] |= self._out[self._fail[next_state]]
+
+    def to_state(self):
+        """导出自动机的全部状态（只含 list/dict/str/int），可以用 marshal 保存"""
+        return self._goto, self._fail, self._out
+
+    @classmethod
+    def from_state(cls, state):
+        """由 to_state 导出的状态直接恢复自动机，不再重新构建"""
+        matcher = cls.__new__(cls)
+        matcher._goto, matcher._fail, matcher._out = (list(part) for part in state)
+        return matcher
+
+    def __len__(self):
+        """状态数"""
+        return len(self._goto)
+
+    def match(self, text):
+        """text 中出现的所有模式的标签按位或，没有匹配时为0"""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        mask = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            mask |= out[state]
+        return mask
@@ -0,0 +1,185 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import sparse
+
+from 意象分类体系 import ImageTaxonomy
+from 词频矩阵分析 import PoemTermMatrix
+from 词语语料 import TokenCorpus
+
+
+def image_words(vocab, taxonomy):
+    """词表中属于任一顶层类别的意象词语（与意象统计的"所有意象词语"口径相同），保持词表顺序"""
+    top = 0
+    for i, (_, parent, _) in enumerate(taxonomy.labels):
+        if parent < 0:
+            top |= 1 << i
+    return [word for word in vocab if taxonomy.word_mask(word) & top]
+
+
+def _shard_product(block):
+    """一块诗词的 意象×意象 共现计数（进程池中执行）"""
+    return (block.T @ block).tocsr()
+
+
+class ImageCooccurrence:
+    """意象共现矩阵：两个意象同时出现在多少首诗中（scipy 稀疏对称矩阵）
+
+    由 诗词×意象 的0/1出现矩阵 B 计算 B.T @ B，对角线是每个意象出现的诗词数。
+    诗词按行分块，workers > 1 时各块交给进程池分别相乘，再把各块的结果相加。
+    近邻查询和 PMI、提升度打分只处理矩阵中的非零项，意象词语数万个时也很快。
+    """
+
+    def __init__(self, matrix, images, n_poems):
+        self.matrix = matrix.tocsr()
+        self.images = list(images)
+        self.n_poems = n_poems
+        self.index = {word: i for i, word in enumerate(self.images)}
+        self._df = self.matrix.diagonal().astype(np.float64)
+
+    @classmethod
+    def build(cls, poems_data, images, workers=1, shard_size=4096):
+        """由 TokenCorpus、PoemTermMatrix 或 (诗词编号, 词语列表) 序列计算；images 为意象词语列表"""
+        if isinstance(poems_data, TokenCorpus):
+            poems_data = PoemTermMatrix.from_corpus(poems_data)
+        if isinstance(poems_data, PoemTermMatrix):
+            images = [word for word in images if word in poems_data.index]
+            presence = poems_data.matrix[:, poems_data.columns(images)]
+        else:
+            index = {word: i for i, word in enumerate(images)}
+            indices, indptr = [], [0]
+            for _, poem_words in poems_data:
+                indices.extend({index[word] for word in poem_words if word in index})
+                indptr.append(len(indices))
+            presence = sparse.csr_matrix((np.ones(len(indices), dtype=np.int32), indices, indptr),
+                                         shape=(len(indptr) - 1, len(images)))
+        presence = presence.tocsr()
+        presence.data = np.ones(len(presence.data), dtype=np.int32)
+
+        n_poems = presence.shape[0]
+        blocks = [presence[start:start + shard_size] for start in range(0, n_poems, shard_size)]
+        matrix = sparse.csr_matrix((len(images), len(images)), dtype=np.int32)
+        if workers <= 1 or len(blocks) <= 1:
+            for block in blocks:
+                matrix = matrix + _shard_product(block)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for product in pool.map(_shard_product, blocks):
+                    matrix = matrix + product
+        return cls(matrix, images, n_poems)
+
+    def __len__(self):
+        return len(self.images)
+
+    def count(self, a, b):
+        """同时出现 a、b 两个意象的诗词数"""
+        return int(self.matrix[self.index[a], self.index[b]])
+
+    def document_frequency(self, word=None):
+        """意象出现的诗词数；不指定词语时返回全部意象的数组"""
+        if word is None:
+            return self._df.astype(np.int64)
+        return int(self._df[self.index[word]])
+
+    def _score(self, counts, rows, cols, score):
+        """共现次数换算成得分：count 为诗词数，lift 为提升度，pmi 为点互信息（自然对数）"""
+        counts = counts.astype(np.float64)
+        if score == 'count':
+            return counts
+        lift = counts * self.n_poems / (self._df[rows] * self._df[cols])
+        if score == 'lift':
+            return lift
+        if score == 'pmi':
+            return np.log(lift)
+        raise ValueError(f"未知的打分方式: {score}")
+
+    def lift(self, a, b):
+        i, j = self.index[a], self.index[b]
+        return float(self._score(np.array([self.matrix[i, j]]), np.array([i]), np.array([j]), 'lift')[0])
+
+    def pmi(self, a, b):
+        lift = self.lift(a, b)
+        return float(np.log(lift)) if lift > 0 else float('-inf')
+
+    def neighbours(self, word, top=10, score='count', min_count=1):
+        """与 word 共现的意象中得分最高的 top 个，返回 [(意象, 得分, 共现诗词数)]
+
+        min_count 过滤共现次数太少的组合，PMI 和提升度对低频组合偏高。
+        """
+        i = self.index[word]
+        start, stop = self.matrix.indptr[i], self.matrix.indptr[i + 1]
+        cols = self.matrix.indices[start:stop]
+        counts = self.matrix.data[start:stop]
+        keep = (cols != i) & (counts >= min_count)
+        cols, counts = cols[keep], counts[keep]
+        scores = self._score(counts, np.full(len(cols), i), cols, score)
+        if len(scores) > top:
+            best = np.argpartition(-scores, top - 1)[:top]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.lexsort((-counts[best], -scores[best]))]
+        return [(self.images[cols[k]], float(scores[k]), int(counts[k])) for k in best]
+
+    def top_pairs(self, top=20, score='pmi', min_count=5):
+        """全部意象组合中得分最高的 top 对，返回 [(意象a, 意象b, 得分, 共现诗词数)]"""
+        upper = sparse.triu(self.matrix, k=1).tocoo()
+        keep = upper.data >= min_count
+        rows, cols, counts = upper.row[keep], upper.col[keep], upper.data[keep]
+        scores = self._score(counts, rows, cols, score)
+        if len(scores) > top:
+            best = np.argpartition(-scores, top - 1)[:top]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.lexsort((-counts[best], -scores[best]))]
+        return [(self.images[rows[k]], self.images[cols[k]], float(scores[k]), int(counts[k])) for k in best]
+
+
+def main():
+    """统计意象共现并输出共现最显著的意象组合"""
+    parser = argparse.ArgumentParser(description="统计意象词语在同一首诗中共现的次数，输出近邻和PMI/提升度最高的组合")
+    parser.add_argument('input', help="分词文件路径或词频矩阵目录")
+    parser.add_argument('--taxonomy', help="意象分类体系文件（JSON），默认使用脚本旁的 意象分类.json")
+    parser.add_argument('--workers', type=int, default=1, help="并行计算的进程数")
+    parser.add_argument('--word', action='append', default=[], help="查询与该意象共现的意象，可以指定多次")
+    parser.add_argument('--score', choices=('count', 'pmi', 'lift'), default='pmi', help="打分方式")
+    parser.add_argument('--min-count', type=int, default=5, help="共现诗词数的下限")
+    parser.add_argument('--top', type=int, default=20, help="输出的条数")
+    args = parser.parse_args()
+
+    taxonomy = ImageTaxonomy.load(args.taxonomy) if args.taxonomy else ImageTaxonomy.load()
+    if os.path.isdir(args.input):
+        print("加载词频矩阵...")
+        poems_data = PoemTermMatrix.load(args.input)
+    else:
+        from 意象分析与分类 import parse_segmented_file
+        print("解析分词文件...")
+        # 无法使用二进制语料时得到的是 (诗词编号, 词语列表) 列表，build 可以直接处理
+        poems_data = parse_segmented_file(args.input)
+
+    if isinstance(poems_data, (PoemTermMatrix, TokenCorpus)):
+        vocab = poems_data.vocab
+    else:
+        vocab = list(dict.fromkeys(word for _, poem_words in poems_data for word in poem_words))
+    images = image_words(vocab, taxonomy)
+    print(f"共{len(poems_data)}首诗词，{len(images)}个意象词语，计算共现矩阵...")
+    cooccurrence = ImageCooccurrence.build(poems_data, images, workers=args.workers)
+    print(f"共现矩阵非零项 {cooccurrence.matrix.nnz:,} 个")
+
+    for word in args.word:
+        if word not in cooccurrence.index:
+            print(f"\n意象 '{word}' 不在语料中")
+            continue
+        print(f"\n与 '{word}' 共现的意象（{args.score}，出现于{cooccurrence.document_frequency(word)}首诗）:")
+        for other, score, count in cooccurrence.neighbours(word, args.top, args.score, args.min_count):
+            print(f"  {other:<10}{score:>10.3f}{count:>8}")
+
+    if not args.word:
+        print(f"\n共现最显著的意象组合（{args.score}，至少共现{args.min_count}次）:")
+        for a, b, score, count in cooccurrence.top_pairs(args.top, args.score, args.min_count):
+            print(f"  {a} + {b}: {score:.3f}（{count}首）")
+
+
+if __name__ == "__main__":
+    main()
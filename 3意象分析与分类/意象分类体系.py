@@ -0,0 +1,149 @@
+import hashlib
+import json
+import marshal
+import os
+from collections import Counter
+
+from 多模式匹配 import AhoCorasick
+
+
+# 编译结果的结构或分类规则变化时递增
+INDEX_VERSION = 1
+# 默认的分类体系文件，与脚本放在同一目录
+TAXONOMY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '意象分类.json')
+# 编译好的索引缓存在用户目录下，按分类文件的内容摘要命名
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.qianlong_taxonomy')
+
+
+class ImageTaxonomy:
+    """从分类体系文件编译出的意象分类索引
+
+    分类体系文件（JSON）格式：
+        {"version": 1, "categories": {类别名: {"keywords": [...], "children": {子类别名: {...}}}}}
+    children 可以任意嵌套。所有（子）类别按先序编号，每个占自动机的一个标签位；
+    词语包含某类别的任一关键词（词语本身是关键词也算）即属于该类别，子类别只统计
+    同时属于全部上级类别的词语。
+
+    编译结果（类别表和自动机状态）用 marshal 缓存，文件名取分类文件内容的摘要，
+    分类文件一改动就会重新编译，未改动时直接读取，不再逐个关键词构建自动机。
+    """
+
+    def __init__(self, labels, matcher, digest=None):
+        """labels: 按先序排列的 (类别名, 上级类别序号或-1, 关键词元组)"""
+        self.labels = labels
+        self.matcher = matcher
+        self.digest = digest
+        # 每个类别要求同时命中的上级类别标签位
+        self.required = []
+        for name, parent, keywords in labels:
+            self.required.append(0 if parent < 0 else self.required[parent] | 1 << parent)
+
+    @staticmethod
+    def flatten(tree):
+        """把嵌套的类别字典展开成先序的 (类别名, 上级序号, 关键词元组) 列表"""
+        labels = []
+
+        def visit(categories, parent):
+            for name, node in categories.items():
+                labels.append((name, parent, tuple(dict.fromkeys(node.get('keywords', ())))))
+                visit(node.get('children', {}), len(labels) - 1)
+
+        visit(tree, -1)
+        return labels
+
+    @classmethod
+    def compile(cls, tree, digest=None):
+        """由类别字典（与分类文件中的 categories 相同）编译索引"""
+        labels = cls.flatten(tree)
+        matcher = AhoCorasick((keyword, 1 << i)
+                              for i, (_, _, keywords) in enumerate(labels)
+                              for keyword in keywords)
+        return cls(labels, matcher, digest)
+
+    @classmethod
+    def load(cls, path=TAXONOMY_FILE, cache_dir=DEFAULT_CACHE_DIR):
+        """读取分类体系文件，优先使用按文件摘要缓存的编译结果"""
+        with open(path, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha1(raw).hexdigest()[:16]
+        cache_path = os.path.join(cache_dir, f"taxonomy_{digest}.v{INDEX_VERSION}.marshal")
+        try:
+            with open(cache_path, 'rb') as f:
+                # 整块读入后再解码，比 marshal.load 逐段读取文件快得多
+                labels, state = marshal.loads(f.read())
+            return cls([tuple(label) for label in labels], AhoCorasick.from_state(state), digest)
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+
+        data = json.loads(raw.decode('utf-8'))
+        taxonomy = cls.compile(data['categories'], digest)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(marshal.dumps((taxonomy.labels, taxonomy.matcher.to_state())))
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"无法缓存意象分类索引（{e}），下次运行时重新编译")
+        return taxonomy
+
+    def __len__(self):
+        """（子）类别数"""
+        return len(self.labels)
+
+    def keyword_count(self):
+        return sum(len(keywords) for _, _, keywords in self.labels)
+
+    def paths(self):
+        """按序号排列的类别路径名，子类别写成 "上级/子类别"，例如 时间意象/清晨时段"""
+        paths = []
+        for name, parent, _ in self.labels:
+            paths.append(name if parent < 0 else f"{paths[parent]}/{name}")
+        return paths
+
+    def word_mask(self, word):
+        """词语计入的所有（子）类别的标签位：包含关键词，且同时属于全部上级类别"""
+        mask = self.matcher.match(word)
+        counted = 0
+        if mask:
+            for i, required in enumerate(self.required):
+                if mask >> i & 1 and mask & required == required:
+                    counted |= 1 << i
+        return counted
+
+    def new_categories(self):
+        """生成空的分类结果：{类别名: {'keywords', 'words', 'children'}}，
+        与原来写在代码中的类别字典结构相同，返回 (类别字典, 按序号排列的各类别数据)"""
+        categories = {}
+        nodes = []
+        for name, parent, keywords in self.labels:
+            data = {'keywords': set(keywords), 'words': Counter()}
+            if parent < 0:
+                categories[name] = data
+            else:
+                nodes[parent].setdefault('children', {})[name] = data
+            nodes.append(data)
+        return categories, nodes
+
+    def categorize(self, all_words_counter):
+        """按类别顺序统计词语，返回 (所有意象词语计数, 类别字典)
+
+        只有顶层类别计入所有意象词语的统计。
+        """
+        categories, nodes = self.new_categories()
+        top = [parent < 0 for _, parent, _ in self.labels]
+        word_mask = self.word_mask
+        all_images = Counter()
+
+        for word, count in all_words_counter.items():
+            mask = word_mask(word)
+            if not mask:
+                continue
+            for i, data in enumerate(nodes):
+                if not mask >> i & 1:
+                    continue
+                data['words'][word] += count
+                if top[i]:
+                    all_images[word] += count
+
+        return all_images, categories
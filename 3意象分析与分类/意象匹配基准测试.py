@@ -0,0 +1,86 @@
+import argparse
+import random
+import time
+from collections import Counter
+
+from 意象分析与分类 import identify_and_categorize_images, parse_segmented_file
+
+
+def categorize_by_substring(all_words_counter, categories):
+    """原来的实现：每个词语逐个类别、逐个关键词做子串判断，作为对照"""
+    all_images = Counter()
+    results = {name: Counter() for name in categories}
+    for word, count in all_words_counter.items():
+        for category_name, category_data in categories.items():
+            keywords = category_data['keywords']
+            if word in keywords:
+                results[category_name][word] += count
+                all_images[word] += count
+                continue
+            for keyword in keywords:
+                if keyword in word:
+                    results[category_name][word] += count
+                    all_images[word] += count
+                    break
+    return all_images, results
+
+
+def synthetic_counter(size, keywords, seed=1):
+    """随机生成 size 个不同的1~4字词语（部分含有关键词中的字），用于没有分词文件时测试"""
+    rng = random.Random(seed)
+    pool = list(set(''.join(keywords))) + [chr(c) for c in range(0x4e00, 0x4e00 + 3000)]
+    counter = Counter()
+    while len(counter) < size:
+        word = ''.join(rng.choice(pool) for _ in range(rng.choice((1, 2, 2, 2, 3, 4))))
+        counter[word] += rng.randint(1, 50)
+    return counter
+
+
+def best_of(func, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较意象分类的Aho-Corasick实现与逐个关键词子串判断的耗时")
+    parser.add_argument('input', nargs='?', help="分词文件路径；不指定时使用随机生成的词语")
+    parser.add_argument('--size', type=int, default=50000, help="随机生成的不同词语数")
+    parser.add_argument('--repeat', type=int, default=3, help="重复次数，取最快一次")
+    args = parser.parse_args()
+
+    # 取出当前的类别定义（关键词集合）
+    _, categories = identify_and_categorize_images(Counter())
+    if args.input:
+        poems_data = parse_segmented_file(args.input)
+        words = Counter()
+        for _, poem_words in poems_data:
+            words.update(poem_words)
+    else:
+        words = synthetic_counter(args.size, [k for c in categories.values() for k in c['keywords']])
+    keyword_count = sum(len(c['keywords']) for c in categories.values())
+    print(f"共 {len(words)} 个不同词语，{len(categories)} 个类别，{keyword_count} 个关键词")
+
+    naive_time, (naive_images, naive_categories) = best_of(
+        lambda: categorize_by_substring(words, categories), args.repeat)
+    fast_time, (fast_images, fast_categories) = best_of(
+        lambda: identify_and_categorize_images(words), args.repeat)
+
+    # 结果（包括 Counter 的插入顺序，决定同频词的排名）必须完全一致
+    same = list(naive_images.items()) == list(fast_images.items()) and all(
+        list(naive_categories[name].items()) == list(fast_categories[name]['words'].items())
+        for name in categories)
+
+    print(f"\n{'实现':<16}{'耗时(s)':>10}{'每词(µs)':>12}")
+    print("-" * 38)
+    print(f"{'逐个子串判断':<14}{naive_time:>10.3f}{naive_time * 1e6 / len(words):>12.2f}")
+    print(f"{'Aho-Corasick':<16}{fast_time:>10.3f}{fast_time * 1e6 / len(words):>12.2f}")
+    print(f"\n加速 {naive_time / fast_time:.1f}x，意象词语 {len(fast_images)} 个，结果{'一致' if same else '不一致！'}")
+
+
+if __name__ == "__main__":
+    main()
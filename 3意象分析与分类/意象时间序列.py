@@ -0,0 +1,201 @@
+import argparse
+import os
+
+import numpy as np
+from scipy import sparse
+
+from 意象分类体系 import ImageTaxonomy
+from 词频矩阵分析 import PoemTermMatrix
+from 词语语料 import TokenCorpus
+
+
+FORMAT_VERSION = 1
+
+
+class ImageTimeSeries:
+    """按诗词顺序排列的 诗词×意象类别 计数数组（numpy 稠密数组）
+
+    第 i 行是排序文件中第 i 首诗，每列是分类体系中的一个（子）类别，值为这首诗中
+    计入该类别的词语出现次数，口径与 identify_and_categorize_images 相同：按列求和
+    就是各类别的总次数。另外记录每首诗的总词数，用于换算成每千词的出现率。
+
+    分词文件按时间排序（模糊匹配排序的结果）时，行号就是创作先后。滑动窗口和分期
+    合计都用前缀和相减得到，任意窗口大小、任意分期都不需要重新分析诗词。
+    """
+
+    def __init__(self, counts, totals, labels, poem_nums):
+        self.counts = np.asarray(counts, dtype=np.int32)
+        self.totals = np.asarray(totals, dtype=np.int64)
+        self.labels = list(labels)
+        self.poem_nums = np.asarray(poem_nums, dtype=np.int32)
+        self._index = {label: i for i, label in enumerate(self.labels)}
+        self._prefix = None
+        self._total_prefix = None
+
+    @classmethod
+    def from_matrix(cls, term_matrix, taxonomy):
+        """由 PoemTermMatrix 计算：词语×类别指示矩阵与词频矩阵相乘"""
+        rows, cols = [], []
+        for column, word in enumerate(term_matrix.vocab):
+            mask = taxonomy.word_mask(word)
+            while mask:
+                bit = mask & -mask
+                rows.append(column)
+                cols.append(bit.bit_length() - 1)
+                mask ^= bit
+        indicator = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)),
+                                      shape=(term_matrix.shape[1], len(taxonomy)))
+        counts = (term_matrix.matrix @ indicator).toarray()
+        totals = np.asarray(term_matrix.matrix.sum(axis=1)).ravel()
+        return cls(counts, totals, taxonomy.paths(), term_matrix.poem_nums)
+
+    @classmethod
+    def from_poems(cls, poems_data, taxonomy):
+        """由 TokenCorpus、PoemTermMatrix 或 (诗词编号, 词语列表) 序列计算"""
+        if isinstance(poems_data, TokenCorpus):
+            poems_data = PoemTermMatrix.from_corpus(poems_data)
+        if isinstance(poems_data, PoemTermMatrix):
+            return cls.from_matrix(poems_data, taxonomy)
+
+        # 普通序列逐首累加，每个词语的类别只判断一次
+        word_columns = {}
+        rows, totals, poem_nums = [], [], []
+        for poem_num, poem_words in poems_data:
+            row = [0] * len(taxonomy)
+            for word in poem_words:
+                columns = word_columns.get(word)
+                if columns is None:
+                    mask = taxonomy.word_mask(word)
+                    columns = word_columns[word] = [i for i in range(len(taxonomy)) if mask >> i & 1]
+                for i in columns:
+                    row[i] += 1
+            rows.append(row)
+            totals.append(len(poem_words))
+            poem_nums.append(poem_num)
+        counts = np.array(rows, dtype=np.int32).reshape(len(rows), len(taxonomy))
+        return cls(counts, totals, taxonomy.paths(), poem_nums)
+
+    def save(self, path):
+        """保存为 .npz 文件（先写临时文件再替换）"""
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, format=np.array([FORMAT_VERSION]), counts=self.counts, totals=self.totals,
+                 labels=np.array(self.labels), poem_nums=self.poem_nums)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['format'][0]) != FORMAT_VERSION:
+                raise ValueError(f"意象时间序列格式不兼容: {path}")
+            return cls(data['counts'], data['totals'], data['labels'].tolist(), data['poem_nums'])
+
+    def __len__(self):
+        return len(self.counts)
+
+    def columns(self, labels=None):
+        """类别名（或路径名）对应的列号；不指定时为全部列"""
+        if labels is None:
+            return np.arange(len(self.labels))
+        if isinstance(labels, str):
+            labels = [labels]
+        return np.array([self._index[label] for label in labels], dtype=np.int64)
+
+    def _prefix_sums(self):
+        """各类别计数和总词数的前缀和（首行为0），第一次使用时计算"""
+        if self._prefix is None:
+            self._prefix = np.zeros((len(self) + 1, len(self.labels)), dtype=np.int64)
+            np.cumsum(self.counts, axis=0, out=self._prefix[1:])
+            self._total_prefix = np.concatenate(([0], np.cumsum(self.totals)))
+        return self._prefix, self._total_prefix
+
+    def _rates(self, sums, words, per):
+        """计数换算成每 per 个词的出现次数，总词数为0的窗口记为0"""
+        words = words[:, None].astype(np.float64)
+        return np.divide(sums * per, words, out=np.zeros(sums.shape), where=words > 0)
+
+    def range_sums(self, starts, stops, labels=None, per=None):
+        """第 [start, stop) 首诗各类别的合计，starts/stops 为等长的位置数组
+
+        per 不为 None 时返回每 per 个词的出现率（例如 per=1000 为每千词出现次数）。
+        """
+        prefix, total_prefix = self._prefix_sums()
+        starts = np.clip(np.asarray(starts, dtype=np.int64), 0, len(self))
+        stops = np.clip(np.asarray(stops, dtype=np.int64), 0, len(self))
+        cols = self.columns(labels)
+        sums = prefix[stops][:, cols] - prefix[starts][:, cols]
+        if per is None:
+            return sums
+        return self._rates(sums, total_prefix[stops] - total_prefix[starts], per)
+
+    def rolling(self, window, step=1, labels=None, per=None):
+        """长度为 window 首诗的滑动窗口合计，返回 (各窗口起点, 窗口数×类别数 的数组)"""
+        starts = np.arange(0, max(len(self) - window, 0) + 1, step)
+        return starts, self.range_sums(starts, starts + window, labels, per)
+
+    def period_sums(self, bounds, labels=None, per=None):
+        """按分期边界合计：bounds 为递增的起始位置，最后一期到末尾为止
+
+        例如 bounds=[0, 500, 1200] 得到 [0,500)、[500,1200)、[1200,末尾) 三期。
+        """
+        bounds = np.asarray(bounds, dtype=np.int64)
+        stops = np.append(bounds[1:], len(self))
+        return self.range_sums(bounds, stops, labels, per)
+
+    def equal_periods(self, count):
+        """把诗词按顺序等分成 count 期，返回各期的起始位置"""
+        return np.linspace(0, len(self), count + 1).astype(np.int64)[:-1]
+
+    def bounds_for_poem_nums(self, poem_nums):
+        """分期从给定编号的诗开始时的起始位置（诗词编号按顺序递增）"""
+        return np.searchsorted(self.poem_nums, np.asarray(poem_nums), side='left')
+
+
+def main():
+    """生成意象时间序列，或从已保存的时间序列输出分期统计"""
+    parser = argparse.ArgumentParser(description="按诗词顺序统计各意象类别的出现次数，输出分期和滑动窗口统计")
+    parser.add_argument('input', help="按时间排序的分词文件、词频矩阵目录或已保存的 .npz 时间序列")
+    parser.add_argument('--save', help="把时间序列保存为 .npz 文件")
+    parser.add_argument('--taxonomy', help="意象分类体系文件（JSON），默认使用脚本旁的 意象分类.json")
+    parser.add_argument('--periods', type=int, default=6, help="按顺序等分的期数")
+    parser.add_argument('--window', type=int, default=0, help="滑动窗口的诗词数，0表示不输出")
+    parser.add_argument('--step', type=int, default=100, help="滑动窗口的步长")
+    args = parser.parse_args()
+
+    if args.input.endswith('.npz'):
+        series = ImageTimeSeries.load(args.input)
+    else:
+        taxonomy = ImageTaxonomy.load(args.taxonomy) if args.taxonomy else ImageTaxonomy.load()
+        if os.path.isdir(args.input):
+            print("加载词频矩阵...")
+            poems_data = PoemTermMatrix.load(args.input)
+        else:
+            # 与意象分析使用同一份二进制语料
+            from 意象分析与分类 import parse_segmented_file
+            print("解析分词文件...")
+            poems_data = parse_segmented_file(args.input)
+        series = ImageTimeSeries.from_poems(poems_data, taxonomy)
+    print(f"共{len(series)}首诗词，{len(series.labels)}个意象类别")
+
+    if args.save:
+        series.save(args.save)
+        print(f"时间序列已保存到: {args.save}")
+
+    # 各期每千词出现次数
+    bounds = series.equal_periods(args.periods)
+    rates = series.period_sums(bounds, per=1000)
+    print("\n各期意象出现率（每千词）：")
+    print("{:<24}".format("类别") + "".join(f"{'第' + str(i + 1) + '期':>10}" for i in range(len(bounds))))
+    for k, label in enumerate(series.labels):
+        print(f"{label:<24}" + "".join(f"{rate:>10.2f}" for rate in rates[:, k]))
+
+    if args.window:
+        starts, sums = series.rolling(args.window, args.step, per=1000)
+        print(f"\n滑动窗口（{args.window}首，步长{args.step}）各类别出现率最高的位置：")
+        for k, label in enumerate(series.labels):
+            if len(starts) and sums[:, k].any():
+                best = int(np.argmax(sums[:, k]))
+                print(f"  {label}: 第{starts[best] + 1}~{starts[best] + args.window}首，每千词{sums[best, k]:.2f}次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import json
+import mmap
+import os
+import sys
+from array import array
+from collections import Counter
+
+
+FORMAT_VERSION = 1
+
+
+class TokenCorpus:
+    """内存映射的整数ID词语语料
+
+    目录结构：
+        vocab.txt     词表，每行一个词，行号即词语ID（按首次出现的顺序编号）
+        tokens.i32    所有诗词的词语ID依次拼接成的int32数组
+        offsets.i64   每首诗在 tokens 中的起始位置，共 诗词数+1 个int64
+        nums.i32      每首诗在分词文件中的编号
+        meta.json     格式版本、字节序、数量统计以及源文件的大小和修改时间
+
+    数组文件通过 mmap 只读映射，打开时不需要解析，多个进程打开同一语料时共享页缓存。
+    作为序列使用时，每一项为 (诗词编号, 词语列表)，与 parse_segmented_file 的结果一致。
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        with open(os.path.join(directory, 'vocab.txt'), 'r', encoding='utf-8') as f:
+            self.vocab = f.read().split('\n')[:self.meta['vocab']]
+
+        self._maps = []
+        self.tokens = self._map('tokens.i32', 'i')
+        self.offsets = self._map('offsets.i64', 'q')
+        self.poem_nums = self._map('nums.i32', 'i')
+        if len(self.tokens) != self.meta['tokens'] or len(self.poem_nums) != self.meta['poems']:
+            raise ValueError(f"语料文件不完整: {directory}")
+
+    def _map(self, name, typecode):
+        with open(os.path.join(self.directory, name), 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(array(typecode))
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return memoryview(mapped).cast(typecode)
+
+    def __len__(self):
+        return len(self.poem_nums)
+
+    def poem_ids(self, index):
+        """第 index 首诗的词语ID（内存视图，不复制）"""
+        return self.tokens[self.offsets[index]:self.offsets[index + 1]]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        vocab = self.vocab
+        return self.poem_nums[index], [vocab[i] for i in self.poem_ids(index)]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def id_counts(self):
+        """各词语ID的出现次数，按ID首次出现的顺序排列"""
+        return Counter(self.tokens)
+
+    def word_counts(self):
+        """词频统计，与逐首累加词语得到的 Counter 完全相同（包括同频词的顺序）"""
+        vocab = self.vocab
+        return Counter({vocab[i]: count for i, count in self.id_counts().items()})
+
+    def close(self):
+        self.tokens = self.offsets = self.poem_nums = None
+        for mapped in self._maps:
+            mapped.close()
+        self._maps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def corpus_dir_for(text_path):
+    """分词文本文件对应的二进制语料目录"""
+    return text_path + '.corpus'
+
+
+def _source_stat(text_path):
+    stat = os.stat(text_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def build_token_corpus(poems, directory, source=None, flush_every=1 << 16):
+    """把 (诗词编号, 词语列表) 序列写成二进制语料，逐首写入，内存中只保留词表和偏移量"""
+    os.makedirs(directory, exist_ok=True)
+    paths = {name: os.path.join(directory, name) for name in ('tokens.i32', 'offsets.i64', 'nums.i32')}
+    vocab = {}
+    offsets = array('q', [0])
+    nums = array('i')
+    buffer = array('i')
+    total = 0
+
+    with open(paths['tokens.i32'] + '.tmp', 'wb') as tokens_file:
+        for num, words in poems:
+            for word in words:
+                word_id = vocab.get(word)
+                if word_id is None:
+                    word_id = vocab[word] = len(vocab)
+                buffer.append(word_id)
+            total += len(words)
+            offsets.append(total)
+            nums.append(num)
+            if len(buffer) >= flush_every:
+                buffer.tofile(tokens_file)
+                buffer = array('i')
+        buffer.tofile(tokens_file)
+
+    with open(paths['offsets.i64'] + '.tmp', 'wb') as f:
+        offsets.tofile(f)
+    with open(paths['nums.i32'] + '.tmp', 'wb') as f:
+        nums.tofile(f)
+    with open(os.path.join(directory, 'vocab.txt.tmp'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(vocab))
+    for name in list(paths) + ['vocab.txt']:
+        path = os.path.join(directory, name)
+        os.replace(path + '.tmp', path)
+
+    # meta.json 最后写入，作为语料完整的标记
+    meta = {
+        'format': FORMAT_VERSION,
+        'byteorder': sys.byteorder,
+        'poems': len(nums),
+        'tokens': total,
+        'vocab': len(vocab),
+        'source': source,
+    }
+    with open(os.path.join(directory, 'meta.json.tmp'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(os.path.join(directory, 'meta.json.tmp'), os.path.join(directory, 'meta.json'))
+    return meta
+
+
+def load_token_corpus(text_path, iter_poems):
+    """打开分词文件对应的二进制语料；语料不存在或已过期时先用 iter_poems(text_path) 重新生成"""
+    directory = corpus_dir_for(text_path)
+    source = _source_stat(text_path)
+    try:
+        with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if (meta.get('format') == FORMAT_VERSION and meta.get('byteorder') == sys.byteorder
+                and meta.get('source') == source):
+            return TokenCorpus(directory)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    print(f"生成二进制语料: {directory}")
+    build_token_corpus(iter_poems(text_path), directory, source)
+    return TokenCorpus(directory)
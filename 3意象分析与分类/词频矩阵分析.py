@@ -0,0 +1,133 @@
+import json
+import os
+import sys
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+
+FORMAT_VERSION = 1
+
+
+def _map_array(path, dtype):
+    """只读映射一个数组文件；空文件无法映射，返回空数组"""
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r')
+
+
+class PoemTermMatrix:
+    """诗词×词语稀疏计数矩阵（scipy CSR），每行一首诗，每列一个词
+
+    由分词阶段输出的矩阵目录（见 乾隆分词.py 的 TermMatrixWriter）加载，或由二进制
+    语料 TokenCorpus 生成。列按词语首次出现的顺序编号。词频表、类别合计、按行切片
+    和相似度查询都是稀疏矩阵运算，不需要逐首遍历。
+    """
+
+    def __init__(self, matrix, vocab, poem_nums):
+        self.matrix = matrix.tocsr()
+        self.vocab = vocab
+        self.poem_nums = np.asarray(poem_nums)
+        self._index = None
+
+    @classmethod
+    def load(cls, directory):
+        """映射分词阶段写出的矩阵目录"""
+        with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format') != FORMAT_VERSION or meta.get('byteorder') != sys.byteorder:
+            raise ValueError(f"词频矩阵格式不兼容: {directory}")
+        with open(os.path.join(directory, 'vocab.txt'), 'r', encoding='utf-8') as f:
+            vocab = f.read().split('\n')[:meta['shape'][1]]
+
+        indptr = _map_array(os.path.join(directory, 'indptr.i64'), np.int64)
+        indices = _map_array(os.path.join(directory, 'indices.i32'), np.int32)
+        data = _map_array(os.path.join(directory, 'data.i32'), np.int32)
+        poem_nums = _map_array(os.path.join(directory, 'nums.i32'), np.int32)
+        if len(indices) != meta['nnz'] or len(indptr) != meta['shape'][0] + 1:
+            raise ValueError(f"词频矩阵文件不完整: {directory}")
+        matrix = sparse.csr_matrix((data, indices, indptr), shape=tuple(meta['shape']))
+        return cls(matrix, vocab, poem_nums)
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """由 TokenCorpus 生成：每个词语ID记一次，同一首诗内的重复项合并为计数"""
+        indices = np.array(corpus.tokens, dtype=np.int32)
+        indptr = np.array(corpus.offsets, dtype=np.int64)
+        data = np.ones(len(indices), dtype=np.int32)
+        matrix = sparse.csr_matrix((data, indices, indptr), shape=(len(corpus), len(corpus.vocab)))
+        matrix.sum_duplicates()
+        return cls(matrix, corpus.vocab, np.array(corpus.poem_nums, dtype=np.int32))
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    @property
+    def index(self):
+        """词语 -> 列号"""
+        if self._index is None:
+            self._index = {word: i for i, word in enumerate(self.vocab)}
+        return self._index
+
+    def columns(self, words):
+        """词表中存在的词对应的列号数组，不存在的词忽略"""
+        index = self.index
+        return np.array([index[word] for word in words if word in index], dtype=np.int64)
+
+    def term_totals(self):
+        """每个词在所有诗中的总次数（按列求和）"""
+        return np.asarray(self.matrix.sum(axis=0)).ravel()
+
+    def document_frequency(self):
+        """每个词出现在多少首诗中"""
+        return np.bincount(self.matrix.indices, minlength=self.shape[1])
+
+    def word_counts(self):
+        """词频统计，与逐首累加词语得到的 Counter 完全相同（包括同频词的顺序）"""
+        totals = self.term_totals()
+        return Counter({self.vocab[i]: int(totals[i]) for i in np.flatnonzero(totals)})
+
+    def category_matrix(self, categories):
+        """类别指示矩阵（词语×类别）：categories 为 {类别名: 词语集合}，返回 (类别名列表, 稀疏矩阵)"""
+        names = list(categories)
+        rows, cols = [], []
+        for k, name in enumerate(names):
+            word_cols = self.columns(categories[name])
+            rows.append(word_cols)
+            cols.append(np.full(len(word_cols), k, dtype=np.int64))
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+        indicator = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)),
+                                      shape=(self.shape[1], len(names)))
+        # 同一类别重复列出的词只算一次
+        indicator.data[:] = 1
+        return names, indicator
+
+    def category_sums(self, categories):
+        """每首诗各类别词语的出现次数，返回 (类别名列表, 诗词数×类别数 的数组)"""
+        names, indicator = self.category_matrix(categories)
+        return names, (self.matrix @ indicator).toarray()
+
+    def rows(self, selection):
+        """按行切片（切片、行号数组或布尔掩码），返回共享词表的新矩阵，例如某一时期的诗"""
+        return PoemTermMatrix(self.matrix[selection], self.vocab, self.poem_nums[selection])
+
+    def similar(self, row, top=10):
+        """与第 row 首诗词频向量余弦相似度最高的诗，返回 [(行号, 相似度)]，不含自身"""
+        matrix = self.matrix.astype(np.float64)
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        scores = np.asarray((matrix @ matrix[row].T).todense()).ravel()
+        denominator = norms * norms[row]
+        scores = np.divide(scores, denominator, out=np.zeros_like(scores), where=denominator > 0)
+        scores[row] = -1.0
+        top = min(top, len(scores) - 1)
+        if top <= 0:
+            return []
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [(int(i), float(scores[i])) for i in best if scores[i] > 0]
@@ -1,7 +1,16 @@
 import os
 import re
-from fuzzywuzzy import fuzz, process
+import sys
 import difflib
+import argparse
+
+from 标题对齐 import ALIGNMENT_VERSION, global_alignment, greedy_alignment, quality_distribution
+from 标题对齐缓存 import AlignmentCache
+from 标题索引 import TitleIndex, normalize_title, title_similarity
+
+# JSONL记录的读写在爬虫目录的 诗词存储.py 中，与爬虫共用
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, '1乾隆诗词爬取'))
+from 诗词存储 import iter_records  # noqa: E402
 
 
 def read_qianlong_poems(file_path):
@@ -9,6 +18,20 @@ def read_qianlong_poems(file_path):
     print(f"正在读取文件: {file_path}")
     poems = []
 
+    if file_path.endswith('.jsonl'):
+        # 结构化记录文件：标题、正文已分开存储，直接使用
+        for record in iter_records(file_path):
+            title_line = f"{record['id']}.《{record['title']}》"
+            content = '\n'.join(line.strip() for line in record['content'].split('\n') if line.strip())
+            poems.append({
+                'original_title': title_line,
+                'clean_title': record['title'],
+                'content': content,
+                'original_block': f"{title_line}\n{content}"
+            })
+        print(f"成功解析 {len(poems)} 首诗词")
+        return poems
+
     with open(file_path, 'r', encoding='utf-8') as f:
         content = f.read()
 
@@ -56,11 +79,18 @@ def read_qianlong2_order(file_path):
     """读取乾隆诗词2.txt并提取标题顺序"""
     print(f"正在读取排序文件: {file_path}")
 
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    # 尝试提取可能的标题行
-    lines = content.split('\n')
+    if file_path.endswith('.jsonl'):
+        # 结构化记录文件：按章节顺序展开章节标题和正文各行
+        lines = []
+        for record in sorted(iter_records(file_path), key=lambda r: r.get('page') or 0):
+            lines.append(record['title'])
+            lines.extend(record['content'].split('\n'))
+    else:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+        # 尝试提取可能的标题行
+        lines = content.split('\n')
     titles = []
 
     # 匹配可能的标题模式
@@ -100,17 +130,8 @@ def read_qianlong2_order(file_path):
     return titles
 
 
-def normalize_title(title):
-    """标准化标题，用于模糊匹配"""
-    # 移除标点符号和空格
-    title = re.sub(r'[《》【】（）()「」〈〉“”‘’\s]', '', title)
-    # 转换为小写
-    title = title.lower()
-    return title
-
-
 def find_best_match(target_title, poems, threshold=60):
-    """使用模糊匹配找到最佳匹配的诗词"""
+    """使用模糊匹配找到最佳匹配的诗词（逐首比较；批量匹配请用 TitleIndex）"""
     normalized_target = normalize_title(target_title)
 
     best_match = None
@@ -119,13 +140,8 @@ def find_best_match(target_title, poems, threshold=60):
     for poem in poems:
         normalized_poem = normalize_title(poem['clean_title'])
 
-        # 使用多种匹配策略
-        score1 = fuzz.ratio(normalized_target, normalized_poem)
-        score2 = fuzz.partial_ratio(normalized_target, normalized_poem)
-        score3 = fuzz.token_sort_ratio(normalized_target, normalized_poem)
-
-        # 取最高分
-        score = max(score1, score2, score3)
+        # 使用多种匹配策略，取最高分
+        score = title_similarity(normalized_target, normalized_poem)
 
         if score > best_score and score >= threshold:
             best_score = score
@@ -134,58 +150,57 @@ def find_best_match(target_title, poems, threshold=60):
     return best_match, best_score
 
 
-def sort_poems_by_order(poems, order_titles):
-    """按照指定的标题顺序对诗词进行排序"""
-    print("开始进行模糊匹配排序...")
-
-    sorted_poems = []
-    matched_indices = set()
-    unmatched_poems = poems.copy()
-
-    # 第一阶段：精确匹配和高质量模糊匹配
-    high_quality_matches = []
-
-    for i, title in enumerate(order_titles):
-        if (i + 1) % 20 == 0:
-            print(f"处理排序文件中第 {i + 1} 个标题...")
-
-        best_match, score = find_best_match(title, unmatched_poems, threshold=75)
-
-        if best_match:
-            high_quality_matches.append((title, best_match, score))
-            unmatched_poems.remove(best_match)
+def sort_poems_by_order(poems, order_titles, workers=1, method='global', cache=None):
+    """按照指定的标题顺序对诗词进行排序
 
-    print(f"第一阶段匹配完成，找到 {len(high_quality_matches)} 个高质量匹配")
-
-    # 第二阶段：较低质量的模糊匹配
-    medium_quality_matches = []
-
-    for i, title in enumerate(order_titles):
-        # 跳过已经匹配的标题
-        if any(t[0] == title for t in high_quality_matches):
-            continue
-
-        best_match, score = find_best_match(title, unmatched_poems, threshold=50)
-
-        if best_match:
-            medium_quality_matches.append((title, best_match, score))
-            unmatched_poems.remove(best_match)
+    诗词标题先建成字符倒排索引，每个排序标题只与得分可能达到50的候选打分，
+    结果与逐首比较相同；
+    打分与匹配顺序无关，可以一次算完（workers > 1 时由多个进程并行）。
+    method='global' 时按100、75、50分逐档求全局最大权匹配，不会出现前面的标题
+    抢走更适合后面标题的诗，也不会拆掉高分匹配去凑两个低分匹配；
+    method='greedy' 为原来的两阶段贪心匹配。
+    指定 cache（AlignmentCache）时只为以前没有比较过的标题和诗词组合打分，
+    输入与上次完全相同时直接使用上次的匹配结果。
+    """
+    print("开始进行模糊匹配排序...")
+    poem_titles = [poem['clean_title'] for poem in poems]
+
+    alignment = None
+    if cache is not None:
+        state = cache.state(f"{method} v{ALIGNMENT_VERSION}", poem_titles, order_titles)
+        alignment = cache.load_alignment(state)
+        if alignment is not None:
+            print("标题和诗词与上次相同，使用已保存的匹配结果")
+
+    if alignment is None:
+        if cache is not None:
+            scored_candidates = cache.score(poem_titles, order_titles, workers=workers)
+        else:
+            print(f"建立标题索引，为 {len(order_titles)} 个标题挑选候选并打分...")
+            # 得分低于50的候选不会被选中
+            index = TitleIndex(poem_titles, min_score=50)
+            scored_candidates = index.match_all(order_titles, min_score=50, workers=workers)
+        print(f"候选得分表共 {sum(len(scored) for scored in scored_candidates)} 项")
+
+        if method == 'global':
+            print("逐档求解全局最大权匹配...")
+            alignment = global_alignment(scored_candidates, len(poems))
+        else:
+            # 第一阶段高质量匹配（不低于75分），第二阶段较低质量的匹配（不低于50分）
+            alignment = greedy_alignment(scored_candidates, thresholds=(75, 50))
+        if cache is not None:
+            cache.save_alignment(state, alignment)
 
-    print(f"第二阶段匹配完成，找到 {len(medium_quality_matches)} 个中等质量匹配")
+    high_quality = sum(1 for _, score in alignment.values() if score >= 75)
+    print(f"找到 {high_quality} 个高质量匹配，{len(alignment) - high_quality} 个中等质量匹配")
+    print("匹配质量分布:")
+    for name, count in quality_distribution(alignment, len(order_titles), len(poems)):
+        print(f"  {name}: {count}")
 
     # 按照原始顺序组合匹配结果
-    all_matches = []
-    for title in order_titles:
-        # 查找高质量匹配
-        hq_match = next((m for t, m, s in high_quality_matches if t == title), None)
-        if hq_match:
-            all_matches.append(hq_match)
-            continue
-
-        # 查找中等质量匹配
-        mq_match = next((m for t, m, s in medium_quality_matches if t == title), None)
-        if mq_match:
-            all_matches.append(mq_match)
+    all_matches = [poems[alignment[i][0]] for i in range(len(order_titles)) if i in alignment]
+    matched_ids = {poem_id for poem_id, _ in alignment.values()}
+    unmatched_poems = [poem for poem_id, poem in enumerate(poems) if poem_id not in matched_ids]
 
     print(f"总共匹配到 {len(all_matches)} 首诗词")
     print(f"剩余 {len(unmatched_poems)} 首诗词无法匹配")
@@ -216,11 +231,13 @@ def save_sorted_poems(poems, output_path):
     print("保存完成！")
 
 
-def main():
+def main(workers=1, method='global', use_cache=True):
     # 文件路径
     poems_path = r"C:\Users\任宇轩\Desktop\信息系统设计与分析\乾隆诗词.txt"
     order_path = r"C:\Users\任宇轩\Desktop\信息系统设计与分析\乾隆诗词2.txt"
     output_path = r"C:\Users\任宇轩\Desktop\信息系统设计与分析\乾隆诗词_排序后（模糊版）.txt"
+    # 标题对齐表：保存各标题与诗词的得分和匹配结果，重新运行时只处理新增或改动的部分
+    cache_path = r"C:\Users\任宇轩\Desktop\信息系统设计与分析\乾隆诗词标题对齐.sqlite"
 
     try:
         # 步骤1：读取原始诗词
@@ -241,7 +258,12 @@ def main():
         # 步骤3：进行模糊匹配排序
         print("\n" + "=" * 50)
         print("步骤3: 进行模糊匹配排序")
-        sorted_poems = sort_poems_by_order(poems, order_titles)
+        if use_cache:
+            with AlignmentCache(cache_path) as cache:
+                sorted_poems = sort_poems_by_order(poems, order_titles, workers=workers, method=method,
+                                                   cache=cache)
+        else:
+            sorted_poems = sort_poems_by_order(poems, order_titles, workers=workers, method=method)
 
         # 步骤4：保存结果
         print("\n" + "=" * 50)
@@ -266,11 +288,24 @@ def main():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按乾隆诗词2中的标题顺序对乾隆诗词进行模糊匹配排序")
+    parser.add_argument('--workers', type=int, default=1,
+                        help=f"打分进程数，大于1时并行打分（本机CPU核数：{os.cpu_count()}）")
+    parser.add_argument('--greedy', action='store_true',
+                        help="按标题顺序分两阶段贪心匹配，不求全局最优匹配")
+    parser.add_argument('--no-cache', action='store_true', help="不使用标题对齐表，全部重新打分和匹配")
+    args = parser.parse_args()
+
     # 检查是否需要安装依赖
-    try:
-        from fuzzywuzzy import fuzz
-    except ImportError:
+    import importlib.util
+    if importlib.util.find_spec('fuzzywuzzy') is None:
         print("需要安装 fuzzywuzzy 库，请运行: pip install fuzzywuzzy python-Levenshtein")
         exit(1)
 
-    main()
\ No newline at end of file
+    method = 'greedy' if args.greedy else 'global'
+    if method == 'global' and importlib.util.find_spec('scipy') is None:
+        # 全局匹配需要 scipy；没有安装时仍可按原来的贪心规则排序
+        print("未安装 scipy，改用贪心匹配（全局最优匹配请运行: pip install scipy）")
+        method = 'greedy'
+
+    main(workers=args.workers, method=method, use_cache=not args.no_cache)
\ No newline at end of file
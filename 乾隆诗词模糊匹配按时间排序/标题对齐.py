@@ -0,0 +1,101 @@
+from 标题索引 import best_candidate
+
+
+# 相似度满分；转换成最小化问题时的代价为 MAX_SCORE + 1 - 得分，始终为正
+MAX_SCORE = 100
+# 全局匹配的分档：先在完全一致的候选中求解，再依次放宽到75分、50分
+GLOBAL_TIERS = (100, 75, 50)
+# 匹配规则变化时递增，已保存的匹配结果随之失效
+ALIGNMENT_VERSION = 2
+# 匹配质量分档（下限, 名称），用于统计
+QUALITY_BANDS = ((100, "完全一致(100)"), (90, "90-99"), (75, "75-89"), (60, "60-74"), (50, "50-59"))
+
+
+def greedy_alignment(scored_candidates, thresholds=(75, 50)):
+    """逐个阈值、按标题顺序贪心匹配（原来的两阶段规则）
+
+    scored_candidates[i] 为第 i 个标题的 [(诗词序号, 得分)]，按序号升序。
+    返回 {标题序号: (诗词序号, 得分)}。
+    """
+    alignment = {}
+    matched_poems = set()
+    for threshold in thresholds:
+        for i, scored in enumerate(scored_candidates):
+            if i in alignment:
+                continue
+            poem_id, score = best_candidate(scored, threshold, matched_poems)
+            if poem_id is not None:
+                alignment[i] = (poem_id, score)
+                matched_poems.add(poem_id)
+    return alignment
+
+
+def _max_weight_matching(scored_candidates, n_poems):
+    """一档候选内的最大权匹配，返回 {标题序号: (诗词序号, 得分)}
+
+    候选得分构成稀疏二部图，转换为最小代价问题交给 scipy 的
+    min_weight_full_bipartite_matching。每个标题另连一个专属的"不匹配"节点，
+    代价相当于得分0，保证总有完全匹配。
+    """
+    import numpy as np
+    from scipy import sparse
+    from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+
+    n_titles = len(scored_candidates)
+    rows, cols, costs = [], [], []
+    for i, scored in enumerate(scored_candidates):
+        for poem_id, score in scored:
+            rows.append(i)
+            cols.append(poem_id)
+            costs.append(MAX_SCORE + 1 - score)
+        rows.append(i)
+        cols.append(n_poems + i)
+        costs.append(MAX_SCORE + 1)
+    graph = sparse.csr_matrix((np.array(costs, dtype=np.float64), (rows, cols)),
+                              shape=(n_titles, n_poems + n_titles))
+    title_ids, poem_ids = min_weight_full_bipartite_matching(graph)
+
+    alignment = {}
+    for i, poem_id in zip(title_ids.tolist(), poem_ids.tolist()):
+        if poem_id < n_poems:
+            alignment[i] = (poem_id, dict(scored_candidates[i])[poem_id])
+    return alignment
+
+
+def global_alignment(scored_candidates, n_poems, tiers=GLOBAL_TIERS):
+    """分档的全局最大权匹配，一首诗最多对应一个标题（可用 标题对齐检查.py 与贪心匹配对照检查）
+
+    按 tiers 从高到低逐档求解：每档只用得分不低于该档下限、且标题和诗词都还未匹配的
+    候选，在档内求得分之和最大的匹配。高档的匹配先固定下来，不会为了凑成两个
+    低分匹配而拆掉一个完全一致或高质量的匹配；同一档内也不会出现前面的标题
+    抢走更适合后面标题的诗。返回 {标题序号: (诗词序号, 得分)}。
+    """
+    alignment = {}
+    matched_poems = set()
+    for threshold in tiers:
+        tier_candidates = [
+            [] if i in alignment else
+            [(poem_id, score) for poem_id, score in scored
+             if score >= threshold and poem_id not in matched_poems]
+            for i, scored in enumerate(scored_candidates)
+        ]
+        if not any(tier_candidates):
+            continue
+        for i, (poem_id, score) in _max_weight_matching(tier_candidates, n_poems).items():
+            alignment[i] = (poem_id, score)
+            matched_poems.add(poem_id)
+    return alignment
+
+
+def quality_distribution(alignment, n_titles, n_poems):
+    """匹配质量分布：各分档的匹配数，以及未匹配的标题数和诗词数"""
+    counts = {name: 0 for _, name in QUALITY_BANDS}
+    for _, score in alignment.values():
+        for lower, name in QUALITY_BANDS:
+            if score >= lower:
+                counts[name] += 1
+                break
+    rows = list(counts.items())
+    rows.append(("未匹配的标题", n_titles - len(alignment)))
+    rows.append(("未匹配的诗词", n_poems - len(alignment)))
+    return rows
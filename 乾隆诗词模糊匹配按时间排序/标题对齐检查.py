@@ -0,0 +1,101 @@
+import argparse
+import itertools
+import random
+import sys
+
+from 标题对齐 import global_alignment, greedy_alignment
+
+
+def random_scores(rng, n_titles, n_poems, max_candidates, exclusive):
+    """随机生成候选得分表 [(诗词序号, 得分)]（按序号升序）
+
+    exclusive=True 时每首诗至多是一个标题的候选，各标题之间没有争抢；
+    同一标题的候选得分互不相同，贪心和全局匹配的选择都是唯一的。
+    """
+    poem_ids = list(range(n_poems))
+    rng.shuffle(poem_ids)
+    scored_candidates = []
+    for _ in range(n_titles):
+        k = rng.randint(0, max_candidates)
+        if exclusive:
+            chosen, poem_ids = poem_ids[:k], poem_ids[k:]
+        else:
+            chosen = rng.sample(range(n_poems), min(k, n_poems))
+        scores = rng.sample(range(50, 101), len(chosen))
+        scored_candidates.append(sorted(zip(chosen, scores)))
+    return scored_candidates
+
+
+def check_valid(scored_candidates, alignment):
+    """匹配结果只用候选中的组合，一首诗最多对应一个标题"""
+    poems = [poem_id for poem_id, _ in alignment.values()]
+    if len(poems) != len(set(poems)):
+        return "同一首诗匹配了多个标题"
+    for i, (poem_id, score) in alignment.items():
+        if (poem_id, score) not in scored_candidates[i]:
+            return f"标题 {i} 匹配了不在候选中的 ({poem_id}, {score})"
+    return None
+
+
+def best_total(scored_candidates):
+    """穷举所有匹配，得分之和的最大值（只用于很小的表）"""
+    best = 0
+    options = [[None] + [pair for pair in scored] for scored in scored_candidates]
+    for choice in itertools.product(*options):
+        poems = [pair[0] for pair in choice if pair is not None]
+        if len(poems) == len(set(poems)):
+            best = max(best, sum(pair[1] for pair in choice if pair is not None))
+    return best
+
+
+def run_checks(trials, seed):
+    """返回发现的问题列表，为空表示全部通过"""
+    rng = random.Random(seed)
+    problems = []
+    for trial in range(trials):
+        # 没有争抢时，两种方式都给每个标题配上它得分最高的候选
+        scored = random_scores(rng, rng.randint(1, 30), 120, 4, exclusive=True)
+        greedy = greedy_alignment(scored, thresholds=(75, 50))
+        result = global_alignment(scored, 120)
+        if result != greedy:
+            problems.append(f"第 {trial} 次：没有争抢时全局匹配与贪心匹配不同\n  贪心 {greedy}\n  全局 {result}")
+
+        # 只有一档时，全局匹配的得分之和应为穷举得到的最大值
+        scored = random_scores(rng, rng.randint(1, 5), 5, 3, exclusive=False)
+        result = global_alignment(scored, 5, tiers=(50,))
+        problem = check_valid(scored, result)
+        total = sum(score for _, score in result.values())
+        if problem is None and total != best_total(scored):
+            problem = f"得分之和 {total}，穷举的最大值为 {best_total(scored)}"
+        if problem:
+            problems.append(f"第 {trial} 次：单档最大权匹配 {problem}\n  候选 {scored}")
+
+        # 有争抢时匹配仍然有效，完全一致的匹配数不少于贪心匹配
+        scored = random_scores(rng, rng.randint(1, 40), 30, 5, exclusive=False)
+        greedy = greedy_alignment(scored, thresholds=(75, 50))
+        result = global_alignment(scored, 30)
+        problem = check_valid(scored, result)
+        exact = [sum(1 for _, score in alignment.values() if score == 100) for alignment in (result, greedy)]
+        if problem is None and exact[0] < exact[1]:
+            problem = f"完全一致的匹配 {exact[0]} 个，少于贪心匹配的 {exact[1]} 个"
+        if problem:
+            problems.append(f"第 {trial} 次：有争抢时 {problem}\n  候选 {scored}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='用随机得分表检查全局匹配（scipy）与贪心匹配')
+    parser.add_argument('--trials', type=int, default=200, help='每项检查的随机表数量')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    args = parser.parse_args()
+
+    problems = run_checks(args.trials, args.seed)
+    for problem in problems:
+        print(problem)
+    print(f"检查 {args.trials} 组随机得分表，发现 {len(problems)} 个问题")
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
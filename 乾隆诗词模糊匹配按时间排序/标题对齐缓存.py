@@ -0,0 +1,165 @@
+import hashlib
+import os
+import sqlite3
+
+from 标题索引 import TitleIndex, normalize_title
+
+
+# 打分规则或候选挑选方式变化时递增，旧的得分表随之失效
+TABLE_VERSION = 3
+
+
+def title_hash(title):
+    """标准化标题的摘要，作为得分表的键"""
+    return hashlib.sha1(normalize_title(title).encode('utf-8')).hexdigest()
+
+
+def _sequence_digest(*parts):
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update('\n'.join(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class AlignmentCache:
+    """持久化的标题对齐表（SQLite），重新运行时只为新增或改动的标题、诗词打分
+
+    titles/poems 表为出现过的每个标准化标题（按摘要）分配一个整数编号，scores 表按
+    (标题编号, 诗词编号) 保存打过分的每一对标题的相似度（包括低于 min_score 的，
+    表示这一对已经比较过）。每次运行时删除已经不存在的标题、诗词及其得分。
+
+    候选集合每次都由全部诗词建立的 TitleIndex 挑选（得分上界可能达到 min_score 的
+    组合）。挑选候选只是查倒排表，代价小；耗时的是逐对打分。逐个标题按编号查出
+    已有的得分，表中已有的组合直接取用，只为尚未比较过的组合打分，不把整个得分表
+    读进内存。因此结果与不使用缓存时 TitleIndex.match_all 的结果相同。
+
+    alignment 表保存上一次的匹配结果，meta 表记录对应的输入状态（标题、诗词的摘要
+    序列和匹配方式），输入没有变化时直接使用，不再打分和求解。
+    """
+
+    def __init__(self, path, min_score=50):
+        self.path = path
+        self.min_score = min_score
+        self.fingerprint = f"v{TABLE_VERSION}:min{min_score}"
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        if self._get_meta('fingerprint') != self.fingerprint:
+            # 表结构可能随版本变化，直接重建
+            for table in ('titles', 'poems', 'scores', 'alignment'):
+                self._conn.execute(f"DROP TABLE IF EXISTS {table}")
+            self._conn.execute("DELETE FROM meta")
+            self._set_meta('fingerprint', self.fingerprint)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS titles (id INTEGER PRIMARY KEY, title_hash TEXT NOT NULL UNIQUE);"
+            "CREATE TABLE IF NOT EXISTS poems (id INTEGER PRIMARY KEY, poem_hash TEXT NOT NULL UNIQUE);"
+            "CREATE TABLE IF NOT EXISTS scores (title_id INTEGER NOT NULL, poem_id INTEGER NOT NULL, "
+            "score INTEGER NOT NULL, PRIMARY KEY (title_id, poem_id)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS scores_poem ON scores (poem_id);"
+            "CREATE TABLE IF NOT EXISTS alignment (title_index INTEGER PRIMARY KEY, "
+            "poem_index INTEGER NOT NULL, score INTEGER NOT NULL);"
+        )
+        self._conn.commit()
+
+    def _get_meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _sync(self, table, column, score_column, current):
+        """删除已不存在的摘要（连同其得分），登记新摘要，返回 {摘要: 编号}"""
+        ids = {key: row_id for row_id, key in self._conn.execute(f"SELECT id, {column} FROM {table}")}
+        stale = [(ids.pop(key),) for key in set(ids) - current]
+        if stale:
+            self._conn.executemany(f"DELETE FROM {table} WHERE id = ?", stale)
+            self._conn.executemany(f"DELETE FROM scores WHERE {score_column} = ?", stale)
+        for key in current - set(ids):
+            ids[key] = self._conn.execute(f"INSERT INTO {table} ({column}) VALUES (?)", (key,)).lastrowid
+        return ids
+
+    def score(self, poem_titles, order_titles, workers=1):
+        """各排序标题的 [(诗词序号, 得分)]（按序号升序），与 TitleIndex.match_all 的结果相同"""
+        title_hashes = [title_hash(title) for title in order_titles]
+        poem_hashes = [title_hash(title) for title in poem_titles]
+        title_ids = self._sync('titles', 'title_hash', 'title_id', set(title_hashes))
+        poem_ids = self._sync('poems', 'poem_hash', 'poem_id', set(poem_hashes))
+        # 各诗词序号对应的编号；标准化标题相同的诗编号相同
+        poem_rows = [poem_ids[key] for key in poem_hashes]
+
+        print(f"建立标题索引，为 {len(order_titles)} 个标题挑选候选...")
+        index = TitleIndex(poem_titles, min_score=self.min_score)
+        scored_by_title, queries, pending = {}, {}, {}
+        for title, key in zip(order_titles, title_hashes):
+            if key in scored_by_title:
+                continue
+            known = dict(self._conn.execute("SELECT poem_id, score FROM scores WHERE title_id = ?",
+                                            (title_ids[key],)))
+            scored, missing = [], {}
+            for poem_id in index.candidates(normalize_title(title)):
+                row_id = poem_rows[poem_id]
+                if row_id in known:
+                    scored.append((poem_id, known[row_id]))
+                else:
+                    missing.setdefault(row_id, []).append(poem_id)
+            scored_by_title[key] = scored
+            if missing:
+                queries[key] = title
+                pending[key] = missing
+
+        # 只为表中没有的组合打分；标准化标题相同的诗只打一次
+        rows = []
+        if pending:
+            print(f"为 {len(pending)} 个标题的 {sum(len(missing) for missing in pending.values())} 个新候选打分...")
+            results = index.match_all([queries[key] for key in pending], 0, workers,
+                                      candidates=[sorted(ids[0] for ids in missing.values())
+                                                  for missing in pending.values()])
+            for (key, missing), results_for_title in zip(pending.items(), results):
+                scored = scored_by_title[key]
+                for poem_id, score in results_for_title:
+                    row_id = poem_rows[poem_id]
+                    rows.append((title_ids[key], row_id, score))
+                    scored.extend((same_id, score) for same_id in missing[row_id])
+                scored.sort()
+
+        self._conn.executemany("INSERT OR REPLACE INTO scores (title_id, poem_id, score) VALUES (?, ?, ?)", rows)
+        self._conn.commit()
+
+        return [[(poem_id, score) for poem_id, score in scored_by_title[key] if score >= self.min_score]
+                for key in title_hashes]
+
+    def state(self, method, poem_titles, order_titles):
+        """输入状态的摘要：标题、诗词的标准化摘要序列以及匹配方式"""
+        return _sequence_digest([method],
+                                [title_hash(title) for title in order_titles],
+                                [title_hash(title) for title in poem_titles])
+
+    def load_alignment(self, state):
+        """输入状态与上次相同时返回上次的匹配 {标题序号: (诗词序号, 得分)}，否则返回 None"""
+        if self._get_meta('alignment_state') != state:
+            return None
+        return {title_index: (poem_index, score) for title_index, poem_index, score in
+                self._conn.execute("SELECT title_index, poem_index, score FROM alignment")}
+
+    def save_alignment(self, state, alignment):
+        self._conn.execute("DELETE FROM alignment")
+        self._conn.executemany(
+            "INSERT INTO alignment (title_index, poem_index, score) VALUES (?, ?, ?)",
+            [(i, poem_id, score) for i, (poem_id, score) in sorted(alignment.items())]
+        )
+        self._set_meta('alignment_state', state)
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
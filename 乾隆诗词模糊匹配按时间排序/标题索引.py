@@ -0,0 +1,188 @@
+import re
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+
+def normalize_title(title):
+    """标准化标题，用于模糊匹配"""
+    # 移除标点符号和空格
+    title = re.sub(r'[《》【】（）()「」〈〉“”‘’\s]', '', title)
+    # 转换为小写
+    title = title.lower()
+    return title
+
+
+def sorted_tokens(normalized_title):
+    """token_sort_ratio 比较的字符串：只保留字母数字，按词排序后用空格连接"""
+    from fuzzywuzzy import utils
+
+    return ' '.join(sorted(utils.full_process(normalized_title, force_ascii=True).split()))
+
+
+def title_similarity(normalized_a, normalized_b, sorted_a=None, sorted_b=None):
+    """两个标准化标题的相似度：ratio、partial_ratio、token_sort_ratio 三种得分取最高
+
+    token_sort_ratio 就是对 sorted_tokens 的结果求 ratio；批量比较时预先算好
+    sorted_a/sorted_b 传入，每对标题不必重复清理和排序。
+    """
+    # fuzzywuzzy 在第一次打分时才导入，只读取文件或查看帮助时不必加载
+    from fuzzywuzzy import fuzz
+
+    if sorted_a is None:
+        sorted_a = sorted_tokens(normalized_a)
+    if sorted_b is None:
+        sorted_b = sorted_tokens(normalized_b)
+    return max(fuzz.ratio(normalized_a, normalized_b),
+               fuzz.partial_ratio(normalized_a, normalized_b),
+               fuzz.ratio(sorted_a, sorted_b))
+
+
+def _reachable(common, len_a, len_b, min_score, partial):
+    """两个字符串最多有 common 个字符能对上时，得分的上界能否达到 min_score
+
+    ratio 为 2M/(|a|+|b|)，M 为匹配上的字符数；partial_ratio 是较短串 s 与较长串中
+    一段窗口的 ratio，窗口至少包含 M 个匹配的字符，不超过 2M/(|s|+M)，且这一上界
+    不小于 ratio 的上界。partial=True 时按 partial_ratio 判断。两个空串得100，
+    一空一不空得0。fuzzywuzzy 把得分四舍五入取整，这里按 min_score - 0.5 比较。
+    """
+    if len_a == 0 or len_b == 0:
+        return len_a == len_b
+    denominator = min(len_a, len_b) + common if partial else len_a + len_b
+    return 400 * common >= (2 * min_score - 1) * denominator
+
+
+def _needed(len_a, len_b, min_score, partial):
+    """得分上界达到 min_score 至少需要对上的字符数，无论如何都达不到时返回None"""
+    for common in range(min(len_a, len_b) + 1):
+        if _reachable(common, len_a, len_b, min_score, partial):
+            return common
+    return None
+
+
+class _CharIndex:
+    """一组字符串的字符倒排表：字符 -> {序号: 出现次数}，空格只记个数"""
+
+    def __init__(self, strings):
+        self.lengths = [len(string) for string in strings]
+        self.spaces = [string.count(' ') for string in strings]
+        self.by_length = defaultdict(list)
+        self.postings = {}
+        for item_id, string in enumerate(strings):
+            self.by_length[len(string)].append(item_id)
+            for char, count in Counter(string.replace(' ', '')).items():
+                self.postings.setdefault(char, {})[item_id] = count
+
+    def reaching(self, query, min_score, partial):
+        """得分上界（见 _reachable）可能达到 min_score 的序号集合
+
+        共有的字符数查倒排表逐首累计，空格按两者空格数的较小值计入。
+        """
+        query_spaces = query.count(' ')
+        needed = {length: _needed(len(query), length, min_score, partial) for length in self.by_length}
+        common = defaultdict(int)
+        for char, query_count in Counter(query.replace(' ', '')).items():
+            for item_id, count in self.postings.get(char, {}).items():
+                common[item_id] += min(query_count, count)
+
+        found = set()
+        # 没有共有字符也可能达到 min_score 的：两个空串，或排序后的词很多、空格就能对上一半
+        for length, item_ids in self.by_length.items():
+            if needed[length] is not None and needed[length] <= query_spaces:
+                found.update(item_id for item_id in item_ids
+                             if min(query_spaces, self.spaces[item_id]) >= needed[length])
+        for item_id, count in common.items():
+            required = needed[self.lengths[item_id]]
+            if required is not None and count + min(query_spaces, self.spaces[item_id]) >= required:
+                found.add(item_id)
+        return found
+
+
+class TitleIndex:
+    """诗词标题的字符倒排索引，为模糊匹配挑选候选，不漏掉任何得分可能达到 min_score 的诗
+
+    标题只标准化一次（token_sort_ratio 用的排序结果也预先算好）。三种得分都取决于
+    两个标题能对上的字符数，不超过两者共有的字符数（按重数计）；查倒排表数出每首诗
+    与查询共有的字符数，得分上界达不到 min_score 的诗不打分。token_sort_ratio 比较的
+    字符串另建一份倒排表。因此 match 的结果与逐首比较相同。
+
+    min_score 在建索引时确定；match 的 min_score 低于它时，得分在两者之间的诗可能
+    不在候选中。
+    """
+
+    def __init__(self, titles, min_score=50):
+        self.titles = [normalize_title(title) for title in titles]
+        self.sorted_titles = [sorted_tokens(title) for title in self.titles]
+        self.min_score = min_score
+        self._title_index = _CharIndex(self.titles)
+        self._token_index = _CharIndex(self.sorted_titles)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def candidates(self, normalized_query, sorted_query=None):
+        """候选诗的序号，按序号升序"""
+        if self.min_score <= 0:
+            return list(range(len(self.titles)))
+        if sorted_query is None:
+            sorted_query = sorted_tokens(normalized_query)
+        # ratio、partial_ratio 比较标准化后的标题（不含空格）；token_sort_ratio 比较排序后的词
+        found = self._title_index.reaching(normalized_query, self.min_score, partial=True)
+        found |= self._token_index.reaching(sorted_query, self.min_score, partial=False)
+        return sorted(found)
+
+    def match(self, title, min_score=0, candidates=None):
+        """title 与各候选的相似度，返回得分不低于 min_score 的 [(诗词序号, 得分)]，按序号升序
+
+        candidates 指定只与这些诗词序号打分（已经挑好的候选中尚未打分的部分）。
+        """
+        normalized = normalize_title(title)
+        sorted_query = sorted_tokens(normalized)
+        titles, sorted_titles = self.titles, self.sorted_titles
+        if candidates is None:
+            candidates = self.candidates(normalized, sorted_query)
+        scored = []
+        for poem_id in candidates:
+            score = title_similarity(normalized, titles[poem_id], sorted_query, sorted_titles[poem_id])
+            if score >= min_score:
+                scored.append((poem_id, score))
+        return scored
+
+    def match_all(self, titles, min_score=0, workers=1, chunksize=64, candidates=None):
+        """批量匹配，结果与 titles 一一对应；workers > 1 时分块交给进程池
+
+        candidates 为与 titles 一一对应的候选序号列表，不指定时由索引挑选。
+        """
+        if candidates is None:
+            candidates = [None] * len(titles)
+        if workers <= 1:
+            return [self.match(title, min_score, ids) for title, ids in zip(titles, candidates)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_match_worker,
+                                 initargs=(self, min_score)) as pool:
+            return list(pool.map(_match_in_worker, titles, candidates, chunksize=chunksize))
+
+
+_worker_index = None
+_worker_min_score = 0
+
+
+def _init_match_worker(index, min_score):
+    """进程池中每个进程启动时保存一份索引，之后的任务只传标题"""
+    global _worker_index, _worker_min_score
+    _worker_index = index
+    _worker_min_score = min_score
+
+
+def _match_in_worker(title, candidates=None):
+    return _worker_index.match(title, _worker_min_score, candidates)
+
+
+def best_candidate(scored, threshold, excluded=()):
+    """得分不低于 threshold 且不在 excluded 中的最佳候选，返回 (诗词序号, 得分)，没有时为 (None, 0)
+
+    与逐首比较时相同：得分最高者胜出，同分取序号小的。
+    """
+    best_id, best_score = None, 0
+    for poem_id, score in scored:
+        if score > best_score and score >= threshold and poem_id not in excluded:
+            best_id, best_score = poem_id, score
+    return best_id, best_score